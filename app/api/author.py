@@ -2,35 +2,67 @@ from fastapi import APIRouter, HTTPException, Query, Path
 from typing import Annotated
 from uuid import UUID
 
-from app.crud.author import Author
-from app.schemas.author import AuthorListModel, AuthorOutputModel
-from app.schemas.query import FilterWorkstream, FilterParams
+from app.core.cache import cached
+from app.core.serialise import serialised
+from app.crud.author import AsyncAuthor
+from app.schemas.author import (AuthorCollaboratorListModel, AuthorListModel,
+                                AuthorOutputModel)
+from app.schemas.query import FilterCollaborators, FilterWorkstream, FilterParams
 
 router = APIRouter(prefix="/api/authors", tags=["authors"])
 
 
 @router.get("")
-def api_author_list(query: Annotated[FilterWorkstream, Query()]
+@serialised
+@cached
+async def api_author_list(query: Annotated[FilterWorkstream, Query()]
                     ) -> AuthorListModel:
     try:
-        authors = Author()
-        if result := authors.get_authors(skip=query.skip,
-                                         limit=query.limit,
-                                         workstream=query.workstream):
+        authors = AsyncAuthor()
+        if result := await authors.get_authors(skip=query.skip,
+                                               limit=query.limit,
+                                               workstream=query.workstream,
+                                               cursor=query.cursor):
             return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}") from e
 
+@router.get("/{id}/collaborators")
+@serialised
+@cached
+async def api_author_collaborators(id: Annotated[UUID, Path(title="Unique author identifier")],
+                                   query: Annotated[FilterCollaborators, Query()]
+                                   ) -> AuthorCollaboratorListModel:
+    """Return the collaborators of an author, by number of shared outputs"""
+    author = AsyncAuthor()
+    try:
+        result = await author.get_collaborators(id=id,
+                                                result_type=query.result_type,
+                                                skip=query.skip,
+                                                limit=query.limit)
+    except KeyError:
+        raise HTTPException(status_code=404,
+                            detail=f"Author '{id}' not found")
+    except ValueError as e:
+        raise HTTPException(status_code=500,
+                            detail=f"Database error: {str(e)}") from e
+    else:
+        return result
+
+
 @router.get("/{id}")
-def api_author(id: Annotated[UUID, Path(title="Unique author identifier")],
+@serialised
+@cached
+async def api_author(id: Annotated[UUID, Path(title="Unique author identifier")],
                query: Annotated[FilterParams, Query()]
                ) -> AuthorOutputModel:
-    author = Author()
+    author = AsyncAuthor()
     try:
-        result = author.get_author(id=id,
-                                   result_type=query.result_type,
-                                   skip=query.skip,
-                                   limit=query.limit)
+        result = await author.get_author(id=id,
+                                         result_type=query.result_type,
+                                         skip=query.skip,
+                                         limit=query.limit,
+                                         cursor=query.cursor)
 
     except KeyError:
         raise HTTPException(status_code=404,
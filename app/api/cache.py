@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+
+from app.core.cache import data_version, response_cache
+from app.core.fragments import fragment_cache
+from app.schemas.cache import CacheStats
+
+router = APIRouter(prefix="/api/cache", tags=["cache"])
+
+
+@router.get("")
+async def api_cache_stats() -> CacheStats:
+    """Return the hit, miss and eviction counters of the response and fragment caches
+
+    The counters are kept per worker process.
+    """
+    return ({"data_version": data_version.current}
+            | response_cache.stats()
+            | {"fragments": fragment_cache.stats()})
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, HTTPException, Query, Path
 from typing import Annotated
-from app.crud.country import Country
+from app.core.cache import cached
+from app.core.serialise import serialised
+from app.crud.country import AsyncCountry
 from app.schemas.country import CountryList, CountryOutputListModel
 from app.schemas.query import FilterBase, FilterParams
 
@@ -8,25 +10,30 @@ router = APIRouter(prefix="/api/countries", tags=["countries"])
 
 
 @router.get("")
-def api_country_list(query: Annotated[FilterBase, Query()]
+@serialised
+@cached
+async def api_country_list(query: Annotated[FilterBase, Query()]
                      ) -> CountryList:
-    country_model = Country()
+    country_model = AsyncCountry()
     try:
-        return country_model.get_countries(query.skip, query.limit)
+        return await country_model.get_countries(query.skip, query.limit)
     except Exception as e:
         raise HTTPException(status_code=500,
                             detail=f"Server error: {str(e)}") from e
 
 @router.get("/{id}")
-def api_country(id: Annotated[str, Path(examples=['KEN'], title="Country identifier", pattern="^([A-Z]{3})$")],
+@serialised
+@cached
+async def api_country(id: Annotated[str, Path(examples=['KEN'], title="Country identifier", pattern="^([A-Z]{3})$")],
                 query: Annotated[FilterParams, Query()]
                 ) -> CountryOutputListModel:
-    country_model = Country()
+    country_model = AsyncCountry()
     try:
-        result = country_model.get_country(id,
-                                           query.skip,
-                                           query.limit,
-                                           query.result_type)
+        result = await country_model.get_country(id,
+                                                 query.skip,
+                                                 query.limit,
+                                                 query.result_type,
+                                                 query.cursor)
     except KeyError:
         raise HTTPException(status_code=404,
                             detail=f"Country with id {id} not found")
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Annotated
+
+from app.core.cache import data_version
+from app.core.conditional import compute_etag
+from app.core.graph import ENCODERS, MEDIA_TYPES, accepts_gzip, gzip_chunks
+from app.crud.graph import AsyncGraph
+from app.schemas.query import FilterGraph
+
+router = APIRouter(prefix="/api/graph", tags=["graph"])
+
+
+@router.get("", response_class=StreamingResponse)
+async def api_graph(request: Request,
+                    query: Annotated[FilterGraph, Query()]) -> StreamingResponse:
+    """Stream the co-authorship graph, with edges as indices into the nodes
+
+    See :mod:`app.core.graph` for the formats. The body is compressed with
+    gzip when the client accepts it.
+    """
+    graph = AsyncGraph(query.workstream, query.country, query.result_type)
+    body = ENCODERS[query.format](graph.nodes(), graph.edges())
+    headers = {"Vary": "Accept-Encoding"}
+    if accepts_gzip(request.headers.get("accept-encoding")):
+        body = gzip_chunks(body)
+        # Same content as the identity encoding, so a weak tag of the same value
+        etag = compute_etag(data_version.current, request.url.path,
+                            request.scope["query_string"])
+        headers |= {"Content-Encoding": "gzip", "ETag": f"W/{etag}"}
+    return StreamingResponse(body, media_type=MEDIA_TYPES[query.format], headers=headers)
@@ -1,33 +1,51 @@
-from typing import Tuple
+from fastapi import APIRouter, HTTPException, Path, Query, UploadFile
+from fastapi.logger import logger
+from typing import Annotated
 
-from fastapi import APIRouter, HTTPException, UploadFile
-
-from app.crud.ingest import Ingest
-from app.schemas.ingest import IngestionMetrics, IngestionStates
+from app.core.jobs import jobs
+from app.crud.ingest import submit_ingest_job
+from app.schemas.ingest import IngestionJob
 
 router = APIRouter(prefix="/api/ingest", tags=["ingest"])
 
 
-@router.post("/ingest_dois")
+@router.post("/ingest_dois", status_code=202)
 async def ingest_dois(
     file: UploadFile,
     limit: int = 50,
     update_metadata: bool = False,
-    write_metadata: bool = False,
-) -> Tuple[IngestionMetrics, IngestionStates]:
+    write_metadata: Annotated[bool, Query(deprecated=True)] = False,
+) -> IngestionJob:
+    """Queue the ingestion of a file of DOIs, one per line
+
+    Returns the job at once. Poll ``/api/ingest/jobs/{id}`` for its progress.
+    Jobs write to the graph one at a time, in the order they start.
+
+    ``write_metadata`` is deprecated and ignored, as fetched metadata is
+    always kept in the metadata cache.
+    """
+    if write_metadata:
+        logger.warning("write_metadata is deprecated and ignored, fetched metadata "
+                       "is always kept in the metadata cache")
     try:
         content = await file.read()
         dois = [line.strip() for line in content.decode().split("\n") if line.strip()]
-        if not dois:
-            raise HTTPException(status_code=400, detail="No valid DOIs found in file")
-        ingest = Ingest(
-            dois=dois,
-            limit=limit,
-            update_metadata=update_metadata,
-            write_metadata=write_metadata,
-        )
-        return ingest.ingest_dois()
     except UnicodeDecodeError:
         raise HTTPException(status_code=400, detail="File must be UTF-8 encoded text")
+    if not dois:
+        raise HTTPException(status_code=400, detail="No valid DOIs found in file")
+    try:
+        return submit_ingest_job(dois=dois,
+                                 limit=limit,
+                                 update_metadata=update_metadata)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+
+
+@router.get("/jobs/{id}")
+async def ingest_job(id: Annotated[str, Path(title="Ingestion job identifier")]) -> IngestionJob:
+    """Return the status and progress of an ingestion job"""
+    try:
+        return jobs.get(id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Ingestion job '{id}' not found")
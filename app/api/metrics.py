@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Response
+
+from app.core.metrics import latest_metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """Return the query and request metrics of all workers in the Prometheus format"""
+    content, content_type = latest_metrics()
+    return Response(content=content, media_type=content_type)
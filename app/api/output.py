@@ -1,35 +1,59 @@
 from fastapi import APIRouter, HTTPException, Query, Path
 from fastapi.logger import logger
+from fastapi.responses import StreamingResponse
 from typing import Annotated
-from app.schemas.query import FilterOutputList
+from app.core.cache import cached
+from app.core.serialise import serialised
+from app.core.export import MEDIA_TYPES, SERIALISERS
+from app.schemas.query import FilterOutputExport, FilterOutputList
 from uuid import UUID
 
-from app.crud.output import Output
+from app.crud.output import AsyncOutput
 from app.schemas.output import OutputListModel, OutputModel
 
 router = APIRouter(prefix="/api/outputs", tags=["outputs"])
 
 
 @router.get("")
-def api_output_list(
+@serialised
+@cached
+async def api_output_list(
     query: Annotated[FilterOutputList, Query()]
 ) -> OutputListModel:
     """Return a list of outputs"""
-    outputs = Output()
+    outputs = AsyncOutput()
     try:
-        return outputs.get_outputs(query.skip,
-                                   query.limit,
-                                   query.result_type,
-                                   query.country)
+        return await outputs.get_outputs(query.skip,
+                                         query.limit,
+                                         query.result_type,
+                                         query.country,
+                                         query.cursor)
     except ValueError as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 
+@router.get("/export", response_class=StreamingResponse)
+async def api_output_export(query: Annotated[FilterOutputExport, Query()]) -> StreamingResponse:
+    """Stream every output matching the filters as NDJSON or CSV
+
+    Outputs are read from a single query as the response is sent, so
+    harvesters can fetch the whole index without paging.
+    """
+    outputs = AsyncOutput().export(query.result_type, query.country)
+    filename = f"outputs-{query.result_type}.{query.format}"
+    return StreamingResponse(
+        SERIALISERS[query.format](outputs),
+        media_type=MEDIA_TYPES[query.format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
 @router.get("/{id}")
-def api_output(id: Annotated[UUID, Path(title="Unique output identifier")]) -> OutputModel:
-    output = Output()
+@serialised
+@cached
+async def api_output(id: Annotated[UUID, Path(title="Unique output identifier")]) -> OutputModel:
+    output = AsyncOutput()
     try:
-        result = output.get_output(id)
+        result = await output.get_output(id)
     except KeyError as e:
         raise HTTPException(
                 status_code=404, detail=f"Output with id {id} not found"
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Annotated
+
+from app.core.cache import cached
+from app.core.search import search_index
+from app.core.serialise import serialised
+from app.crud.search import AsyncSearch
+from app.schemas.query import FilterSearch
+from app.schemas.search import SearchListModel
+
+router = APIRouter(prefix="/api/search", tags=["search"])
+
+
+@router.get("")
+@serialised
+@cached(version=lambda: search_index.version)
+async def api_search(query: Annotated[FilterSearch, Query()]) -> SearchListModel:
+    """Return the outputs best matching the search terms in ``q``"""
+    search = AsyncSearch()
+    try:
+        return await search.search(query.q,
+                                   result_type=query.result_type,
+                                   country=query.country,
+                                   skip=query.skip,
+                                   limit=query.limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
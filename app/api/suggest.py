@@ -0,0 +1,20 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Annotated
+
+from app.core.serialise import serialised
+from app.crud.suggest import AsyncSuggest
+from app.schemas.query import FilterSuggest
+from app.schemas.suggest import SuggestListModel
+
+router = APIRouter(prefix="/api/suggest", tags=["suggest"])
+
+
+@router.get("")
+@serialised
+async def api_suggest(query: Annotated[FilterSuggest, Query()]) -> SuggestListModel:
+    """Return the authors and outputs whose name, ORCID or title start with ``prefix``"""
+    suggest = AsyncSuggest()
+    try:
+        return suggest.suggest(query.prefix, type=query.type, limit=query.limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
@@ -2,7 +2,9 @@ from typing import List, Annotated
 
 from fastapi import APIRouter, HTTPException, Query, Path
 
-from app.crud.workstream import Workstream
+from app.core.cache import cached
+from app.core.serialise import serialised
+from app.crud.workstream import AsyncWorkstream
 from app.schemas.workstream import WorkstreamDetailModel, WorkstreamListModel
 from app.schemas.query import FilterBase
 
@@ -10,7 +12,9 @@ router = APIRouter(prefix="/api/workstreams", tags=["workstreams"])
 
 
 @router.get("")
-def list_workstreams(
+@serialised
+@cached
+async def list_workstreams(
     query: Annotated[FilterBase, Query()]) -> WorkstreamListModel:
     """Return a list of workstreams
 
@@ -19,9 +23,9 @@ def list_workstreams(
     app.schemas.workstream.WorkstreamListModel
 
     """
-    model = Workstream()
+    model = AsyncWorkstream()
     try:
-        results = model.get_all(skip=query.skip, limit=query.limit)
+        results = await model.get_all(skip=query.skip, limit=query.limit)
     except KeyError as e:
         raise HTTPException(status_code=500,
                             detail=f"Database error: {str(e)}") from e
@@ -31,15 +35,17 @@ def list_workstreams(
 
 
 @router.get("/{id}")
-def get_workstream(
+@serialised
+@cached
+async def get_workstream(
     id: Annotated[str, Path(title="Unique workstream identifier")],
     query: Annotated[FilterBase, Query()]
     ) -> WorkstreamDetailModel:
     """Return a single workstream
     """
-    model = Workstream()
+    model = AsyncWorkstream()
     try:
-        results = model.get(id, skip=query.skip, limit=query.limit)
+        results = await model.get(id, skip=query.skip, limit=query.limit)
     except KeyError:
         raise HTTPException(status_code=404,
                             detail=f"Workstream '{id}' not found")
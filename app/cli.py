@@ -0,0 +1,114 @@
+"""Maintenance commands
+
+Run with ``python -m app.cli <command>``::
+
+    python -m app.cli rebuild-counters
+    python -m app.cli schema --check
+    python -m app.cli fetch-metadata dois.txt
+    python -m app.cli relink-countries
+"""
+import argparse
+import sys
+
+from app.core.config import settings
+from app.core.jobs import writer_lock
+from app.crud.collaboration import Collaborations
+from app.crud.statistics import Statistics
+from app.db.schema import bootstrap_schema, check_schema
+from app.db.session import close_driver, open_driver
+from app.pipeline.countries import CountryLinker
+from app.pipeline.fetch import fetch_metadata
+
+
+def rebuild_counters(args: argparse.Namespace) -> int:
+    """Recompute the denormalised output counters and collaborations
+
+    Waits for the writer lock, so that it does not run during an ingestion.
+    """
+    with writer_lock(settings.INGEST_JOBS_DIR):
+        updated = Statistics().rebuild()
+        for label, count in updated.items():
+            print(f"{label}: {count} nodes updated")
+        print(f"collaborated_with: {Collaborations().rebuild()} relationships updated")
+    return 0
+
+
+def schema(args: argparse.Namespace) -> int:
+    """Create the indexes and constraints required by the queries
+
+    With ``--check`` only report the missing ones, exiting with 1 if any are.
+    """
+    if args.check:
+        missing = check_schema()
+        for item in missing:
+            print(f"missing: {item}")
+        return 1 if missing else 0
+    report = bootstrap_schema()
+    for status, items in report.items():
+        for item in items:
+            print(f"{status}: {item}")
+    return 1 if report["failed"] else 0
+
+
+def fetch(args: argparse.Namespace) -> int:
+    """Fetch the metadata of the DOIs in a file into the metadata cache"""
+    with open(args.file) as doi_file:
+        dois = [line.strip() for line in doi_file if line.strip()]
+    metadata = fetch_metadata(dois)
+    found = sum(1 for m in metadata.values() if m.openalex or m.openaire)
+    print(f"Fetched metadata of {found} of {len(metadata)} DOIs")
+    return 0
+
+
+def relink_countries(args: argparse.Namespace) -> int:
+    """Re-link every output to the countries named in its title or abstract
+
+    Counters are recomputed afterwards, as country counts depend on the links.
+    Waits for the writer lock, so that it does not run during an ingestion.
+    """
+    with writer_lock(settings.INGEST_JOBS_DIR):
+        outputs, linked = CountryLinker().relink_all()
+        print(f"Linked {outputs} outputs to countries {linked} times")
+        Statistics().rebuild()
+        Statistics().bump_version()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli",
+                                     description="Research index maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser("rebuild-counters",
+                                  help="Recompute the output counters and collaborations from the graph")
+    rebuild.set_defaults(func=rebuild_counters)
+
+    schema_parser = commands.add_parser("schema",
+                                        help="Create the indexes and constraints used by the queries")
+    schema_parser.add_argument("--check", action="store_true",
+                               help="Only report missing indexes and constraints")
+    schema_parser.set_defaults(func=schema)
+
+    fetch_parser = commands.add_parser("fetch-metadata",
+                                       help="Fetch the metadata of DOIs into the metadata cache")
+    fetch_parser.add_argument("file", help="File with one DOI per line")
+    fetch_parser.set_defaults(func=fetch)
+
+    relink = commands.add_parser("relink-countries",
+                                 help="Re-link every output to the countries it names")
+    relink.set_defaults(func=relink_countries)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    open_driver()
+    try:
+        return args.func(args)
+    finally:
+        close_driver()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""In-process response cache invalidated by ingestion
+
+The data only changes when outputs are ingested, so responses of the list and
+detail endpoints can be reused until the next ingestion. Each response is
+stored under its endpoint, its validated query parameters and the current
+data version. :class:`app.crud.ingest.Ingest` bumps the version stored in the
+graph after every run, and each worker picks up the new version (see
+:func:`poll_data_version`) and drops all of its entries.
+
+Use :func:`cached` on an ``async def`` route handler::
+
+    @router.get("")
+    @cached
+    async def api_output_list(query: Annotated[FilterOutputList, Query()]):
+        ...
+
+Responses built from an in-process index that is refreshed after the data
+version changes, like the search results, are also keyed on the version the
+index reflects, see ``version`` of :func:`cached`.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from fastapi.logger import logger
+from pydantic import BaseModel
+
+from app.core.config import settings
+
+
+class ResponseCache:
+    """A bounded, thread-safe LRU cache whose entries expire after ``ttl`` seconds
+
+    Arguments
+    ---------
+    maxsize: int
+        Maximum number of entries before the least recently used is evicted
+    ttl: float
+        Seconds an entry stays valid
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, Tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return ``(True, value)`` for a live entry, else ``(False, None)``"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return False, None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self._entries),
+                    "maxsize": self.maxsize,
+                    "ttl": self.ttl,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions,
+                    "expirations": self.expirations,
+                    "invalidations": self.invalidations,
+                    "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+class DataVersion:
+    """The version of the data served by this worker
+
+    Setting a different version calls every subscriber, e.g. to clear a cache.
+    ``last_ingest`` is the time of the ingestion that produced the version, in
+    seconds since the epoch, or None if unknown.
+    """
+
+    def __init__(self):
+        self.current = 0
+        self.last_ingest: float | None = None
+        self._subscribers: list[Callable[[int], None]] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: Callable[[int], None]) -> None:
+        self._subscribers.append(callback)
+
+    def set(self, data_version: int, last_ingest: float | None = None) -> bool:
+        """Record a version, returning True if it differs from the current one"""
+        with self._lock:
+            if last_ingest is not None:
+                self.last_ingest = last_ingest
+            if data_version == self.current:
+                return False
+            logger.info(f"Data version changed from {self.current} to {data_version}")
+            self.current = data_version
+        for callback in self._subscribers:
+            callback(data_version)
+        return True
+
+
+response_cache = ResponseCache(maxsize=settings.CACHE_MAXSIZE,
+                               ttl=settings.CACHE_TTL)
+
+data_version = DataVersion()
+data_version.subscribe(lambda version: response_cache.clear())
+
+
+def _key_part(value: Any) -> Hashable:
+    if isinstance(value, BaseModel):
+        return json.dumps(value.model_dump(mode="json"), sort_keys=True)
+    return str(value)
+
+
+def cache_key(endpoint: str, kwargs: Dict[str, Any], version: Hashable = None) -> Hashable:
+    """Key of a response from its endpoint, validated parameters and index ``version``"""
+    params = tuple(sorted((name, _key_part(value)) for name, value in kwargs.items()))
+    return (endpoint, data_version.current, version, params)
+
+
+def cached(f=None, *, version: Callable[[], Hashable] = None):
+    """Cache the results of an ``async def`` route handler in :data:`response_cache`
+
+    The handler must be called with keyword arguments only, as FastAPI does.
+    Exceptions are not cached. Use ``@cached(version=...)`` to also key the
+    results on the value ``version`` returns, e.g. the data version an
+    index reflects.
+    """
+    if f is None:
+        return lambda f: cached(f, version=version)
+    endpoint = f"{f.__module__}.{f.__qualname__}"
+
+    @wraps(f)
+    async def with_cache_(**kwargs):
+        if not settings.CACHE_ENABLED:
+            return await f(**kwargs)
+        key = cache_key(endpoint, kwargs, version() if version else None)
+        found, value = response_cache.get(key)
+        if found:
+            return value
+        value = await f(**kwargs)
+        response_cache.set(key, value)
+        return value
+    return with_cache_
+
+
+async def poll_data_version(get_version: Callable, interval: float) -> None:
+    """Poll the data version stored in the graph every ``interval`` seconds
+
+    Run as a background task for the lifetime of the worker, so that an
+    ingestion handled by any worker invalidates the cache of every worker.
+    """
+    while True:
+        try:
+            data_version.set(**await get_version())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Could not read the data version: {str(e)}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,119 @@
+"""Conditional GET based on the data version
+
+Every successful ``GET`` response carries a strong ``ETag`` computed from the
+data version and the request URL, and a ``Last-Modified`` header with the
+time of the last ingestion. Both are known before the route runs, so a
+request whose ``If-None-Match`` (or, without it, ``If-Modified-Since``)
+matches is answered with ``304 Not Modified`` without querying the database.
+
+Search and suggestions are answered from the in-process indexes of
+:mod:`app.core.search` and :mod:`app.core.suggest`, which are refreshed some
+time after the data version changes. Their tags also include the version the
+index reflects, they get no ``Last-Modified``, as the time of the last
+ingestion does not date the index, and no validators before the index is
+built.
+"""
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Iterable, Mapping
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.cache import data_version
+from app.core.search import LiveIndex, search_index
+from app.core.suggest import suggest_index
+
+# Paths that are not derived from the graph, or that change between ingestions
+EXCLUDED_PREFIXES = ("/static", "/api/ingest", "/api/cache", "/docs", "/openapi.json",
+                     "/metrics")
+
+# Paths answered from an in-process index
+INDEXED_PREFIXES = {"/api/search": search_index, "/api/suggest": suggest_index}
+
+
+def compute_etag(version: int | str, path: str, query_string: bytes) -> str:
+    """Strong entity tag of the representation of ``path`` at ``version``"""
+    params = b"&".join(sorted(query_string.split(b"&")))
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{version}:{path}?".encode())
+    digest.update(params)
+    return f'"{digest.hexdigest()}"'
+
+
+def _tags(header: str) -> Iterable[str]:
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        yield tag
+
+
+def _not_modified_since(header: str, last_modified: float) -> bool:
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(last_modified) <= since
+
+
+class ConditionalGetMiddleware:
+    """Add ``ETag`` and ``Last-Modified`` headers and answer revalidations with 304"""
+
+    def __init__(self,
+                 app: ASGIApp,
+                 excluded: Iterable[str] = EXCLUDED_PREFIXES,
+                 indexed: Mapping[str, LiveIndex] = INDEXED_PREFIXES):
+        self.app = app
+        self.excluded = tuple(excluded)
+        self.indexed = dict(indexed)
+
+    def _index(self, path: str) -> LiveIndex | None:
+        for prefix, live in self.indexed.items():
+            if path.startswith(prefix):
+                return live
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (scope["type"] != "http"
+                or scope["method"] not in ("GET", "HEAD")
+                or scope["path"].startswith(self.excluded)):
+            await self.app(scope, receive, send)
+            return
+
+        version, last_ingest = data_version.current, data_version.last_ingest
+        if (live := self._index(scope["path"])) is not None:
+            if live.version is None:
+                await self.app(scope, receive, send)
+                return
+            version, last_ingest = f"{version}.{live.version}", None
+        etag = compute_etag(version, scope["path"], scope["query_string"])
+        validators = {"ETag": etag, "Cache-Control": "no-cache"}
+        if last_ingest is not None:
+            validators["Last-Modified"] = formatdate(last_ingest, usegmt=True)
+
+        request_headers = Headers(scope=scope)
+        if_none_match = request_headers.get("if-none-match")
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_none_match is not None:
+            not_modified = any(tag in ("*", etag) for tag in _tags(if_none_match))
+        elif if_modified_since is not None and last_ingest is not None:
+            not_modified = _not_modified_since(if_modified_since, last_ingest)
+        else:
+            not_modified = False
+
+        if not_modified:
+            response = Response(status_code=304, headers=validators)
+            await response(scope, receive, send)
+            return
+
+        async def send_with_validators(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = MutableHeaders(scope=message)
+                for name, value in validators.items():
+                    if name not in headers:
+                        headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_validators)
@@ -19,5 +19,56 @@ class Settings:
         self.MG_USER = os.getenv("MG_USER")
         self.MG_PASS = os.getenv("MG_PASS")
 
+        # Connection pool of the process-wide driver
+        self.MG_MAX_POOL_SIZE = int(os.getenv("MG_MAX_POOL_SIZE", 100))
+        self.MG_MAX_CONNECTION_LIFETIME = float(
+            os.getenv("MG_MAX_CONNECTION_LIFETIME", 3600))
+        self.MG_CONNECTION_ACQUISITION_TIMEOUT = float(
+            os.getenv("MG_CONNECTION_ACQUISITION_TIMEOUT", 60))
+        self.MG_FETCH_SIZE = int(os.getenv("MG_FETCH_SIZE", 1000))
+
+        # Records pulled from the database at a time by /api/outputs/export
+        self.EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", 500))
+
+        # Queries slower than this many seconds are logged and profiled
+        self.SLOW_QUERY_THRESHOLD = float(os.getenv("SLOW_QUERY_THRESHOLD", 0.5))
+        self.SLOW_QUERY_LOG_FILE = os.getenv("SLOW_QUERY_LOG_FILE", "slow_queries.jsonl")
+        self.SLOW_QUERY_PROFILE = os.getenv("SLOW_QUERY_PROFILE", "true").lower() in ("1", "true", "yes")
+        self.SLOW_QUERY_PROFILE_INTERVAL = float(os.getenv("SLOW_QUERY_PROFILE_INTERVAL", 300))
+
+        # Background ingestion jobs
+        self.INGEST_JOBS_DIR = os.getenv("INGEST_JOBS_DIR", "ingest_jobs")
+        self.INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", 200))
+        self.INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 1000))
+
+        # Fetching of DOI metadata, see app/pipeline/fetch.py
+        self.OPENALEX_URL = os.getenv("OPENALEX_URL", "https://api.openalex.org")
+        self.OPENALEX_MAILTO = os.getenv("OPENALEX_MAILTO", "")
+        self.OPENAIRE_URL = os.getenv("OPENAIRE_URL", "https://api.openaire.eu/graph/v1")
+        self.METADATA_CACHE_DIR = os.getenv("METADATA_CACHE_DIR", "metadata_cache")
+        self.METADATA_CACHE_TTL = float(os.getenv("METADATA_CACHE_TTL", 30 * 24 * 3600))
+        self.METADATA_CONCURRENCY = int(os.getenv("METADATA_CONCURRENCY", 32))
+        self.METADATA_PER_HOST = int(os.getenv("METADATA_PER_HOST", 8))
+        self.METADATA_RATE = float(os.getenv("METADATA_RATE", 10))
+
+        # Create missing indexes and constraints on start-up
+        self.SCHEMA_BOOTSTRAP = os.getenv("SCHEMA_BOOTSTRAP", "true").lower() in ("1", "true", "yes")
+
+        # In-process response cache, invalidated when the data version changes
+        self.CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+        self.CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", 2048))
+        self.CACHE_TTL = float(os.getenv("CACHE_TTL", 3600))
+        self.CACHE_VERSION_POLL = float(os.getenv("CACHE_VERSION_POLL", 5))
+        self.FRAGMENT_CACHE_MAXSIZE = int(os.getenv("FRAGMENT_CACHE_MAXSIZE", 50000))
+
+        # Validate every response against its model, see app/core/serialise.py
+        self.STRICT_RESPONSES = os.getenv("STRICT_RESPONSES", "false").lower() in ("1", "true", "yes")
+
+        # In-process full-text search index, see app/core/search.py
+        self.SEARCH_ENABLED = os.getenv("SEARCH_ENABLED", "true").lower() in ("1", "true", "yes")
+
+        # In-process prefix suggestions, see app/core/suggest.py
+        self.SUGGEST_ENABLED = os.getenv("SUGGEST_ENABLED", "true").lower() in ("1", "true", "yes")
+
 
 settings = Settings()
@@ -0,0 +1,41 @@
+"""Opaque cursor tokens for keyset pagination
+
+A cursor records the sort key of the last row of a page, so that the next
+page can be fetched with a range predicate on that key rather than by
+skipping over all of the preceding rows::
+
+    >>> token = encode_cursor("output", 2023, "f05b1fc5-f831-4755-966f-06de074ab51c")
+    >>> decode_cursor(token, "output")
+    [2023, 'f05b1fc5-f831-4755-966f-06de074ab51c']
+
+The token is URL-safe base64 encoded JSON. It is tagged with the kind of
+list it belongs to so that a cursor from one list is rejected by another.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from typing import Any
+
+
+def encode_cursor(kind: str, *key: Any) -> str:
+    """Encode the sort key of the last row of a page as an opaque token"""
+    payload = json.dumps([kind, *key], separators=(",", ":"))
+    return urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, kind: str) -> list[Any]:
+    """Decode a token created by :func:`encode_cursor`
+
+    Raises
+    ------
+    ValueError
+        If the token is malformed or belongs to a different kind of list
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(urlsafe_b64decode(padded.encode()))
+    except (BinasciiError, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor '{token}'") from e
+    if not isinstance(payload, list) or len(payload) < 2 or payload[0] != kind:
+        raise ValueError(f"Invalid cursor '{token}' for a list of {kind}s")
+    return payload[1:]
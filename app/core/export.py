@@ -0,0 +1,72 @@
+"""Serialisation of streamed outputs for ``/api/outputs/export``
+
+Each output is validated against :class:`OutputModel` and serialised as soon
+as it is pulled from the database, one line at a time, so an export never
+holds more than one output in memory. The status of the response is sent
+before the first line, so an output that does not validate is logged and
+left out rather than ending the export part way.
+"""
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Dict
+
+from fastapi.logger import logger
+from pydantic import ValidationError
+
+from app.schemas.output import OutputModel
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+CSV_COLUMNS = ["uuid", "doi", "title", "result_type", "abstract", "journal",
+               "publisher", "publication_year", "publication_month",
+               "publication_day", "cited_by_count", "cited_by_count_date",
+               "countries", "authors"]
+
+
+def _output(output: Dict[str, Any]) -> Dict[str, Any] | None:
+    try:
+        return OutputModel.model_validate(output).model_dump(mode="json")
+    except ValidationError as e:
+        logger.warning(f"Left output {output.get('uuid')} out of the export: {e}")
+        return None
+
+
+def csv_row(output: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten an output to the :data:`CSV_COLUMNS`
+
+    Countries are listed by id and authors by name, each separated by "; ".
+    """
+    row = {column: output.get(column) for column in CSV_COLUMNS}
+    row["countries"] = "; ".join(country["id"] for country in output["countries"] or [])
+    row["authors"] = "; ".join(f"{author['first_name']} {author['last_name']}"
+                               for author in output["authors"])
+    return row
+
+
+async def ndjson_lines(outputs: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """One JSON document per output, each on its own line"""
+    async for output in outputs:
+        if (document := _output(output)) is not None:
+            yield json.dumps(document, ensure_ascii=False) + "\n"
+
+
+async def csv_lines(outputs: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """A header line, then one line per output"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS)
+
+    def line(write, *args) -> str:
+        write(*args)
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    yield line(writer.writeheader)
+    async for output in outputs:
+        if (document := _output(output)) is not None:
+            yield line(writer.writerow, csv_row(document))
+
+
+SERIALISERS = {"ndjson": ndjson_lines, "csv": csv_lines}
@@ -0,0 +1,64 @@
+"""Cache of rendered HTML fragments of outputs and authors
+
+The card of an output or author is the same on every page listing it, so it
+is rendered once per data version and reused by the list pages, which then
+only join pre-rendered cards. Templates call :func:`render_fragment`::
+
+    {% for output in results %}
+        {{ fragment('output_card.html', output=output) }}
+    {% endfor %}
+
+Fragments are stored under the template, the uuid of the entity, the data
+version and the base URL of the request, as cards hold absolute links.
+:data:`VARIANTS` adds the parts of an entity that vary between the queries
+listing it, e.g. the workstreams of an author depend on the workstream
+filter. Every fragment is dropped when the data version changes.
+"""
+from typing import Any, Callable, Dict, Hashable
+
+from jinja2 import pass_context
+from jinja2.runtime import Context
+from markupsafe import Markup
+
+from app.core.cache import ResponseCache, data_version
+from app.core.config import settings
+
+
+def _ids(entities) -> Hashable:
+    return tuple(entity["id"] for entity in entities or ())
+
+
+VARIANTS: Dict[str, Callable[[Any], Hashable]] = {
+    "author_card.html": lambda author: (_ids(author.get("workstreams")),
+                                        _ids(author.get("affiliations"))),
+}
+
+fragment_cache = ResponseCache(maxsize=settings.FRAGMENT_CACHE_MAXSIZE,
+                               ttl=settings.CACHE_TTL)
+data_version.subscribe(lambda version: fragment_cache.clear())
+
+
+@pass_context
+def render_fragment(context: Context, template_name: str, **entity: Any) -> Markup:
+    """Render ``template_name`` with a single entity, or reuse its cached rendering
+
+    Arguments
+    ---------
+    template_name: str
+        Template of the fragment, rendered with ``request`` and the entity
+    **entity
+        The entity under the name the template expects, e.g. ``output=output``
+    """
+    (name, value), = entity.items()
+    request = context["request"]
+    template = context.environment.get_template(template_name)
+    if not settings.CACHE_ENABLED:
+        return Markup(template.render(request=request, **entity))
+    variant = VARIANTS.get(template_name)
+    key = (template_name, str(value["uuid"]), data_version.current, str(request.base_url),
+           variant(value) if variant else None)
+    found, html = fragment_cache.get(key)
+    if not found:
+        html = Markup(template.render(request=request, **entity))
+        fragment_cache.set(key, html)
+    return html
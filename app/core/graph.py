@@ -0,0 +1,167 @@
+"""Compact wire formats of the co-authorship graph for ``/api/graph``
+
+Nodes are numbered in the order they are sent and each edge refers to its
+author and output by those numbers, instead of repeating two uuids per edge.
+Three encodings are available:
+
+``json``
+    Streamed as it is read from the database::
+
+        {"fields": ["id", "group", "name", "url"],
+         "nodes": [["<uuid>", 0, "Jane Doe", "https://orcid.org/..."], ...],
+         "links": [[0, 12], [0, 13], ...]}
+
+``columnar``
+    One array per field, which compresses better::
+
+        {"nodes": {"id": [...], "group": [...], "name": [...], "url": [...]},
+         "links": {"source": [0, 0, ...], "target": [12, 13, ...]}}
+
+``binary``
+    The magic bytes ``RIG1``, the length of the columnar nodes as a
+    little-endian uint32, the columnar nodes as UTF-8 JSON, then the
+    ``source`` and ``target`` of each edge as pairs of little-endian uint32
+    up to the end of the body, streamed as they are read.
+
+Any of them can be compressed as it is streamed with :func:`gzip_chunks`.
+"""
+import json
+import struct
+import zlib
+from array import array
+from typing import Any, AsyncIterator, Dict, List
+
+FIELDS = ["id", "group", "name", "url"]
+
+MAGIC = b"RIG1"
+
+MEDIA_TYPES = {"json": "application/json",
+               "columnar": "application/json",
+               "binary": "application/octet-stream"}
+
+# Bytes gathered before a chunk is sent
+CHUNK_SIZE = 64 * 1024
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+class NodeIndex:
+    """Number nodes in the order they are added, and look edges up by uuid"""
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+
+    def add(self, node: Dict[str, Any]) -> bool:
+        if node["id"] in self.index:
+            return False
+        self.index[node["id"]] = len(self.index)
+        return True
+
+    def edge(self, edge: Dict[str, str]) -> tuple[int, int] | None:
+        """The numbers of the ends of ``edge``, or None if one of them is unknown"""
+        source = self.index.get(edge["source"])
+        target = self.index.get(edge["target"])
+        if source is None or target is None:
+            return None
+        return source, target
+
+
+class _Chunks:
+    """Gather small pieces of the body into chunks of about ``CHUNK_SIZE`` bytes"""
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.size = 0
+
+    def add(self, part: bytes) -> bytes | None:
+        self.parts.append(part)
+        self.size += len(part)
+        if self.size >= CHUNK_SIZE:
+            return self.flush()
+        return None
+
+    def flush(self) -> bytes:
+        chunk = b"".join(self.parts)
+        self.parts, self.size = [], 0
+        return chunk
+
+
+async def _columnar_nodes(nodes: AsyncIterator[Dict[str, Any]],
+                          index: NodeIndex) -> Dict[str, list]:
+    columns = {field: [] for field in FIELDS}
+    async for node in nodes:
+        if index.add(node):
+            for field in FIELDS:
+                columns[field].append(node[field])
+    return columns
+
+
+async def encode_json(nodes: AsyncIterator[Dict[str, Any]],
+                      edges: AsyncIterator[Dict[str, str]]) -> AsyncIterator[bytes]:
+    index, chunks = NodeIndex(), _Chunks()
+    yield f'{{"fields":{_dumps(FIELDS)},"nodes":['.encode()
+    separator = b""
+    async for node in nodes:
+        if index.add(node):
+            if chunk := chunks.add(separator + _dumps([node[field] for field in FIELDS]).encode()):
+                yield chunk
+            separator = b","
+    yield chunks.flush() + b'],"links":['
+    separator = b""
+    async for edge in edges:
+        if link := index.edge(edge):
+            if chunk := chunks.add(b"%s[%d,%d]" % (separator, *link)):
+                yield chunk
+            separator = b","
+    yield chunks.flush() + b"]}"
+
+
+async def encode_columnar(nodes: AsyncIterator[Dict[str, Any]],
+                          edges: AsyncIterator[Dict[str, str]]) -> AsyncIterator[bytes]:
+    index = NodeIndex()
+    columns = await _columnar_nodes(nodes, index)
+    yield f'{{"nodes":{_dumps(columns)},'.encode()
+    del columns
+    sources, targets = array("I"), array("I")
+    async for edge in edges:
+        if link := index.edge(edge):
+            sources.append(link[0])
+            targets.append(link[1])
+    yield (f'"links":{{"source":{_dumps(sources.tolist())},'
+           f'"target":{_dumps(targets.tolist())}}}}}').encode()
+
+
+async def encode_binary(nodes: AsyncIterator[Dict[str, Any]],
+                        edges: AsyncIterator[Dict[str, str]]) -> AsyncIterator[bytes]:
+    index, chunks = NodeIndex(), _Chunks()
+    header = _dumps(await _columnar_nodes(nodes, index)).encode()
+    yield MAGIC + struct.pack("<I", len(header)) + header
+    pair = struct.Struct("<II")
+    async for edge in edges:
+        if link := index.edge(edge):
+            if chunk := chunks.add(pair.pack(*link)):
+                yield chunk
+    yield chunks.flush()
+
+
+ENCODERS = {"json": encode_json, "columnar": encode_columnar, "binary": encode_binary}
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """Compress a streamed body with gzip, chunk by chunk"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        if compressed := compressor.compress(chunk):
+            yield compressed
+    yield compressor.flush()
+
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    """Whether an ``Accept-Encoding`` header allows gzip"""
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
@@ -0,0 +1,103 @@
+"""File-backed store of background jobs
+
+Each job is a JSON file in ``INGEST_JOBS_DIR``, replaced atomically on every
+update, so that its status can be read by any worker process. The
+:func:`writer_lock` file lock ensures only one job writes to the graph at a
+time across all workers and processes. Jobs started later wait for the lock
+in the ``queued`` state. Workers take it too while they build missing
+counters on start-up, see :func:`app.main.ensure_counters`.
+"""
+import fcntl
+import json
+import os
+import tempfile
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+from app.core.config import settings
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class JobStore:
+    """Create, update and read jobs stored as JSON files in ``directory``"""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def _path(self, id: str) -> Path:
+        # The id is validated as a uuid, so it cannot escape the directory
+        return self.directory / f"{uuid.UUID(id)}.json"
+
+    def create(self, **fields) -> Dict[str, Any]:
+        job = {"id": str(uuid.uuid4()),
+               "status": "queued",
+               "submitted_at": _now(),
+               "started_at": None,
+               "finished_at": None,
+               "error": None} | fields
+        self._write(job)
+        return job
+
+    def get(self, id: str) -> Dict[str, Any]:
+        """Return the job ``id``
+
+        Raises
+        ------
+        KeyError
+            If there is no job ``id``
+        """
+        try:
+            with open(self._path(id)) as job_file:
+                return json.load(job_file)
+        except (ValueError, FileNotFoundError) as e:
+            raise KeyError(f"Job {id} not found") from e
+
+    def update(self, id: str, **fields) -> Dict[str, Any]:
+        job = self.get(id) | fields
+        self._write(job)
+        return job
+
+    def start(self, id: str) -> Dict[str, Any]:
+        return self.update(id, status="running", started_at=_now())
+
+    def finish(self, id: str, **fields) -> Dict[str, Any]:
+        return self.update(id, status="succeeded", finished_at=_now(), **fields)
+
+    def fail(self, id: str, error: str) -> Dict[str, Any]:
+        return self.update(id, status="failed", finished_at=_now(), error=error)
+
+    def _write(self, job: Dict[str, Any]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as job_file:
+            json.dump(job, job_file)
+        os.replace(tmp, self._path(job["id"]))
+
+
+@contextmanager
+def writer_lock(directory: str, wait: bool = True) -> Iterator[bool]:
+    """Hold the exclusive lock of the single graph writer, waiting for it if needed
+
+    With ``wait=False`` yield False at once, without the lock, if another
+    process holds it, and True otherwise.
+    """
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    with open(Path(directory) / "writer.lock", "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+jobs = JobStore(settings.INGEST_JOBS_DIR)
@@ -0,0 +1,125 @@
+"""Prometheus metrics of database queries and HTTP requests
+
+Every query run through :func:`app.db.session.connect_to_db` or
+:func:`app.db.session.connect_to_async_db` is recorded under the qualified
+name of the CRUD method that ran it, e.g. ``AsyncAuthor.fetch_author_detail``:
+
+- ``research_index_query_seconds``: wall time of ``execute_query``, of a
+  managed transaction (``execute_read`` or ``execute_write``) as a whole, or
+  of ``session.run`` until the session closes or runs the next query, so a
+  streamed query includes the time the caller took to read the stream
+- ``research_index_query_available_after_seconds``: time until the server
+  had the first record available (``summary.result_available_after``)
+- ``research_index_query_consumed_after_seconds``: time until the server
+  had streamed the last record (``summary.result_consumed_after``)
+- ``research_index_query_records``: number of records returned
+- ``research_index_query_errors_total``: number of queries that raised
+
+The server timings and the number of records are only known for
+``execute_query``, which returns the records with their summary.
+
+:class:`MetricsMiddleware` records ``research_index_http_request_seconds``
+for each route template, method and status code.
+
+The app runs several worker processes. When ``PROMETHEUS_MULTIPROC_DIR`` is
+set, each worker writes its samples there and ``/metrics`` aggregates the
+samples of all of them. The directory must be emptied before the workers
+start (see the ``Dockerfile``).
+"""
+import os
+import time
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry,
+                               Counter, Histogram, generate_latest, multiprocess)
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+
+RECORD_BUCKETS = (0, 1, 5, 10, 20, 50, 100, 200, 500, 1000, 5000, 10000)
+
+QUERY_SECONDS = Histogram("research_index_query_seconds",
+                          "Wall time of a database query",
+                          ["query"], buckets=LATENCY_BUCKETS)
+QUERY_AVAILABLE_AFTER = Histogram("research_index_query_available_after_seconds",
+                                  "Server time until the first record was available",
+                                  ["query"], buckets=LATENCY_BUCKETS)
+QUERY_CONSUMED_AFTER = Histogram("research_index_query_consumed_after_seconds",
+                                 "Server time until the last record was consumed",
+                                 ["query"], buckets=LATENCY_BUCKETS)
+QUERY_RECORDS = Histogram("research_index_query_records",
+                          "Number of records returned by a database query",
+                          ["query"], buckets=RECORD_BUCKETS)
+QUERY_ERRORS = Counter("research_index_query_errors",
+                       "Number of database queries that raised an error",
+                       ["query"])
+
+HTTP_SECONDS = Histogram("research_index_http_request_seconds",
+                         "Latency of HTTP requests",
+                         ["method", "route", "status"], buckets=LATENCY_BUCKETS)
+
+EXCLUDED_PATHS = ("/metrics",)
+
+
+def record_query(name: str, seconds: float, result) -> None:
+    """Record a query that returned the ``(records, summary, keys)`` ``result``"""
+    QUERY_SECONDS.labels(name).observe(seconds)
+    records, summary = result[0], result[1]
+    QUERY_RECORDS.labels(name).observe(len(records))
+    if summary.result_available_after is not None:
+        QUERY_AVAILABLE_AFTER.labels(name).observe(summary.result_available_after / 1000)
+    if summary.result_consumed_after is not None:
+        QUERY_CONSUMED_AFTER.labels(name).observe(summary.result_consumed_after / 1000)
+
+
+def record_query_time(name: str, seconds: float) -> None:
+    """Record a transaction or streamed query, whose records and summary are not known"""
+    QUERY_SECONDS.labels(name).observe(seconds)
+
+
+def record_query_error(name: str) -> None:
+    QUERY_ERRORS.labels(name).inc()
+
+
+def _route(scope: Scope) -> str:
+    if route := scope.get("route"):
+        return route.path
+    if scope["path"].startswith("/static"):
+        return "/static"
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Record the latency of each request by route template"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in EXCLUDED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_SECONDS.labels(scope["method"], _route(scope), str(status)).observe(
+                time.perf_counter() - start)
+
+
+def latest_metrics() -> tuple[bytes, str]:
+    """The current metrics in the Prometheus text format, and its content type"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
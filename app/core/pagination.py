@@ -0,0 +1,53 @@
+"""Page links of the web pages
+
+A list page links to a fixed window of pages around the current one and to
+the first and last pages, so a page renders the same number of links however
+many results there are.
+"""
+from typing import Any, Dict, List
+
+# Pages linked on each side of the current page
+WINDOW = 2
+
+
+def page_window(total: int | None,
+                skip: int,
+                limit: int,
+                window: int = WINDOW) -> List[Dict[str, Any] | None]:
+    """Pages to link to, with None where pages are left out
+
+    Arguments
+    ---------
+    total: int, optional
+        Number of results, or None if unknown, in which case the current
+        page is taken as the last one, so the first page and the pages up to
+        the current one are listed, but none after it
+    skip: int
+        Number of results before the current page
+    limit: int
+        Number of results per page
+    window: int, default = 2
+        Pages listed on each side of the current page
+
+    Returns
+    -------
+    list
+        ``{"number": 1, "skip": 0, "active": True}`` for each listed page
+    """
+    current = skip // limit
+    if total is None:
+        last = current
+    elif total <= 0:
+        return []
+    else:
+        last = (total - 1) // limit
+    numbers = sorted({0, last} | set(range(max(0, current - window),
+                                           min(last, current + window) + 1)))
+    pages: List[Dict[str, Any] | None] = []
+    for number in numbers:
+        if pages and number > pages[-1]["number"]:
+            pages.append(None)
+        pages.append({"number": number + 1,
+                      "skip": number * limit,
+                      "active": number * limit == skip})
+    return pages
@@ -0,0 +1,302 @@
+"""In-process full-text search over output titles, abstracts and journals
+
+:class:`InvertedIndex` ranks outputs with BM25. Each field contributes its
+term frequencies scaled by a weight, so a term in the title counts more
+than the same term in the abstract. Documents are numbered as they are added.
+Each term has a postings list of document numbers, in an ``array('I')``, and
+of weighted term frequencies, in an ``array('f')``, instead of Python
+objects per posting. Document lengths, result types and countries are kept
+per document number, so the ``result_type`` and ``country`` filters are
+applied without leaving the process.
+
+A document that is added again, because its output was updated, replaces
+the previous one, which is left as a tombstone until enough of them have
+accumulated for :meth:`InvertedIndex.compact` to renumber the documents.
+
+Each worker holds its own index in :data:`search_index`. It is built from
+the graph on start-up and then refreshed by :func:`poll_index` with the
+outputs modified since the last refresh whenever the data version changes.
+
+Ranking and refreshing are pure Python and take time in proportion to the
+postings of the query terms and to the modified documents, so both run in
+the threadpool rather than on the event loop, and :attr:`LiveIndex.lock`
+keeps a search from reading the index while it is refreshed. Queries of
+rare terms take well under a millisecond, but a query of terms found in
+most documents takes about 100 ms per 100,000 documents, see
+``benchmarks/search_index.py``.
+"""
+import asyncio
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.logger import logger
+
+from app.core.cache import data_version
+
+RESULT_TYPES = ["publication", "dataset", "software", "other"]
+
+FIELD_WEIGHTS = {"title": 3.0, "abstract": 1.0, "journal": 0.5}
+
+STOPWORDS = frozenset("""
+    a an and are as at be by for from has have in is it its of on or that the
+    their this to was were which with
+    """.split())
+
+TOKEN = re.compile(r"\w+")
+
+
+def normalise(text: str) -> str:
+    """Lower case ``text`` and strip its accents"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: str | None) -> List[str]:
+    """Split ``text`` into normalised terms, without stopwords"""
+    if not text:
+        return []
+    return [token for token in TOKEN.findall(normalise(text))
+            if len(token) > 1 and token not in STOPWORDS]
+
+
+class InvertedIndex:
+    """BM25 ranking of documents with ``title``, ``abstract`` and ``journal`` fields
+
+    Arguments
+    ---------
+    k1: float
+        Saturation of the term frequency
+    b: float
+        Strength of the document length normalisation
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._terms: Dict[str, int] = {}
+        self._postings: List[array] = []
+        self._frequencies: List[array] = []
+        self._uuids: List[str | None] = []
+        self._numbers: Dict[str, int] = {}
+        self._lengths = array("f")
+        self._types = array("B")
+        self._countries: List[Tuple[str, ...]] = []
+        self._total_length = 0.0
+        self._norms: array | None = None
+
+    def __len__(self) -> int:
+        return len(self._numbers)
+
+    def __contains__(self, uuid: str) -> bool:
+        return uuid in self._numbers
+
+    @property
+    def tombstones(self) -> int:
+        return len(self._uuids) - len(self._numbers)
+
+    def add(self, document: Dict[str, Any]) -> None:
+        """Index an output, replacing the previous version of the same ``uuid``"""
+        uuid = document["uuid"]
+        self.remove(uuid)
+        frequencies: Counter = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(document.get(field)):
+                frequencies[term] += weight
+        number = len(self._uuids)
+        for term, frequency in frequencies.items():
+            id = self._terms.get(term)
+            if id is None:
+                id = self._terms[term] = len(self._postings)
+                self._postings.append(array("I"))
+                self._frequencies.append(array("f"))
+            self._postings[id].append(number)
+            self._frequencies[id].append(frequency)
+        length = sum(frequencies.values())
+        self._uuids.append(uuid)
+        self._numbers[uuid] = number
+        self._lengths.append(length)
+        self._total_length += length
+        result_type = document.get("result_type")
+        self._types.append(RESULT_TYPES.index(result_type)
+                           if result_type in RESULT_TYPES else 255)
+        self._countries.append(tuple(document.get("countries") or ()))
+        self._norms = None
+
+    def remove(self, uuid: str) -> bool:
+        """Leave the document of ``uuid`` as a tombstone, returning False if absent"""
+        number = self._numbers.pop(uuid, None)
+        if number is None:
+            return False
+        self._uuids[number] = None
+        self._total_length -= self._lengths[number]
+        self._norms = None
+        return True
+
+    def compact(self) -> None:
+        """Drop the tombstones from the postings and renumber the documents"""
+        numbers = array("i", [-1]) * len(self._uuids)
+        live = [number for number, uuid in enumerate(self._uuids) if uuid is not None]
+        for new, old in enumerate(live):
+            numbers[old] = new
+        terms, postings, frequencies = {}, [], []
+        for term, id in self._terms.items():
+            kept = [(numbers[number], frequency) for number, frequency
+                    in zip(self._postings[id], self._frequencies[id]) if numbers[number] >= 0]
+            if kept:
+                terms[term] = len(postings)
+                postings.append(array("I", (number for number, _ in kept)))
+                frequencies.append(array("f", (frequency for _, frequency in kept)))
+        self._terms, self._postings, self._frequencies = terms, postings, frequencies
+        self._uuids = [self._uuids[old] for old in live]
+        self._numbers = {uuid: number for number, uuid in enumerate(self._uuids)}
+        self._lengths = array("f", (self._lengths[old] for old in live))
+        self._types = array("B", (self._types[old] for old in live))
+        self._countries = [self._countries[old] for old in live]
+        self._norms = None
+
+    def update(self, documents: Iterable[Dict[str, Any]]) -> int:
+        """Add ``documents``, compacting if a quarter of the index are tombstones"""
+        added = 0
+        for document in documents:
+            self.add(document)
+            added += 1
+        if self.tombstones > max(1000, len(self) // 4):
+            self.compact()
+        return added
+
+    def _length_norms(self) -> array:
+        """The BM25 length normalisation of each document, kept until the index changes"""
+        if self._norms is None:
+            average = self._total_length / (len(self._numbers) or 1) or 1.0
+            k1, b = self.k1, self.b
+            self._norms = array("f", (k1 * (1 - b + b * length / average)
+                                      for length in self._lengths))
+        return self._norms
+
+    def search(self,
+               query: str,
+               result_type: str | None = None,
+               country: str | None = None,
+               skip: int = 0,
+               limit: int = 20) -> Tuple[int, List[Tuple[str, float]]]:
+        """Rank the documents matching any term of ``query``
+
+        Returns
+        -------
+        tuple
+            The number of matching documents and a page of ``(uuid, score)``
+            pairs, best first
+        """
+        ids = [self._terms[term] for term in dict.fromkeys(tokenize(query))
+               if term in self._terms]
+        if not ids or not self._numbers:
+            return 0, []
+        documents = len(self._numbers)
+        norms = self._length_norms()
+        scores: Dict[int, float] = {}
+        for id in ids:
+            postings = self._postings[id]
+            idf = math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+            weight = idf * (self.k1 + 1)
+            for number, frequency in zip(postings, self._frequencies[id]):
+                scores[number] = (scores.get(number, 0.0)
+                                  + weight * frequency / (frequency + norms[number]))
+
+        type_code = RESULT_TYPES.index(result_type) if result_type in RESULT_TYPES else None
+        uuids, types, countries = self._uuids, self._types, self._countries
+        matches = [(score, number) for number, score in scores.items()
+                   if uuids[number] is not None
+                   and (type_code is None or types[number] == type_code)
+                   and (country is None or country in countries[number])]
+        top = heapq.nlargest(skip + limit, matches, key=lambda match: (match[0], -match[1]))
+        return len(matches), [(uuids[number], score) for score, number in top[skip:]]
+
+
+class LiveIndex:
+    """An index of this worker, with the data version and modification time it reflects
+
+    ``index`` is None until the index is first built. Any index with an
+    ``update`` method taking documents with a ``modified`` time can be held.
+    The index is only updated while holding ``lock``, which readers of an
+    index updated in place must hold too.
+
+    Arguments
+    ---------
+    name: str
+        Name of the index in the logs
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.index: Any = None
+        self.version: int | None = None
+        self.modified = 0.0
+        self.lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.index is not None
+
+    def replace(self, index: Any, version: int | None, modified: float) -> None:
+        self.index, self.version, self.modified = index, version, modified
+
+    def apply(self, documents: List[Dict[str, Any]], version: int | None) -> int:
+        """Index the documents modified since the last refresh"""
+        with self.lock:
+            added = self.index.update(documents)
+        self.modified = max([self.modified] + [document["modified"] for document in documents])
+        self.version = version
+        return added
+
+
+search_index = LiveIndex("search")
+
+
+async def poll_index(live: LiveIndex,
+                     build: Callable[[], Awaitable[Tuple[Any, float]]],
+                     changed_since: Callable[[float], Awaitable[List[Dict[str, Any]]]],
+                     interval: float) -> None:
+    """Build the index of ``live``, then refresh it whenever the data version changes
+
+    Arguments
+    ---------
+    live: LiveIndex
+        Holder of the index, such as :data:`search_index`
+    build: callable
+        Returns a new index of every document and the latest modification time
+    changed_since: callable
+        Returns the documents modified after a time
+    interval: float
+        Seconds between checks of the data version
+    """
+    while not live.ready:
+        try:
+            version = data_version.current
+            index, modified = await build()
+            live.replace(index, version, modified)
+            logger.info(f"Built the {live.name} index of {len(index)} documents")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Could not build the {live.name} index: {str(e)}")
+            await asyncio.sleep(interval)
+    while True:
+        await asyncio.sleep(interval)
+        version = data_version.current
+        if version == live.version:
+            continue
+        try:
+            documents = await changed_since(live.modified)
+            added = await run_in_threadpool(live.apply, documents, version)
+            logger.info(f"Indexed {added} modified documents for {live.name}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Could not refresh the {live.name} index: {str(e)}")
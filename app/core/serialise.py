@@ -0,0 +1,149 @@
+"""Serialisation of route results without re-validating them
+
+The CRUD classes build their results from the graph, whose contents were
+validated when they were ingested, so validating every result again against
+its response model, as FastAPI does, is wasted work on each request.
+:func:`compile_serialiser` turns a response model into a function projecting
+a result onto the fields of the model, filling in defaults and converting
+UUIDs and URLs to strings, without validating the values. :func:`serialised`
+applies it to the result of a route and encodes it with orjson.
+
+Set ``STRICT_RESPONSES=true`` to validate results against their response
+models instead, e.g. while debugging a query.
+"""
+import inspect
+import types
+from functools import lru_cache, wraps
+from typing import Any, Callable, Dict, List, Tuple, Union, get_args, get_origin
+from uuid import UUID
+
+import orjson
+from fastapi.exceptions import ResponseValidationError
+from fastapi.responses import Response
+from pydantic import BaseModel, ValidationError
+from pydantic_core import PydanticUndefined, Url
+
+from app.core.config import settings
+
+Serialiser = Callable[[Any], Any]
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _string(value: Any) -> Any:
+    return None if value is None else str(value)
+
+
+def _list(item: Serialiser) -> Serialiser:
+    def serialise(value):
+        return None if value is None else [item(element) for element in value]
+    return serialise
+
+
+def _dict(item: Serialiser) -> Serialiser:
+    def serialise(value):
+        return None if value is None else {key: item(element) for key, element in value.items()}
+    return serialise
+
+
+def _union(args: Tuple[Any, ...]) -> Serialiser:
+    serialisers = [_type_serialiser(arg) for arg in args if arg is not type(None)]
+    if all(serialiser is _identity for serialiser in serialisers):
+        return _identity
+    if len(serialisers) == 1:
+        return serialisers[0]
+    # Results of a union are passed as they are, except models
+    return lambda value: value.model_dump(mode="json") if isinstance(value, BaseModel) else value
+
+
+def _type_serialiser(annotation: Any) -> Serialiser:
+    origin = get_origin(annotation)
+    if origin in (Union, types.UnionType):
+        return _union(get_args(annotation))
+    if origin in (list, List, tuple, set, frozenset):
+        item = _type_serialiser(get_args(annotation)[0]) if get_args(annotation) else _identity
+        return _list(item)
+    if origin in (dict, Dict):
+        args = get_args(annotation)
+        return _dict(_type_serialiser(args[1]) if args else _identity)
+    if inspect.isclass(annotation):
+        if issubclass(annotation, BaseModel):
+            return compile_serialiser(annotation)
+        if issubclass(annotation, (UUID, Url)):
+            return _string
+    return _identity
+
+
+@lru_cache(maxsize=None)
+def compile_serialiser(model: type[BaseModel]) -> Serialiser:
+    """Compile a function projecting a dict or model instance onto the fields of ``model``
+
+    The function returns a dict holding the fields of ``model`` in order,
+    taking missing fields from their defaults, and ignoring extra keys. Nested
+    models, lists and dicts of them are projected in turn. UUIDs and URLs are
+    converted to strings, any other value is passed as it is.
+    """
+    fields = []
+    for name, info in model.model_fields.items():
+        default = info.get_default(call_default_factory=True)
+        fields.append((name,
+                       None if default is PydanticUndefined else default,
+                       _type_serialiser(info.annotation)))
+
+    def serialise(value: Any) -> Dict[str, Any] | None:
+        if value is None:
+            return None
+        if isinstance(value, BaseModel):
+            value = value.__dict__
+        get = value.get
+        result = {}
+        for key, default, convert in fields:
+            field = get(key, default)
+            result[key] = field if convert is _identity else convert(field)
+        return result
+    return serialise
+
+
+def _return_model(f: Callable) -> type[BaseModel]:
+    model = inspect.signature(f).return_annotation
+    if not (inspect.isclass(model) and issubclass(model, BaseModel)):
+        raise TypeError(f"{f.__qualname__} does not declare a response model")
+    return model
+
+
+def encode(model: type[BaseModel], result: Any) -> bytes:
+    """Encode ``result`` as JSON in the shape of ``model``
+
+    Raises
+    ------
+    fastapi.exceptions.ResponseValidationError
+        If ``STRICT_RESPONSES`` is set and ``result`` does not validate
+    """
+    if settings.STRICT_RESPONSES:
+        try:
+            content = model.model_validate(result).model_dump(mode="json")
+        except ValidationError as e:
+            raise ResponseValidationError(errors=e.errors(include_url=False)) from e
+    else:
+        content = compile_serialiser(model)(result)
+    return orjson.dumps(content)
+
+
+def serialised(f):
+    """Encode the result of an ``async def`` route handler with :func:`encode`
+
+    The response model is the return annotation of the handler, which is
+    still used for the OpenAPI schema. Place it above :func:`app.core.cache.cached`
+    so that results are cached before they are encoded.
+    """
+    model = _return_model(f)
+
+    @wraps(f)
+    async def with_serialiser_(**kwargs):
+        result = await f(**kwargs)
+        if isinstance(result, Response):
+            return result
+        return Response(encode(model, result), media_type="application/json")
+    return with_serialiser_
@@ -0,0 +1,138 @@
+"""In-process prefix suggestions of author names, ORCIDs and output titles
+
+:class:`SuggestIndex` keeps one sorted list of ``(key, uuid)`` entries, so
+the entries starting with a prefix are a contiguous range found by
+bisection. Keys are normalised like the search terms of
+:mod:`app.core.search`, lower case, without accents and with punctuation
+collapsed to single spaces. An author has three keys, "first last",
+"last first" and the digits of their ORCID, and an output has its title.
+Matches are ranked by weight, the number of outputs of an author or the
+citations of an output.
+
+Each worker holds its own index in :data:`suggest_index`, built on start-up
+and refreshed like the search index by :func:`app.core.search.poll_index`,
+so suggestions never query the database. Refreshes run in the threadpool and
+move the entries of the changed documents into place in a copy of the list,
+which is swapped in with the documents and an empty cache in a single
+assignment, so a suggestion always reads one consistent state without
+taking a lock.
+"""
+import heapq
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterable, List, NamedTuple, Tuple
+
+from app.core.search import TOKEN, LiveIndex, normalise
+
+# Results of prefixes up to this length are kept until the index changes,
+# as they match the most entries
+CACHED_PREFIX = 3
+
+# Up to this many changed entries are moved into place one at a time by
+# bisection, more are merged into the list by a single sort
+MOVED_ENTRIES = 1000
+
+
+def suggestion_key(text: str | None) -> str:
+    """Normalise ``text`` to the words it contains, separated by single spaces"""
+    return " ".join(TOKEN.findall(normalise(text))) if text else ""
+
+
+class Suggestion(NamedTuple):
+    type: str
+    label: str
+    orcid: str | None
+    weight: float
+    keys: Tuple[str, ...]
+
+
+def _suggestion(document: Dict[str, Any]) -> Suggestion:
+    if document["type"] == "author":
+        first, last = document.get("first_name") or "", document.get("last_name") or ""
+        orcid = document.get("orcid")
+        keys = (suggestion_key(f"{first} {last}"),
+                suggestion_key(f"{last} {first}"),
+                suggestion_key(orcid.rsplit("/", 1)[-1] if orcid else None))
+        label = f"{first} {last}".strip()
+    else:
+        orcid, label = None, document.get("title") or ""
+        keys = (suggestion_key(label),)
+    return Suggestion(document["type"], label, orcid, document.get("weight") or 0,
+                      tuple(key for key in dict.fromkeys(keys) if key))
+
+
+class SuggestIndex:
+    """Sorted keys of authors and outputs, looked up by prefix"""
+
+    def __init__(self):
+        # The sorted entries, the suggestions by uuid and the cached results,
+        # replaced together
+        self._state: Tuple[List[Tuple[str, str]],
+                           Dict[str, Suggestion],
+                           Dict[Tuple[str, str | None, int], List[Dict[str, Any]]]] = ([], {}, {})
+
+    def __len__(self) -> int:
+        return len(self._state[1])
+
+    def update(self, documents: Iterable[Dict[str, Any]]) -> int:
+        """Add authors and outputs, replacing the previous entries of the same ``uuid``
+
+        The current entries are not sorted again: a few changed entries are
+        removed and inserted by bisection, and many are merged in by sorting
+        the current and the new entries, two sorted runs, in one pass.
+        """
+        changed = {document["uuid"]: _suggestion(document) for document in documents}
+        if not changed:
+            return 0
+        entries, items, _ = self._state
+        added = sorted((key, uuid) for uuid, item in changed.items() for key in item.keys)
+        removed = [(key, uuid) for uuid in changed if uuid in items for key in items[uuid].keys]
+        if len(added) + len(removed) <= MOVED_ENTRIES:
+            entries = list(entries)
+            for entry in removed:
+                del entries[bisect_left(entries, entry)]
+            for entry in added:
+                insort(entries, entry)
+        else:
+            if removed:
+                entries = [entry for entry in entries if entry[1] not in changed]
+            entries = entries + added
+            entries.sort()
+        self._state = (entries, items | changed, {})
+        return len(changed)
+
+    def suggest(self,
+                prefix: str,
+                type: str | None = None,
+                limit: int = 10) -> List[Dict[str, Any]]:
+        """The ``limit`` heaviest authors or outputs with a key starting with ``prefix``
+
+        Arguments
+        ---------
+        prefix: str
+            Start of a name, ORCID or title
+        type: str, optional
+            Only ``author`` or ``output`` suggestions
+        limit: int, default = 10
+        """
+        key = suggestion_key(prefix)
+        if not key:
+            return []
+        entries, items, cache = self._state
+        cache_key = (key, type, limit)
+        if cache_key in cache:
+            return cache[cache_key]
+        start = bisect_left(entries, (key,))
+        end = bisect_left(entries, (key + "\uffff",), lo=start)
+        matches = dict.fromkeys(entries[index][1] for index in range(start, end)
+                                if type is None or items[entries[index][1]].type == type)
+        best = heapq.nlargest(limit, matches, key=lambda uuid: items[uuid].weight)
+        results = [{"type": items[uuid].type,
+                    "id": uuid,
+                    "label": items[uuid].label,
+                    "orcid": items[uuid].orcid} for uuid in best]
+        if len(key) <= CACHED_PREFIX:
+            cache[cache_key] = results
+        return results
+
+
+suggest_index = LiveIndex("suggest")
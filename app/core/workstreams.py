@@ -0,0 +1,110 @@
+"""Immutable snapshot of the workstream hierarchy and its members
+
+Workstreams are nested with ``(:Workstream)-[:unit_of]->(:Workstream)`` and
+authors are members of them, which changes only when data is loaded. The
+whole hierarchy is read with one query into a :class:`WorkstreamTree`,
+holding for every workstream its transitive descendants and the authors who
+are members of any of them, sorted like the author lists. The tree of the
+current data version is kept in :data:`workstream_snapshot` and replaced as
+a whole once the data version changes, so readers never see it half built.
+"""
+from collections import deque
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Tuple
+
+from app.core.cache import data_version
+
+
+class WorkstreamTree:
+    """The workstreams, their descendants and members at a data version
+
+    Arguments
+    ---------
+    rows: list
+        One row per workstream and parent with ``id``, ``name``, ``unit_id``,
+        ``unit_name`` and ``members``, a list of ``uuid`` and ``last_name``
+    version: int
+        The data version the rows were read at
+    """
+
+    def __init__(self, rows: Iterable[Dict[str, Any]], version: int):
+        self.version = version
+        names: Dict[str, str] = {}
+        children: Dict[str, List[str]] = {}
+        members: Dict[str, set] = {}
+        listing = []
+        for row in rows:
+            names[row["id"]] = row["name"]
+            children.setdefault(row["id"], [])
+            direct = {(member["last_name"] or "", member["uuid"])
+                      for member in row["members"] if member["uuid"] is not None}
+            members.setdefault(row["id"], set()).update(direct)
+            if row["unit_id"] is not None:
+                children.setdefault(row["unit_id"], []).append(row["id"])
+            if direct:
+                listing.append({"unit_id": row["unit_id"], "unit_name": row["unit_name"],
+                                "id": row["id"], "name": row["name"]})
+        listing.sort(key=lambda item: (item["unit_name"] is None, item["unit_name"] or "",
+                                       item["name"] or ""))
+        self.listing: Tuple[Mapping[str, Any], ...] = tuple(
+            MappingProxyType(item) for item in listing)
+        self.total = len(names)
+        self._names = MappingProxyType(names)
+        self._children = MappingProxyType({id: tuple(ids) for id, ids in children.items()})
+        self._descendants = MappingProxyType({id: self._walk(id) for id in names})
+        self._members = MappingProxyType({
+            id: tuple(sorted(set().union(*(members.get(child, ()) for child in descendants))))
+            for id, descendants in self._descendants.items()})
+
+    def _walk(self, id: str) -> Tuple[str, ...]:
+        seen, queue = {id: None}, deque([id])
+        while queue:
+            for child in self._children.get(queue.popleft(), ()):
+                if child not in seen:
+                    seen[child] = None
+                    queue.append(child)
+        return tuple(seen)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._names
+
+    def detail(self, id: str) -> Dict[str, Any]:
+        """The ``id``, ``name`` and direct ``children`` of a workstream
+
+        Raises
+        ------
+        KeyError
+            If there is no workstream ``id``
+        """
+        return {"id": id, "name": self._names[id], "children": list(self._children[id])}
+
+    def descendants(self, id: str) -> Tuple[str, ...]:
+        """``id`` and the ids of every workstream below it, nearest first"""
+        return self._descendants[id]
+
+    def members(self, ids: Iterable[str]) -> Tuple[Tuple[str, str], ...]:
+        """``(last_name, uuid)`` of the members of ``ids`` or their descendants, sorted"""
+        ids = [id for id in dict.fromkeys(ids) if id in self._members]
+        if len(ids) == 1:
+            return self._members[ids[0]]
+        return tuple(sorted(set().union(*(self._members[id] for id in ids))))
+
+
+class WorkstreamSnapshot:
+    """The latest :class:`WorkstreamTree`, valid while the data version is unchanged"""
+
+    def __init__(self):
+        self._tree: WorkstreamTree | None = None
+
+    def current(self) -> WorkstreamTree | None:
+        """The tree of the current data version, or None if it must be reloaded"""
+        tree = self._tree
+        if tree is not None and tree.version == data_version.current:
+            return tree
+        return None
+
+    def replace(self, tree: WorkstreamTree) -> None:
+        self._tree = tree
+
+
+workstream_snapshot = WorkstreamSnapshot()
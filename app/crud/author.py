@@ -3,21 +3,345 @@ from uuid import UUID
 
 from fastapi.logger import logger
 
-from neo4j import Driver
+from neo4j import AsyncDriver, Driver
 
-from app.db.session import connect_to_db
+from app.core.cursor import decode_cursor, encode_cursor
+from app.crud.statistics import count_from_record, count_map, count_projection
+from app.db.session import connect_to_async_db, connect_to_db
+from .output import (OUTPUT_AFTER_CURSOR, OUTPUT_ORDER,
+                     next_output_cursor, output_cursor)
 from app.schemas.author import (AuthorListModel,
                                 AuthorOutputModel,
-                                AuthorColabModel)
+                                AuthorColabModel,
+                                AuthorCollaboratorListModel)
 from app.schemas.meta import CountPublication
 
+RESULT_TYPES = ["publication", "dataset", "software", "other"]
+
+# Authors are listed by last name, with the uuid as a tie-breaker so that
+# the order is total and a page can resume from the last (last_name, uuid) seen.
+AUTHOR_AFTER_CURSOR = """($after_uuid IS NULL
+          OR a.last_name > $after_name
+          OR (a.last_name = $after_name AND a.uuid > $after_uuid))"""
+
+# Members are counted before the cursor, SKIP and LIMIT apply, so that every
+# row of the page carries the number of members of the workstreams as ``total``
+AUTHOR_LIST_WORKSTREAM_QUERY = f"""
+    MATCH (a:Author)-[:member_of]->(u:Workstream)
+    WHERE u.id IN $workstream
+    WITH a, collect(DISTINCT u) as workstreams
+    WITH collect({{author: a, workstreams: workstreams}}) as members
+    UNWIND members as member
+    WITH size(members) as total, member.author as a, member.workstreams as workstreams
+    WHERE {AUTHOR_AFTER_CURSOR}
+    WITH total, a, workstreams
+    ORDER BY a.last_name, a.uuid
+    SKIP $skip
+    LIMIT $limit
+    OPTIONAL MATCH (a)-[:member_of]->(p:Partner)
+    RETURN a.first_name as first_name,
+           a.last_name as last_name,
+           a.uuid as uuid,
+           a.orcid as orcid,
+        collect(DISTINCT p) as affiliations, workstreams, total
+    ORDER BY last_name, uuid;"""
+
+COUNT_WORKSTREAM_AUTHORS_QUERY = """
+    MATCH (a:Author)-[:member_of]->(u:Workstream)
+    WHERE u.id IN $workstream
+    RETURN count(DISTINCT a) as count
+    """
+
+AUTHOR_LIST_QUERY = f"""
+    MATCH (a:Author)
+    WHERE {AUTHOR_AFTER_CURSOR}
+    WITH a
+    ORDER BY a.last_name, a.uuid
+    SKIP $skip
+    LIMIT $limit
+    OPTIONAL MATCH (a)-[:member_of]->(u:Workstream)
+    OPTIONAL MATCH (a)-[:member_of]->(p:Partner)
+    RETURN a.first_name as first_name,
+           a.last_name as last_name,
+           a.uuid as uuid,
+           a.orcid as orcid,
+        collect(DISTINCT p) as affiliations, collect(DISTINCT u) as workstreams
+    ORDER BY last_name, uuid;"""
+
+# A page of authors already selected, with their workstreams among $workstream
+AUTHOR_LIST_UUIDS_QUERY = """
+    UNWIND $uuids AS uuid
+    MATCH (a:Author {uuid: uuid})
+    OPTIONAL MATCH (a)-[:member_of]->(u:Workstream)
+    WHERE u.id IN $workstream
+    WITH a, collect(DISTINCT u) as workstreams
+    OPTIONAL MATCH (a)-[:member_of]->(p:Partner)
+    RETURN a.first_name as first_name,
+           a.last_name as last_name,
+           a.uuid as uuid,
+           a.orcid as orcid,
+        collect(DISTINCT p) as affiliations, workstreams
+    ORDER BY last_name, uuid;"""
+
+# The number of authors as of the last ingestion, see app/crud/statistics.py
+COUNT_AUTHORS_QUERY = """MATCH (n:Statistics {id: 'global'})
+    RETURN n.authors as count
+    """
+
+COUNT_ALL_AUTHORS_QUERY = """MATCH (a:Author)
+    RETURN COUNT(a) as count
+    """
+
+AUTHOR_NODE_QUERY = """
+    MATCH (a:Author)
+    WHERE a.uuid = $uuid
+    OPTIONAL MATCH (a)-[:member_of]->(p:Partner)
+    OPTIONAL MATCH (a)-[:member_of]->(u:Workstream)
+    RETURN a.uuid as uuid, a.orcid as orcid,
+            a.first_name as first_name, a.last_name as last_name,
+            collect(DISTINCT p) as affiliations,
+            collect(DISTINCT u) as workstreams;"""
+
+COUNT_AUTHOR_OUTPUTS_QUERY = f"""
+    MATCH (a:Author)
+    WHERE a.uuid = $uuid
+    RETURN {count_projection('a')}
+    """
+
+# Collaborators shown on the author detail page
+DETAIL_COLLABORATORS = 5
+
+
+def collaboration_count(rel: str) -> str:
+    """Cypher expression of the outputs of type $result_type counted on ``rel``
+
+    All outputs are counted when $result_type is not a result type.
+    """
+    cases = " ".join(f"WHEN '{result_type}' THEN {rel}.count_{result_type}"
+                     for result_type in RESULT_TYPES)
+    return f"coalesce(CASE $result_type {cases} ELSE {rel}.count_total END, 0)"
+
+
+COLLABORATOR_FIELDS = """uuid: b.uuid,
+                     first_name: b.first_name,
+                     last_name: b.last_name,
+                     orcid: b.orcid,
+                     num_colabs: num_colabs"""
+
+# Collaborators are read from the collaborated_with edges, see app.crud.collaboration
+COLLABORATORS_QUERY = f"""
+    MATCH (a:Author)
+    WHERE a.uuid = $uuid
+    OPTIONAL MATCH (a)-[r:collaborated_with]->(b:Author)
+    WITH b, {collaboration_count('r')} as num_colabs
+    ORDER BY num_colabs DESCENDING, b.uuid
+    WITH collect(CASE WHEN num_colabs > 0 THEN {{{COLLABORATOR_FIELDS}}} END) as collaborators
+    RETURN size(collaborators) as total,
+           collaborators[$skip..$skip + $limit] as results
+    """
+
+PUBLICATIONS_QUERY = f"""
+    MATCH (a:Author)-[:author_of]->(o:Output)
+    WHERE a.uuid = $uuid
+    AND ($result_type IS NULL OR o.result_type = $result_type)
+    AND {OUTPUT_AFTER_CURSOR}
+    WITH o
+    ORDER BY {OUTPUT_ORDER}
+    SKIP $skip
+    LIMIT $limit
+    CALL {{
+        WITH o
+        MATCH (b:Author)-[r:author_of]->(o)
+        RETURN b
+        ORDER BY r.rank
+    }}
+    OPTIONAL MATCH (o)-[:refers_to]->(c:Country)
+    RETURN o as results,
+           collect(DISTINCT c) as countries,
+           collect(DISTINCT b) as authors
+    ORDER BY results.sort_year DESCENDING, results.uuid
+    ;"""
+
+AUTHOR_DETAIL_QUERY = f"""
+    MATCH (a:Author)
+    WHERE a.uuid = $uuid
+    CALL {{
+        WITH a
+        OPTIONAL MATCH (a)-[:member_of]->(p:Partner)
+        RETURN collect(DISTINCT p) as affiliations
+    }}
+    CALL {{
+        WITH a
+        OPTIONAL MATCH (a)-[:member_of]->(u:Workstream)
+        RETURN collect(DISTINCT u) as workstreams
+    }}
+    CALL {{
+        WITH a
+        MATCH (a)-[r:collaborated_with]->(b:Author)
+        WITH b, {collaboration_count('r')} as num_colabs
+        WHERE num_colabs > 0
+        WITH b, num_colabs
+        ORDER BY num_colabs DESCENDING, b.uuid
+        LIMIT {DETAIL_COLLABORATORS}
+        RETURN collect({{{COLLABORATOR_FIELDS}}}) as collaborators
+    }}
+    CALL {{
+        WITH a
+        MATCH (a)-[:author_of]->(o:Output)
+        WHERE ($result_type IS NULL OR o.result_type = $result_type)
+        AND {OUTPUT_AFTER_CURSOR}
+        WITH o
+        ORDER BY {OUTPUT_ORDER}
+        SKIP $skip
+        LIMIT $limit
+        OPTIONAL MATCH (o)-[:refers_to]->(c:Country)
+        WITH o, collect(DISTINCT c) as countries
+        MATCH (b:Author)-[r:author_of]->(o)
+        WITH o, countries, b, r
+        ORDER BY r.rank
+        WITH o, countries, collect(b) as authors
+        ORDER BY {OUTPUT_ORDER}
+        RETURN collect({{results: o,
+                         countries: countries,
+                         authors: authors}}) as publications
+    }}
+    RETURN a.uuid as uuid, a.orcid as orcid,
+           a.first_name as first_name, a.last_name as last_name,
+           affiliations, workstreams, collaborators, publications,
+           {count_map('a')} as counts;"""
+
+
+def author_cursor(cursor: str | None) -> Dict[str, Any]:
+    """Query parameters resuming a list of authors after ``cursor``"""
+    if cursor:
+        after_name, after_uuid = decode_cursor(cursor, "author")
+        return {"after_name": after_name, "after_uuid": after_uuid, "skip": 0}
+    return {"after_name": None, "after_uuid": None}
+
+
+def next_author_cursor(results: List[Dict[str, Any]], limit: int) -> str | None:
+    """Cursor for the page after ``results``, or None on the last page"""
+    if results and len(results) >= limit:
+        last = results[-1]
+        return encode_cursor("author", last["last_name"], last["uuid"])
+    return None
+
+
+def _member_page(records) -> Tuple[List[Dict[str, Any]], int | None]:
+    """Split the rows of a workstream member page into authors and their total
+
+    The total is None for an empty page, which does not say how many members
+    come before it.
+    """
+    authors = [record.data() for record in records]
+    total = authors[0]["total"] if authors else None
+    for author in authors:
+        del author["total"]
+    return authors, total
+
+
+def _author_list(authors: List[Dict[str, Any]],
+                 count: int,
+                 skip: int,
+                 limit: int) -> AuthorListModel:
+    return {"meta": {
+                    "count": {"total": count},
+                    "skip": skip,
+                    "limit": limit,
+                    "next_cursor": next_author_cursor(authors, limit)},
+            "results": authors}
+
+
+def _author_detail(author: Dict[str, Any],
+                   collaborators: List[Dict[str, Any]],
+                   count: CountPublication,
+                   publications: List[Dict[str, Any]],
+                   result_type: str,
+                   skip: int,
+                   limit: int) -> AuthorOutputModel:
+    author['collaborators'] = collaborators
+    author['outputs'] = {'results': publications}
+    author['outputs']['meta'] = {"count": count,
+                                 "skip": skip,
+                                 "limit": limit,
+                                 "result_type": result_type,
+                                 "next_cursor": next_output_cursor(publications, limit)}
+    return author
+
+
+def _collaborator_list(records,
+                       id: UUID,
+                       result_type: str,
+                       skip: int,
+                       limit: int) -> AuthorCollaboratorListModel:
+    if len(records) == 0:
+        raise _author_not_found(id)
+    data = records[0].data()
+    return {"meta": {"count": {"total": data["total"]},
+                     "skip": skip,
+                     "limit": limit,
+                     "result_type": result_type},
+            "results": data["results"]}
+
+
+def _author_not_found(id: UUID) -> KeyError:
+    msg = f"Could not find author with id: {id}"
+    logger.error(msg)
+    return KeyError(msg)
+
+
+def _count_outputs(records) -> CountPublication:
+    if len(records) < 1:
+        return {
+            "total": 0,
+            "publication": 0,
+            "dataset": 0,
+            "other": 0,
+            "software": 0,
+        }
+    return count_from_record(records[0].data())
+
+
+def _publications(records) -> List[Dict[str, Any]]:
+    return _package_publications([record.data() for record in records])
+
+
+def _package_publications(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    publications = []
+
+    for data in rows:
+        package = data["results"]
+        package["authors"] = data["authors"]
+        package["countries"] = data["countries"]
+        publications.append(package)
+
+    return publications
+
+
+def _author_detail_record(records,
+                          id: UUID,
+                          result_type: str,
+                          skip: int,
+                          limit: int) -> AuthorOutputModel:
+    if len(records) == 0:
+        raise _author_not_found(id)
+    data = records[0].data()
+    author = {key: data[key] for key in ("uuid", "orcid", "first_name", "last_name",
+                                         "affiliations", "workstreams")}
+    return _author_detail(author,
+                          data["collaborators"],
+                          count_from_record(data["counts"]),
+                          _package_publications(data["publications"]),
+                          result_type, skip, limit)
+
 
 class Author:
 
     def get_authors(self,
                     skip: int,
                     limit: int,
-                    workstream: list[str] = []) -> AuthorListModel:
+                    workstream: list[str] = [],
+                    cursor: str = None) -> AuthorListModel:
         """Get list of authors
 
         Arguments
@@ -26,24 +350,26 @@ class Author:
             Number or records to skip
         limit: int
             Number of records to return
+        workstream: list[str], default=[]
+            Only return members of these workstreams
+        cursor: str, default=None
+            Return the authors after this cursor instead of skipping rows
 
         Returns
         -------
         AuthorListModel
 
         """
-        authors = self.fetch_author_nodes(skip=skip, limit=limit, workstream=workstream)
-        if workstream:
-            count = len(authors)
-        else:
+        authors, count = self.fetch_author_nodes(skip=skip,
+                                                 limit=limit,
+                                                 workstream=workstream,
+                                                 cursor=cursor)
+        if count is None:
             count = self.count_authors()
-        return {"meta": {
-                        "count": {"total": count},
-                        "skip": skip,
-                        "limit": limit},
-                "results": authors}
+        return _author_list(authors, count, skip, limit)
 
-    def get_author(self, id: UUID, result_type: str = 'publication', skip: int = 0, limit: int = 20) -> AuthorOutputModel:
+    def get_author(self, id: UUID, result_type: str = 'publication', skip: int = 0, limit: int = 20,
+                   cursor: str = None) -> AuthorOutputModel:
         """Get an author, collaborators and outputs
 
         Arguments
@@ -53,88 +379,94 @@ class Author:
         result_type: str, default = 'publication',
         skip: int, default = 0
         limit: int, default = 20
+        cursor: str, default = None
+            Return the outputs after this cursor instead of skipping rows
 
         Returns
         -------
         AuthorOutputModel
         """
-        if author := self.fetch_author_node(str(id)):
-            collaborators = self.fetch_collaborator_nodes(str(id), result_type)[0]
-            collaborators = [collaborator.data() for collaborator in collaborators]
-            count = self.count_author_outputs(str(id))
-            publications = self.fetch_publications(str(id),
-                                                   result_type=result_type,
-                                                   skip=skip,
-                                                   limit=limit)
-            author['collaborators'] = collaborators
-            author['outputs'] = {'results': publications}
-            author['outputs']['meta'] = {"count": count,
-                                         "skip": skip,
-                                         "limit": limit,
-                                         "result_type": result_type}
-            return author
-        else:
-            msg = f"Could not find author with id: {id}"
-            logger.error(msg)
-            raise KeyError(msg)
+        return self.fetch_author_detail(str(id),
+                                        result_type=result_type,
+                                        skip=skip,
+                                        limit=limit,
+                                        cursor=cursor)
+
+    @connect_to_db
+    def fetch_author_detail(self,
+                            id: str,
+                            db: Driver,
+                            result_type: str = 'publication',
+                            skip: int = 0,
+                            limit: int = 20,
+                            cursor: str | None = None) -> AuthorOutputModel:
+        """Fetch an author with collaborators, output counts and a page of
+        outputs in a single query
+        """
+        params = {"skip": skip} | output_cursor(cursor)
+        records, _, _ = db.execute_query(
+            AUTHOR_DETAIL_QUERY,
+            uuid=id,
+            result_type=result_type if result_type in RESULT_TYPES else None,
+            limit=limit,
+            **params)
+        return _author_detail_record(records, id, result_type, skip, limit)
 
     @connect_to_db
     def fetch_author_nodes(
-        self, db: Driver, skip: int, limit: int, workstream: List[str] = []
-    ) -> List[AuthorColabModel]:
-        if workstream:
-            query = """
-                MATCH (a:Author)-[:member_of]->(u:Workstream)
-                WHERE u.id IN $workstream
-                OPTIONAL MATCH (a)-[:member_of]->(p:Partner)
-                RETURN a.first_name as first_name,
-                       a.last_name as last_name,
-                       a.uuid as uuid,
-                       a.orcid as orcid,
-                    collect(DISTINCT p) as affiliations, collect(DISTINCT u) as workstreams
-                ORDER BY last_name
-                SKIP $skip
-                LIMIT $limit;"""
-        else:
-            query = """
-                MATCH (a:Author)
-                OPTIONAL MATCH (a)-[:member_of]->(u:Workstream)
-                OPTIONAL MATCH (a)-[:member_of]->(p:Partner)
-                RETURN a.first_name as first_name,
-                       a.last_name as last_name,
-                       a.uuid as uuid,
-                       a.orcid as orcid,
-                    collect(DISTINCT p) as affiliations, collect(DISTINCT u) as workstreams
-                ORDER BY last_name
-                SKIP $skip
-                LIMIT $limit;"""
-        records, _, _ = db.execute_query(query, skip=skip, limit=limit, workstream=workstream)
+        self, db: Driver, skip: int, limit: int, workstream: List[str] = [],
+        cursor: str | None = None
+    ) -> Tuple[List[AuthorColabModel], int | None]:
+        """Fetch a page of authors, optionally only the members of ``workstream``
+
+        Returns
+        -------
+        tuple
+            The page of authors and, when filtered by ``workstream``, the
+            number of members of the workstreams, else None
+        """
+        params = {"skip": skip} | author_cursor(cursor)
+        if not workstream:
+            records, _, _ = db.execute_query(AUTHOR_LIST_QUERY, limit=limit, **params)
+            return [record.data() for record in records], None
+        records, _, _ = db.execute_query(AUTHOR_LIST_WORKSTREAM_QUERY,
+                                         limit=limit, workstream=workstream, **params)
+        authors, total = _member_page(records)
+        if total is None:
+            if skip or cursor:
+                records, _, _ = db.execute_query(COUNT_WORKSTREAM_AUTHORS_QUERY,
+                                                 workstream=workstream)
+                total = records[0]["count"]
+            else:
+                total = 0
+        return authors, total
+
+    @connect_to_db
+    def fetch_authors_by_uuid(self,
+                              uuids: List[str],
+                              workstream: List[str],
+                              db: Driver) -> List[AuthorColabModel]:
+        """Fetch the authors with ``uuids`` and their workstreams among ``workstream``"""
+        records, _, _ = db.execute_query(AUTHOR_LIST_UUIDS_QUERY,
+                                         uuids=uuids, workstream=workstream)
         return [record.data() for record in records]
 
     @connect_to_db
     def count_authors(self, db: Driver) -> int:
-        """Count the number of authors"""
-        query = """MATCH (a:Author)
-                RETURN COUNT(a) as count
-                """
-        records, _, _ = db.execute_query(query)
+        """Count the number of authors
 
+        Reads the total stored by the last ingestion, and only counts the
+        authors if it is missing.
+        """
+        records, _, _ = db.execute_query(COUNT_AUTHORS_QUERY)
+        if records and records[0]["count"] is not None:
+            return records[0]["count"]
+        records, _, _ = db.execute_query(COUNT_ALL_AUTHORS_QUERY)
         return [record.data() for record in records][0]["count"]
 
-
-
     @connect_to_db
     def fetch_author_node(self, id: str, db: Driver) -> Dict[str, Any]:
-        author_query = """
-            MATCH (a:Author)
-            WHERE a.uuid = $uuid
-            OPTIONAL MATCH (a)-[:member_of]->(p:Partner)
-            OPTIONAL MATCH (a)-[:member_of]->(u:Workstream)
-            RETURN a.uuid as uuid, a.orcid as orcid,
-                    a.first_name as first_name, a.last_name as last_name,
-                    collect(DISTINCT p) as affiliations,
-                    collect(DISTINCT u) as workstreams;"""
-        records, _, _ = db.execute_query(author_query, uuid=id)
+        records, _, _ = db.execute_query(AUTHOR_NODE_QUERY, uuid=id)
         if len(records) == 0:
             return None
         else:
@@ -142,39 +474,40 @@ class Author:
 
     @connect_to_db
     def count_author_outputs(self, id: str, db: Driver) -> CountPublication:
-        query = """
-                MATCH (a:Author)-[b:author_of]->(o:Output)
-                WHERE (a.uuid) = $uuid
-                RETURN o.result_type as result_type, count(DISTINCT o) as count
-                """
-        records, _, _ = db.execute_query(query, uuid=id)
-        if len(records) < 1:
-            return {
-                "total": 0,
-                "publication": 0,
-                "dataset": 0,
-                "other": 0,
-                "software": 0,
-            }
-        counts = {x.data()["result_type"]: x.data()["count"] for x in records}
-        counts["total"] = sum(counts.values())
-        return CountPublication(**counts)
+        records, _, _ = db.execute_query(COUNT_AUTHOR_OUTPUTS_QUERY, uuid=id)
+        return _count_outputs(records)
+
+    def get_collaborators(self, id: UUID, result_type: str = 'publication', skip: int = 0,
+                          limit: int = 20) -> AuthorCollaboratorListModel:
+        """Get the collaborators of an author, most frequent first
+
+        Arguments
+        ---------
+        id: UUID
+            Unique author identifier
+        result_type: str, default = 'publication'
+            Count the shared outputs of this type
+        skip: int, default = 0
+        limit: int, default = 20
+
+        Returns
+        -------
+        AuthorCollaboratorListModel
+
+        Raises
+        ------
+        KeyError
+            If the author does not exist
+        """
+        return self.fetch_collaborator_nodes(str(id), result_type, skip=skip, limit=limit)
 
     @connect_to_db
     def fetch_collaborator_nodes(
-        self, id: str, result_type: str, db: Driver
-    ) -> List[Dict[str, Any]]:
-        collab_query = """
-            MATCH (a:Author)-[:author_of]->(z:Output)<-[:author_of]-(b:Author)
-            WHERE a.uuid = $uuid AND b.uuid <> $uuid AND z.result_type = $result_type
-            RETURN DISTINCT b.uuid as uuid,
-                   b.first_name as first_name,
-                   b.last_name as last_name,
-                   b.orcid as orcid,
-                   count(z) as num_colabs
-            ORDER BY num_colabs DESCENDING
-            LIMIT 5"""
-        return db.execute_query(collab_query, uuid=id, result_type=result_type)
+        self, id: str, result_type: str, db: Driver, skip: int = 0, limit: int = 20
+    ) -> AuthorCollaboratorListModel:
+        records, _, _ = db.execute_query(COLLABORATORS_QUERY, uuid=id, result_type=result_type,
+                                         skip=skip, limit=limit)
+        return _collaborator_list(records, id, result_type, skip, limit)
 
     @connect_to_db
     def fetch_publications(
@@ -184,70 +517,188 @@ class Author:
         result_type: Optional[str] = None,
         limit: int = 20,
         skip: int = 0,
+        cursor: Optional[str] = None,
     ) -> Tuple:
-        if result_type in [
-            "publication",
-            "dataset",
-            "software",
-            "other",
-        ]:
-            publications_query = """
-                MATCH (a:Author)-[:author_of]->(p:Output)
-                WHERE (a.uuid) = $uuid AND (p.result_type = $result_type)
-                CALL {
-                    WITH p
-                    MATCH (b:Author)-[r:author_of]->(p)
-                    RETURN b
-                    ORDER BY r.rank
-                }
-                OPTIONAL MATCH (p)-[:refers_to]->(c:Country)
-                RETURN p as results,
-                       collect(DISTINCT c) as countries,
-                       collect(DISTINCT b) as authors
-                ORDER BY results.publication_year DESCENDING
-                SKIP $skip
-                LIMIT $limit
-                ;"""
-
-            records, summary, keys = db.execute_query(
-                publications_query,
-                uuid=id,
-                result_type=result_type,
-                skip=skip,
-                limit=limit,
-            )
+        params = {"skip": skip} | output_cursor(cursor)
+        records, summary, keys = db.execute_query(
+            PUBLICATIONS_QUERY,
+            uuid=id,
+            result_type=result_type if result_type in RESULT_TYPES else None,
+            limit=limit,
+            **params,
+        )
+        return _publications(records)
+
+
+class AsyncAuthor:
+    """Asyncio variant of :class:`Author` for use in ``async def`` routes"""
+
+    async def get_authors(self,
+                          skip: int,
+                          limit: int,
+                          workstream: list[str] = [],
+                          cursor: str = None) -> AuthorListModel:
+        """Get list of authors
+
+        Arguments
+        ---------
+        skip: int
+            Number or records to skip
+        limit: int
+            Number of records to return
+        workstream: list[str], default=[]
+            Only return members of these workstreams
+        cursor: str, default=None
+            Return the authors after this cursor instead of skipping rows
+
+        Returns
+        -------
+        AuthorListModel
 
+        """
+        authors, count = await self.fetch_author_nodes(skip=skip,
+                                                       limit=limit,
+                                                       workstream=workstream,
+                                                       cursor=cursor)
+        if count is None:
+            count = await self.count_authors()
+        return _author_list(authors, count, skip, limit)
+
+    async def get_author(self, id: UUID, result_type: str = 'publication', skip: int = 0, limit: int = 20,
+                         cursor: str = None) -> AuthorOutputModel:
+        """Get an author, collaborators and outputs
+
+        Arguments
+        ---------
+        id: UUID
+            Unique author identifier
+        result_type: str, default = 'publication',
+        skip: int, default = 0
+        limit: int, default = 20
+        cursor: str, default = None
+            Return the outputs after this cursor instead of skipping rows
+
+        Returns
+        -------
+        AuthorOutputModel
+        """
+        return await self.fetch_author_detail(str(id),
+                                              result_type=result_type,
+                                              skip=skip,
+                                              limit=limit,
+                                              cursor=cursor)
+
+    @connect_to_async_db
+    async def fetch_author_detail(self,
+                                  id: str,
+                                  db: AsyncDriver,
+                                  result_type: str = 'publication',
+                                  skip: int = 0,
+                                  limit: int = 20,
+                                  cursor: str | None = None) -> AuthorOutputModel:
+        """Fetch an author with collaborators, output counts and a page of
+        outputs in a single query
+        """
+        params = {"skip": skip} | output_cursor(cursor)
+        records, _, _ = await db.execute_query(
+            AUTHOR_DETAIL_QUERY,
+            uuid=id,
+            result_type=result_type if result_type in RESULT_TYPES else None,
+            limit=limit,
+            **params)
+        return _author_detail_record(records, id, result_type, skip, limit)
+
+    @connect_to_async_db
+    async def fetch_author_nodes(
+        self, db: AsyncDriver, skip: int, limit: int, workstream: List[str] = [],
+        cursor: str | None = None
+    ) -> Tuple[List[AuthorColabModel], int | None]:
+        """See :meth:`Author.fetch_author_nodes`"""
+        params = {"skip": skip} | author_cursor(cursor)
+        if not workstream:
+            records, _, _ = await db.execute_query(AUTHOR_LIST_QUERY, limit=limit, **params)
+            return [record.data() for record in records], None
+        records, _, _ = await db.execute_query(AUTHOR_LIST_WORKSTREAM_QUERY,
+                                               limit=limit, workstream=workstream, **params)
+        authors, total = _member_page(records)
+        if total is None:
+            if skip or cursor:
+                records, _, _ = await db.execute_query(COUNT_WORKSTREAM_AUTHORS_QUERY,
+                                                       workstream=workstream)
+                total = records[0]["count"]
+            else:
+                total = 0
+        return authors, total
+
+    @connect_to_async_db
+    async def fetch_authors_by_uuid(self,
+                                    uuids: List[str],
+                                    workstream: List[str],
+                                    db: AsyncDriver) -> List[AuthorColabModel]:
+        """See :meth:`Author.fetch_authors_by_uuid`"""
+        records, _, _ = await db.execute_query(AUTHOR_LIST_UUIDS_QUERY,
+                                               uuids=uuids, workstream=workstream)
+        return [record.data() for record in records]
+
+    @connect_to_async_db
+    async def count_authors(self, db: AsyncDriver) -> int:
+        """Count the number of authors
+
+        Reads the total stored by the last ingestion, and only counts the
+        authors if it is missing.
+        """
+        records, _, _ = await db.execute_query(COUNT_AUTHORS_QUERY)
+        if records and records[0]["count"] is not None:
+            return records[0]["count"]
+        records, _, _ = await db.execute_query(COUNT_ALL_AUTHORS_QUERY)
+        return [record.data() for record in records][0]["count"]
+
+    @connect_to_async_db
+    async def fetch_author_node(self, id: str, db: AsyncDriver) -> Dict[str, Any]:
+        records, _, _ = await db.execute_query(AUTHOR_NODE_QUERY, uuid=id)
+        if len(records) == 0:
+            return None
         else:
-            publications_query = """
-                MATCH (a:Author)-[:author_of]->(p:Output)
-                WHERE a.uuid = $uuid
-                CALL {
-                    WITH p
-                    MATCH (b:Author)-[r:author_of]->(p)
-                    RETURN b
-                    ORDER BY r.rank
-                }
-                OPTIONAL MATCH (p)-[:refers_to]->(c:Country)
-                RETURN p as results,
-                    collect(DISTINCT c) as countries,
-                    collect(DISTINCT b) as authors
-                ORDER BY results.publication_year DESCENDING
-                SKIP $skip
-                LIMIT $limit
-                ;"""
-
-            records, summary, keys = db.execute_query(
-                publications_query, uuid=id, limit=limit, skip=skip
-            )
-        publications = []
-
-        for record in records:
-            data = record.data()
-            package = data["results"]
-            package["authors"] = data["authors"]
-            package["countries"] = data["countries"]
-            publications.append(package)
-
-        return publications
+            return records[0].data()
+
+    @connect_to_async_db
+    async def count_author_outputs(self, id: str, db: AsyncDriver) -> CountPublication:
+        records, _, _ = await db.execute_query(COUNT_AUTHOR_OUTPUTS_QUERY, uuid=id)
+        return _count_outputs(records)
 
+    async def get_collaborators(self, id: UUID, result_type: str = 'publication', skip: int = 0,
+                                limit: int = 20) -> AuthorCollaboratorListModel:
+        """Get the collaborators of an author, most frequent first
+
+        See :meth:`Author.get_collaborators`
+        """
+        return await self.fetch_collaborator_nodes(str(id), result_type, skip=skip, limit=limit)
 
+    @connect_to_async_db
+    async def fetch_collaborator_nodes(
+        self, id: str, result_type: str, db: AsyncDriver, skip: int = 0, limit: int = 20
+    ) -> AuthorCollaboratorListModel:
+        records, _, _ = await db.execute_query(COLLABORATORS_QUERY, uuid=id,
+                                               result_type=result_type,
+                                               skip=skip, limit=limit)
+        return _collaborator_list(records, id, result_type, skip, limit)
+
+    @connect_to_async_db
+    async def fetch_publications(
+        self,
+        id: str,
+        db: AsyncDriver,
+        result_type: Optional[str] = None,
+        limit: int = 20,
+        skip: int = 0,
+        cursor: Optional[str] = None,
+    ) -> Tuple:
+        params = {"skip": skip} | output_cursor(cursor)
+        records, summary, keys = await db.execute_query(
+            PUBLICATIONS_QUERY,
+            uuid=id,
+            result_type=result_type if result_type in RESULT_TYPES else None,
+            limit=limit,
+            **params,
+        )
+        return _publications(records)
@@ -0,0 +1,127 @@
+"""Materialised collaboration edges between authors
+
+Two authors of a common output are linked in both directions by
+``(:Author)-[:collaborated_with]->(:Author)`` relationships holding the
+number of outputs they share of each result type, with the same
+``count_total``, ``count_publication``, ... properties as the node counters
+in :mod:`app.crud.statistics`. Collaborators of an author are then a one-hop
+read, sorted by these counts.
+
+The edges only change when outputs are ingested, so after an ingestion the
+edges of every author of the ingested outputs, and of every author who was
+unlinked from them, are recomputed from their outputs, see
+:meth:`Collaborations.update`. :meth:`Collaborations.rebuild`
+recomputes the edges of every author.
+"""
+from typing import List
+
+from fastapi.logger import logger
+from neo4j import Driver, ManagedTransaction
+
+from app.db.session import connect_to_db
+
+# Authors recomputed per write transaction
+BATCH_SIZE = 500
+
+TOUCHED_AUTHORS_QUERY = """
+    MATCH (x:Output)<-[:author_of]-(a:Author)
+    WHERE x.doi IN $dois
+    RETURN DISTINCT a.uuid as uuid
+    """
+
+ALL_AUTHORS_QUERY = """
+    MATCH (a:Author)
+    RETURN a.uuid as uuid
+    """
+
+CLEAR_COLLABORATIONS_QUERY = """
+    UNWIND $uuids AS uuid
+    MATCH (:Author {uuid: uuid})-[r:collaborated_with]-(:Author)
+    WITH DISTINCT r
+    DELETE r
+    """
+
+# The counts of a pair of authors only depend on the outputs they share, so
+# both directions are set from either end
+SET_COLLABORATIONS_QUERY = """
+    UNWIND $uuids AS uuid
+    MATCH (a:Author {uuid: uuid})-[:author_of]->(o:Output)<-[:author_of]-(b:Author)
+    WHERE a <> b
+    WITH DISTINCT a, b, o
+    WITH a, b,
+         count(o) as total,
+         sum(CASE WHEN o.result_type = 'publication' THEN 1 ELSE 0 END) as publication,
+         sum(CASE WHEN o.result_type = 'dataset' THEN 1 ELSE 0 END) as dataset,
+         sum(CASE WHEN o.result_type = 'software' THEN 1 ELSE 0 END) as software,
+         sum(CASE WHEN o.result_type = 'other' THEN 1 ELSE 0 END) as other
+    MERGE (a)-[r:collaborated_with]->(b)
+    MERGE (b)-[s:collaborated_with]->(a)
+    SET r.count_total = total, s.count_total = total,
+        r.count_publication = publication, s.count_publication = publication,
+        r.count_dataset = dataset, s.count_dataset = dataset,
+        r.count_software = software, s.count_software = software,
+        r.count_other = other, s.count_other = other
+    RETURN count(r) as updated
+    """
+
+ANY_COLLABORATION_QUERY = """
+    OPTIONAL MATCH (:Author)-[r:collaborated_with]->(:Author)
+    WITH r LIMIT 1
+    OPTIONAL MATCH (:Author)-[:author_of]->(o:Output)<-[:author_of]-(:Author)
+    WITH r, o LIMIT 1
+    RETURN r IS NOT NULL as built, o IS NOT NULL as needed
+    """
+
+
+def _recompute(tx: ManagedTransaction, uuids: List[str]) -> int:
+    tx.run(CLEAR_COLLABORATIONS_QUERY, uuids=uuids).consume()
+    return tx.run(SET_COLLABORATIONS_QUERY, uuids=uuids).single()["updated"]
+
+
+class Collaborations:
+
+    @connect_to_db
+    def update(self, dois: List[str], db: Driver, authors: List[str] = []) -> int:
+        """Recompute the collaborations of the authors of outputs with ``dois``
+
+        Arguments
+        ---------
+        dois: list[str]
+            DOIs of outputs that were created or updated
+        authors: list[str], optional
+            uuids of authors that were unlinked from these outputs, whose
+            collaborations are recomputed too
+
+        Returns
+        -------
+        int
+            The number of collaboration edges set
+        """
+        records, _, _ = db.execute_query(TOUCHED_AUTHORS_QUERY, dois=list(dois))
+        uuids = {record["uuid"] for record in records} | set(authors)
+        updated = self._recompute(db, sorted(uuids))
+        logger.info(f"Updated {updated} collaborations")
+        return updated
+
+    @connect_to_db
+    def rebuild(self, db: Driver) -> int:
+        """Recompute the collaborations of every author"""
+        records, _, _ = db.execute_query(ALL_AUTHORS_QUERY)
+        updated = self._recompute(db, [record["uuid"] for record in records])
+        logger.info(f"Rebuilt {updated} collaborations")
+        return updated
+
+    @connect_to_db
+    def ensure(self, db: Driver) -> None:
+        """Build the collaborations if authors share outputs but none exist"""
+        records, _, _ = db.execute_query(ANY_COLLABORATION_QUERY)
+        if records and records[0]["needed"] and not records[0]["built"]:
+            self.rebuild()
+
+    @staticmethod
+    def _recompute(db: Driver, uuids: List[str]) -> int:
+        updated = 0
+        with db.session() as session:
+            for start in range(0, len(uuids), BATCH_SIZE):
+                updated += session.execute_write(_recompute, uuids[start:start + BATCH_SIZE])
+        return updated
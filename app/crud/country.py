@@ -1,16 +1,75 @@
 from typing import Any, Dict
 from fastapi.logger import logger
 
-from neo4j import Driver
+from neo4j import AsyncDriver, Driver
 
-from app.db.session import connect_to_db
-from .output import Output
+from app.crud.statistics import count_from_record, count_projection
+from app.db.session import connect_to_async_db, connect_to_db
+from .output import AsyncOutput, Output
 
 from app.schemas.country import (CountryList,
                                  CountryNodeModel,
                                  CountryOutputListModel)
 from app.schemas.meta import CountPublication
 
+COUNTRY_NODE_QUERY = """MATCH (c:Country) WHERE c.id = $id RETURN c as country;"""
+
+COUNT_COUNTRY_OUTPUTS_QUERY = f"""
+        MATCH (c:Country)
+        WHERE c.id = $id
+        RETURN {count_projection('c')}
+        """
+
+COUNT_COUNTRIES_QUERY = """MATCH (n:Statistics {id: 'global'})
+           RETURN n.countries as count"""
+
+COUNTRY_LIST_QUERY = """MATCH (c:Country)
+        WHERE c.count_total > 0
+        WITH c
+        ORDER BY c.name
+        SKIP $skip
+        LIMIT $limit
+        RETURN c as country
+        """
+
+
+def _country_not_found(id: str, skip: int, limit: int, result_type: str, ex: KeyError) -> KeyError:
+    logger.error(
+        f"Country outputs not found {id}:{skip}:{limit}:{result_type}")
+    ex.add_note(f"Could not find {id} in the db")
+    return KeyError(ex)
+
+
+def _country_node(results, id: str) -> Dict[str, Any]:
+    logger.debug(f"Received {results}")
+    if results:
+        return results[0].data()["country"]
+    else:
+        msg = f"No results returned from query for country '{id}'"
+        logger.error(msg)
+        raise KeyError(msg)
+
+
+def _count_outputs(records) -> CountPublication:
+    if len(records) <= 0:
+        return {'total': 0,
+                'publication': 0,
+                'dataset': 0,
+                'other': 0,
+                'software': 0}
+    return count_from_record(records[0].data())
+
+
+def _count_countries(results) -> int:
+    if results:
+        return results[0].data()['count'] or 0
+    return 0
+
+
+def _country_list(results, count: int, skip: int, limit: int) -> CountryList:
+    return {"meta": {"count": {'total': count}, "skip": skip, "limit": limit},
+            "results": results}
+
 
 class Country:
 
@@ -18,7 +77,8 @@ class Country:
                     id: str,
                     skip: int = 0,
                     limit: int = 20,
-                    result_type: str = 'publication'
+                    result_type: str = 'publication',
+                    cursor: str = None
                     ) -> CountryOutputListModel:
         """Return a country
 
@@ -29,6 +89,8 @@ class Country:
         skip: int = 0
         limit: int = 20
         result_type: str = 'publication'
+        cursor: str = None
+            Return the outputs after this cursor instead of skipping rows
 
         Returns
         -------
@@ -37,16 +99,14 @@ class Country:
         try:
             entity = self.fetch_country_node(id)
         except KeyError as ex:
-            logger.error(
-                f"Country outputs not found {id}:{skip}:{limit}:{result_type}")
-            ex.add_note(f"Could not find {id} in the db")
-            raise KeyError(ex)
+            raise _country_not_found(id, skip, limit, result_type, ex)
         else:
             outputs = Output()
             package = outputs.get_outputs(skip=skip,
                                           limit=limit,
                                           result_type=result_type,
-                                          country=id)
+                                          country=id,
+                                          cursor=cursor)
             counts = self.count_country_outputs(id)
             package["meta"]["count"] = counts
             return package | entity
@@ -65,8 +125,7 @@ class Country:
         """
         results = self.get_country_list(skip=skip, limit=limit)
         count = self.count_countries()
-        return {"meta": {"count": {'total': count}, "skip": skip, "limit": limit},
-                "results": results}
+        return _country_list(results, count, skip, limit)
 
     @connect_to_db
     def fetch_country_node(self, id: str, db: Driver) -> Dict[str, Any]:
@@ -85,20 +144,15 @@ class Country:
         Dict[str, Any]
             Country information dictionary
         """
-        query = """MATCH (c:Country) WHERE c.id = $id RETURN c as country;"""
-        results, summary, keys = db.execute_query(query, id=id)
-        logger.debug(f"Received {results}")
-        if results:
-            return results[0].data()["country"]
-        else:
-            msg = f"No results returned from query for country '{id}'"
-            logger.error(msg)
-            raise KeyError(msg)
+        results, summary, keys = db.execute_query(COUNTRY_NODE_QUERY, id=id)
+        return _country_node(results, id)
 
     @connect_to_db
     def count_country_outputs(self, id: str, db: Driver) -> CountPublication:
         """Count articles by result type for a specific country.
 
+        Reads the counters maintained on the country node at ingest time.
+
         Parameters
         ----------
         id : str
@@ -113,30 +167,14 @@ class Country:
             - keys: result type strings
             - values: count of articles for each result type
         """
-        query = """
-                MATCH (o:Output)-[:refers_to]->(c:Country)
-                WHERE c.id = $id
-                RETURN o.result_type as result_type, count(DISTINCT o) as count
-                """
-        records, _, _ = db.execute_query(query, id=id)
-        if len(records) <= 0:
-            return {'total': 0,
-                    'publication': 0,
-                    'dataset': 0,
-                    'other': 0,
-                    'software': 0}
-        counts = {x.data()["result_type"]: x.data()["count"] for x in records}
-        counts['total'] = sum(counts.values())
-
-        return CountPublication(**counts)
+        records, _, _ = db.execute_query(COUNT_COUNTRY_OUTPUTS_QUERY, id=id)
+        return _count_outputs(records)
 
     @connect_to_db
     def count_countries(self, db: Driver) -> int:
         """Count the countries"""
-        query = """MATCH (c:Country)<-[:refers_to]-(p:Output)
-                   RETURN count(DISTINCT c.id) as count"""
-        results, _, _ = db.execute_query(query)
-        return results[0].data()['count']
+        results, _, _ = db.execute_query(COUNT_COUNTRIES_QUERY)
+        return _count_countries(results)
 
     @connect_to_db
     def get_country_list(self,
@@ -154,10 +192,71 @@ class Country:
         -------
         list[schemas.country.CountryNodeModel]
         """
-        query = """MATCH (c:Country)<-[:refers_to]-(p:Output)
-                RETURN DISTINCT c as country
-                SKIP $skip
-                LIMIT $limit
-                """
-        records, _, _ = db.execute_query(query, skip=skip, limit=limit)
+        records, _, _ = db.execute_query(COUNTRY_LIST_QUERY, skip=skip, limit=limit)
+        return [result.data()['country'] for result in records]
+
+
+class AsyncCountry:
+    """Asyncio variant of :class:`Country` for use in ``async def`` routes"""
+
+    async def get_country(self,
+                          id: str,
+                          skip: int = 0,
+                          limit: int = 20,
+                          result_type: str = 'publication',
+                          cursor: str = None
+                          ) -> CountryOutputListModel:
+        """Return a country
+
+        See :meth:`Country.get_country`
+        """
+        try:
+            entity = await self.fetch_country_node(id)
+        except KeyError as ex:
+            raise _country_not_found(id, skip, limit, result_type, ex)
+        else:
+            outputs = AsyncOutput()
+            package = await outputs.get_outputs(skip=skip,
+                                                limit=limit,
+                                                result_type=result_type,
+                                                country=id,
+                                                cursor=cursor)
+            counts = await self.count_country_outputs(id)
+            package["meta"]["count"] = counts
+            return package | entity
+
+    async def get_countries(self, skip: int = 0, limit: int = 20) -> CountryList:
+        """Get a list of countries
+
+        See :meth:`Country.get_countries`
+        """
+        results = await self.get_country_list(skip=skip, limit=limit)
+        count = await self.count_countries()
+        return _country_list(results, count, skip, limit)
+
+    @connect_to_async_db
+    async def fetch_country_node(self, id: str, db: AsyncDriver) -> Dict[str, Any]:
+        """Retrieve country information"""
+        results, summary, keys = await db.execute_query(COUNTRY_NODE_QUERY, id=id)
+        return _country_node(results, id)
+
+    @connect_to_async_db
+    async def count_country_outputs(self, id: str, db: AsyncDriver) -> CountPublication:
+        """Count articles by result type for a specific country."""
+        records, _, _ = await db.execute_query(COUNT_COUNTRY_OUTPUTS_QUERY, id=id)
+        return _count_outputs(records)
+
+    @connect_to_async_db
+    async def count_countries(self, db: AsyncDriver) -> int:
+        """Count the countries"""
+        results, _, _ = await db.execute_query(COUNT_COUNTRIES_QUERY)
+        return _count_countries(results)
+
+    @connect_to_async_db
+    async def get_country_list(self,
+                               db: AsyncDriver,
+                               skip: int = 0,
+                               limit: int = 20) -> list[CountryNodeModel]:
+        """Retrieve all countries that have associated articles."""
+        records, _, _ = await db.execute_query(COUNTRY_LIST_QUERY, skip=skip, limit=limit)
         return [result.data()['country'] for result in records]
@@ -1,8 +1,56 @@
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, Iterator, List
 
-from neo4j import Driver
+from neo4j import AsyncDriver, Driver
 
-from app.db.session import connect_to_db
+from app.core.config import settings
+from app.db.session import (connect_to_async_db, connect_to_db, open_async_session,
+                            open_session)
+
+NODES_QUERY = """MATCH (a:Author)
+        RETURN a.uuid as id, 0 as group, a.first_name + " " + a.last_name as name, a.orcid as url
+        UNION ALL
+        MATCH (b:Output)
+        RETURN b.uuid as id, 1 as group, b.title as name, "https://doi.org/" + b.doi as url
+        """
+
+EDGES_QUERY = """MATCH (p:Output)<-[author_of]-(a:Author)
+        RETURN p.uuid as target, a.uuid as source
+        """
+
+# Nodes and edges of the co-authorship graph restricted by filters, see graph_match
+GRAPH_NODES_QUERY = """{match}
+        WITH DISTINCT a
+        RETURN a.uuid as id, 0 as group, a.first_name + " " + a.last_name as name, a.orcid as url
+        UNION ALL
+        {match}
+        WITH DISTINCT o
+        RETURN o.uuid as id, 1 as group, o.title as name, "https://doi.org/" + o.doi as url
+        """
+
+GRAPH_EDGES_QUERY = """{match}
+        RETURN a.uuid as source, o.uuid as target
+        """
+
+
+def graph_match(workstream: str = None, country: str = None, result_type: str = None) -> str:
+    """Pattern matching the authorships of the outputs and authors selected by the filters"""
+    clauses = ["MATCH (a:Author)-[:author_of]->(o:Output)"]
+    if workstream:
+        clauses.append("MATCH (a)-[:member_of]->(:Workstream {id: $workstream})")
+    if country:
+        clauses.append("MATCH (o)-[:refers_to]->(:Country {id: $country})")
+    if result_type:
+        clauses.append("WHERE o.result_type = $result_type")
+    return "\n        ".join(clauses)
+
+
+def _graph_queries(workstream: str | None, country: str | None,
+                   result_type: str | None) -> tuple[str, str, Dict[str, Any]]:
+    match = graph_match(workstream, country, result_type)
+    params = {"workstream": workstream, "country": country, "result_type": result_type}
+    return (GRAPH_NODES_QUERY.format(match=match),
+            GRAPH_EDGES_QUERY.format(match=match),
+            {key: value for key, value in params.items() if value})
 
 
 class Nodes:
@@ -35,13 +83,7 @@ class Nodes:
         Neo4jError
             If database query fails
         """
-        query = """MATCH (a:Author)
-                RETURN a.uuid as id, 0 as group, a.first_name + " " + a.last_name as name, a.orcid as url
-                UNION ALL
-                MATCH (b:Output)
-                RETURN b.uuid as id, 1 as group, b.title as name, "https://doi.org/" + b.doi as url
-                """
-        results, summary, keys = db.execute_query(query)
+        results, summary, keys = db.execute_query(NODES_QUERY)
         return [x.data() for x in results]
 
 
@@ -71,8 +113,71 @@ class Edges:
         Neo4jError
             If database query fails
         """
-        query = """MATCH (p:Output)<-[author_of]-(a:Author)
-                RETURN p.uuid as target, a.uuid as source
-                """
-        results, summary, keys = db.execute_query(query)
+        results, summary, keys = db.execute_query(EDGES_QUERY)
+        return [x.data() for x in results]
+
+
+class AsyncNodes:
+    """Asyncio variant of :class:`Nodes`"""
+
+    @connect_to_async_db
+    async def get(self, db: AsyncDriver) -> List[Dict[str, Any]]:
+        """Retrieve all author and article nodes from the database."""
+        results, summary, keys = await db.execute_query(NODES_QUERY)
         return [x.data() for x in results]
+
+
+class AsyncEdges:
+    """Asyncio variant of :class:`Edges`"""
+
+    @connect_to_async_db
+    async def get(self, db: AsyncDriver) -> List[Dict[str, str]]:
+        """Retrieve all author-article relationships from the database."""
+        results, summary, keys = await db.execute_query(EDGES_QUERY)
+        return [x.data() for x in results]
+
+
+class Graph:
+    """Stream the nodes and edges of the co-authorship graph
+
+    Unlike :class:`Nodes` and :class:`Edges`, records are pulled from the
+    database ``EXPORT_FETCH_SIZE`` at a time as the iterators are consumed,
+    and the graph can be restricted to the outputs of a result type or
+    referring to a country, and to the authors of a workstream.
+    """
+
+    def __init__(self, workstream: str = None, country: str = None, result_type: str = None):
+        self.nodes_query, self.edges_query, self.params = _graph_queries(
+            workstream, country, result_type)
+
+    def nodes(self) -> Iterator[Dict[str, Any]]:
+        """Yield the authors (group 0) and outputs (group 1) with an authorship in the graph"""
+        yield from self._stream(self.nodes_query)
+
+    def edges(self) -> Iterator[Dict[str, str]]:
+        """Yield the ``source`` author and ``target`` output uuids of each authorship"""
+        yield from self._stream(self.edges_query)
+
+    def _stream(self, query: str) -> Iterator[Dict[str, Any]]:
+        with open_session("Graph.stream", fetch_size=settings.EXPORT_FETCH_SIZE) as session:
+            for record in session.run(query, **self.params):
+                yield record.data()
+
+
+class AsyncGraph(Graph):
+    """Asyncio variant of :class:`Graph`"""
+
+    async def nodes(self) -> AsyncIterator[Dict[str, Any]]:
+        async for node in self._stream(self.nodes_query):
+            yield node
+
+    async def edges(self) -> AsyncIterator[Dict[str, str]]:
+        async for edge in self._stream(self.edges_query):
+            yield edge
+
+    async def _stream(self, query: str) -> AsyncIterator[Dict[str, Any]]:
+        async with open_async_session("AsyncGraph.stream",
+                                      fetch_size=settings.EXPORT_FETCH_SIZE) as session:
+            result = await session.run(query, **self.params)
+            async for record in result:
+                yield record.data()
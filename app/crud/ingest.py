@@ -1,7 +1,48 @@
-from typing import Tuple
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Callable, Dict, List, Tuple
 
+from fastapi.logger import logger
+
+from app.core.cache import data_version
+from app.core.config import settings
+from app.core.jobs import jobs, writer_lock
+from app.crud.collaboration import Collaborations
+from app.crud.statistics import Statistics
+from app.pipeline.countries import CountryLinker
+from app.pipeline.fetch import MetadataFetcher
+from app.pipeline.records import normalise_doi
+from app.pipeline.run import ingest
+from app.pipeline.writer import GraphWriter
 from app.schemas.ingest import IngestionMetrics, IngestionStates
-from research_index_backend.create_graph_from_doi import add_country_relations, main
+
+
+def _changed_dois(states: IngestionStates) -> List[str]:
+    """DOIs of the outputs created or updated by an ingestion run"""
+    return list(set(states.ingested_dois) | set(states.updated_existing_dois))
+
+
+def _merge(model, total, chunk):
+    """Add up the metrics, or concatenate the states, of two chunks"""
+    if total is None:
+        return chunk
+    return model(**{field: getattr(total, field) + getattr(chunk, field)
+                    for field in model.model_fields})
+
+
+def _with_submissions(metrics: IngestionMetrics,
+                      states: IngestionStates,
+                      submitted: List[str]) -> Tuple[IngestionMetrics, IngestionStates]:
+    """Report the submitted and duplicated DOIs of the whole run, not of its chunks"""
+    counts = Counter(normalise_doi(doi) for doi in submitted)
+    duplicated = [doi for doi, count in counts.items() if count > 1]
+    states = states.model_copy(update={"submitted_dois": list(submitted),
+                                       "duplicated_submissions": duplicated})
+    metrics = metrics.model_copy(update={"submitted_dois": len(submitted),
+                                         "duplicated_submissions": len(duplicated)})
+    return metrics, states
 
 
 class Ingest:
@@ -10,26 +51,152 @@ class Ingest:
         dois: list,
         limit: int,
         update_metadata: bool,
-        write_metadata: bool,
+        chunk_size: int = None,
     ) -> Tuple[IngestionMetrics, IngestionStates]:
         self.dois = dois
         self.limit = limit
         self.update_metadata = update_metadata
-        self.write_metadata = write_metadata
+        self.chunk_size = chunk_size or settings.INGEST_CHUNK_SIZE
+        self.fetcher = MetadataFetcher()
+        self.writer = GraphWriter()
+        self.linker = CountryLinker()
+
+    def ingest_dois(self,
+                    progress: Callable[[IngestionMetrics, int, int], None] = None
+                    ) -> Tuple[IngestionMetrics, IngestionStates]:
+        """Ingest the DOIs in chunks, then link countries and update counters
+
+        Each chunk is fetched concurrently and written in batches, see
+        :mod:`app.pipeline`. Raw metadata is always kept in the metadata
+        cache.
+
+        Arguments
+        ---------
+        progress: callable, optional
+            Called after each chunk with the metrics so far, the number of
+            DOIs processed and the total number of distinct DOIs
+        """
+        submitted = self.dois[:self.limit]
+        # Duplicates in different chunks would otherwise be written twice
+        dois = list(dict.fromkeys(normalise_doi(doi) for doi in submitted))
+        metrics, states = None, None
+        for start in range(0, len(dois), self.chunk_size):
+            chunk = dois[start:start + self.chunk_size]
+            chunk_metrics, chunk_states = self._ingest_chunk(chunk)
+            metrics = _merge(IngestionMetrics, metrics, chunk_metrics)
+            states = _merge(IngestionStates, states, chunk_states)
+            if progress:
+                progress(metrics, start + len(chunk), len(dois))
+
+        if states is not None:
+            metrics, states = _with_submissions(metrics, states, submitted)
+            self._link_countries(states)
+            self._update_counters(states)
+        return metrics, states
+
+    def _ingest_chunk(self, dois: list) -> Tuple[IngestionMetrics, IngestionStates]:
+        try:
+            return ingest(dois,
+                          update_metadata=self.update_metadata,
+                          fetcher=self.fetcher,
+                          writer=self.writer)
+        except Exception as e:
+            logger.error(f"Error ingesting dois: {e}")
+            raise
+
+    def _link_countries(self, states: IngestionStates) -> None:
+        """Link only the outputs this run created or updated to their countries"""
+        try:
+            self.linker.link(_changed_dois(states))
+        except Exception as e:
+            logger.error(f"Error adding country relations: {e}")
+
+    def _update_counters(self, states: IngestionStates) -> None:
+        """Update the counters and collaborations of the nodes the run changed
 
-    def ingest_dois(self):
+        Authors and countries that were unlinked from re-ingested outputs are
+        included, as their counters and collaborations no longer hold.
+        """
+        unlinked = list(self.writer.unlinked_authors)
         try:
-            doi_manager = main(
-                self.dois,
-                limit=self.limit,
-                update_metadata=self.update_metadata,
-                write_metadata=self.write_metadata,
-            )
+            Statistics().update(_changed_dois(states), authors=unlinked,
+                                countries=list(self.linker.unlinked_countries),
+                                counts=dict(self.writer.counts))
         except Exception as e:
-            print(f"Error ingesting dois: {e}")
+            logger.error(f"Error updating output counters: {e}")
         try:
-            add_country_relations()
+            Collaborations().update(_changed_dois(states), authors=unlinked)
         except Exception as e:
-            print(f"Error addding country relations: {e}")
+            logger.error(f"Error updating collaborations: {e}")
+        try:
+            data_version.set(**Statistics().bump_version())
+        except Exception as e:
+            logger.error(f"Error updating the data version: {e}")
+
+
+def run_ingest_job(id: str, dois: list, limit: int, update_metadata: bool) -> None:
+    """Run the ingestion job ``id``, waiting until no other job writes to the graph"""
+    with writer_lock(settings.INGEST_JOBS_DIR):
+        jobs.start(id)
+        ingest = Ingest(dois, limit, update_metadata)
+
+        def progress(metrics: IngestionMetrics, processed: int, total: int) -> None:
+            jobs.update(id, processed_dois=processed, total_dois=total,
+                        metrics=metrics.model_dump())
+
+        try:
+            metrics, _ = ingest.ingest_dois(progress)
+        except Exception as e:
+            logger.error(f"Ingestion job {id} failed: {e}")
+            jobs.fail(id, str(e))
+        else:
+            jobs.finish(id, metrics=metrics.model_dump() if metrics else None)
+
+
+_pool: ProcessPoolExecutor | None = None
+_futures: Dict[str, Future] = {}
+
+
+def _new_pool() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn"))
+
+
+def submit_ingest_job(dois: list, limit: int, update_metadata: bool) -> dict:
+    """Queue an ingestion job and return it without waiting for it to run
+
+    Jobs run in a separate process so that ingestion does not hold the
+    interpreter of the worker serving requests. If that process died, e.g.
+    killed for running out of memory, a new one is started.
+    """
+    global _pool
+    if _pool is None:
+        _pool = _new_pool()
+    job = jobs.create(total_dois=min(len(dois), limit), processed_dois=0, metrics=None)
+    args = (run_ingest_job, job["id"], dois, limit, update_metadata)
+    try:
+        future = _pool.submit(*args)
+    except BrokenProcessPool:
+        logger.warning("The ingestion job process died, starting a new one")
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = _new_pool()
+        future = _pool.submit(*args)
+    _futures[job["id"]] = future
+    future.add_done_callback(lambda future: _job_done(job["id"], future))
+    return job
+
+
+def _job_done(id: str, future: Future) -> None:
+    _futures.pop(id, None)
+    if future.cancelled():
+        jobs.fail(id, "Cancelled when the server shut down")
+    elif error := future.exception():
+        # The job process failed before the job could record the error itself
+        jobs.fail(id, str(error))
+
 
-        return doi_manager.ingestion_metrics()
+def shutdown_ingest_jobs() -> None:
+    """Stop the job process once the running job has finished, dropping queued jobs"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -1,11 +1,186 @@
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, Iterator, List
 from uuid import UUID
-from neo4j import Driver
+from neo4j import AsyncDriver, Driver
 from fastapi.logger import logger
 
-from app.db.session import connect_to_db
+from app.core.config import settings
+from app.core.cursor import decode_cursor, encode_cursor
+from app.crud.statistics import count_projection
+from app.db.session import (connect_to_async_db, connect_to_db, open_async_session,
+                            open_session)
 from app.schemas.output import OutputListModel, OutputModel
 
+OUTPUT_QUERY = """
+        MATCH (o:Output)
+        WHERE o.uuid = $uuid
+        OPTIONAL MATCH (o)-[:refers_to]->(c:Country)
+        CALL
+        {
+        WITH o
+        MATCH (a:Author)-[b:author_of]->(o)
+        RETURN a
+        ORDER BY b.rank
+        }
+        RETURN o as outputs, collect(DISTINCT c) as countries, collect(DISTINCT a) as authors
+        """
+
+COUNT_OUTPUTS_QUERY = f"""
+        MATCH (n:Statistics {{id: 'global'}})
+        RETURN {count_projection('n')}
+        """
+
+# Outputs are listed newest first, with the uuid as a tie-breaker so that
+# the order is total and a page can resume from the last (year, uuid) seen.
+# sort_year is the publication year or 0, set when outputs are written, see
+# app.crud.statistics, so that it is never null and can be indexed.
+OUTPUT_ORDER = "o.sort_year DESCENDING, o.uuid"
+
+# The range on sort_year can be served by its index, the rest only breaks
+# ties within the year of the cursor
+OUTPUT_AFTER = """o.sort_year <= $after_year
+             AND (o.sort_year < $after_year OR o.uuid > $after_uuid)"""
+
+OUTPUT_AFTER_CURSOR = f"""($after_uuid IS NULL OR ({OUTPUT_AFTER}))"""
+
+
+def _filter_query(match: str, cursor: bool) -> str:
+    """A page of the outputs of ``match``, after a cursor if ``cursor`` is set
+
+    The pages after a cursor have their own query, so that the cursor is a
+    plain range predicate the planner can use the index on.
+    """
+    after = f"AND {OUTPUT_AFTER}" if cursor else ""
+    return f"""
+        {match}
+        WHERE o.result_type = $result_type
+        {after}
+        WITH o
+        ORDER BY {OUTPUT_ORDER}
+        SKIP $skip
+        LIMIT $limit
+        OPTIONAL MATCH (o)-[:refers_to]->(c:Country)
+        CALL
+        {{
+        WITH o
+        MATCH (a:Author)-[b:author_of]->(o)
+        RETURN a
+        ORDER BY b.rank
+        }}
+        RETURN o as outputs,
+               collect(DISTINCT c) as countries,
+               collect(DISTINCT a) as authors
+        ORDER BY outputs.sort_year DESCENDING, outputs.uuid;
+"""
+
+
+# Keyed on whether a cursor is given
+FILTER_TYPE_QUERIES = {cursor: _filter_query("MATCH (o:Output)", cursor)
+                       for cursor in (False, True)}
+
+FILTER_COUNTRY_QUERIES = {
+    cursor: _filter_query("MATCH (o:Output)-[:refers_to]->(:Country {id: $country_id})", cursor)
+    for cursor in (False, True)}
+
+# Exports stream every matching output in a single query, in uuid order.
+# Only the matching nodes are sorted before the first row; the countries and
+# authors of each output are read by subqueries as its row is pulled, instead
+# of being collected for every output up front
+EXPORT_DETAILS = """
+        WITH o
+        ORDER BY o.uuid
+        CALL
+        {
+        WITH o
+        OPTIONAL MATCH (o)-[:refers_to]->(c:Country)
+        RETURN collect(DISTINCT c) as countries
+        }
+        CALL
+        {
+        WITH o
+        OPTIONAL MATCH (a:Author)-[b:author_of]->(o)
+        WITH a, b
+        ORDER BY b.rank
+        RETURN collect(a) as authors
+        }
+        RETURN o as outputs, countries, authors;
+"""
+
+EXPORT_TYPE_QUERY = f"""
+        MATCH (o:Output)
+        WHERE o.result_type = $result_type
+        {EXPORT_DETAILS}"""
+
+EXPORT_COUNTRY_QUERY = f"""
+        MATCH (o:Output)-[:refers_to]->(:Country {{id: $country_id}})
+        WHERE o.result_type = $result_type
+        {EXPORT_DETAILS}"""
+
+
+def _export_query(result_type: str, country: str | None) -> tuple[str, Dict[str, Any]]:
+    if country:
+        return EXPORT_COUNTRY_QUERY, {"result_type": result_type, "country_id": country}
+    return EXPORT_TYPE_QUERY, {"result_type": result_type}
+
+
+def output_cursor(cursor: str | None) -> Dict[str, Any]:
+    """Query parameters resuming a list of outputs after ``cursor``"""
+    if cursor:
+        after_year, after_uuid = decode_cursor(cursor, "output")
+        return {"after_year": after_year, "after_uuid": after_uuid, "skip": 0}
+    return {"after_year": None, "after_uuid": None}
+
+
+def next_output_cursor(results: List[Dict[str, Any]], limit: int) -> str | None:
+    """Cursor for the page after ``results``, or None on the last page
+
+    The cursor holds the ``sort_year`` and ``uuid`` of the last output, the
+    properties the outputs are ordered by, which each output row returns.
+    """
+    if results and len(results) >= limit:
+        last = results[-1]
+        return encode_cursor("output", last["sort_year"], last["uuid"])
+    return None
+
+
+def _output_not_found(id: UUID) -> KeyError:
+    logger.error(f"Output {str(id)} does not exist in database")
+    return KeyError(f"Output {str(id)} does not exist")
+
+
+def _package_output(record) -> Dict[str, Any]:
+    data = record.data()
+    package = data['outputs']
+    package['authors'] = data['authors']
+    package['countries'] = data['countries']
+    return package
+
+
+def _count_outputs(records) -> Dict[str, int]:
+    if len(records) <= 0:
+        return {'total': 0,
+                'publication': 0,
+                'dataset': 0,
+                'other': 0,
+                'software': 0}
+    return records[0].data()
+
+
+def _output_list(results: List[Dict[str, Any]],
+                 count: Dict[str, int],
+                 skip: int,
+                 limit: int,
+                 result_type: str) -> OutputListModel:
+    return {
+        "meta": {
+            "count": count,
+            "skip": skip,
+            "limit": limit,
+            "result_type": result_type,
+            "next_cursor": next_output_cursor(results, limit)
+        },
+        "results": results,
+    }
+
 
 class Output:
     @connect_to_db
@@ -37,36 +212,19 @@ class Output:
                 - orcid : str
                     Author's ORCID identifier
         """
-
-        query = """
-                MATCH (o:Output)
-                WHERE o.uuid = $uuid
-                OPTIONAL MATCH (o)-[:refers_to]->(c:Country)
-                CALL
-                {
-                WITH o
-                MATCH (a:Author)-[b:author_of]->(o)
-                RETURN a
-                ORDER BY b.rank
-                }
-                RETURN o as outputs, collect(DISTINCT c) as countries, collect(DISTINCT a) as authors
-                """
-        records, _, _ = db.execute_query(query, uuid=str(id))
+        records, _, _ = db.execute_query(OUTPUT_QUERY, uuid=str(id))
         if records:
-            data = [x.data() for x in records][0]
-            package = data['outputs']
-            package['authors'] = data['authors']
-            package['countries'] = data['countries']
-
-            return package
+            return _package_output(records[0])
         else:
-            logger.error(f"Output {str(id)} does not exist in database")
-            raise KeyError(f"Output {str(id)} does not exist")
+            raise _output_not_found(id)
 
     @connect_to_db
     def count(self, db: Driver) -> Dict[str, int]:
         """Count articles by result type.
 
+        Reads the corpus-wide counters maintained at ingest time, see
+        :mod:`app.crud.statistics`.
+
         Parameters
         ----------
         db : Driver
@@ -78,31 +236,32 @@ class Output:
             Dictionary mapping result types to their counts
             Example: {'journal_article': 5, 'conference_paper': 3}
         """
-        query = """
-                MATCH (a:Author)-[b:author_of]->(o:Output)
-                RETURN o.result_type as result_type, count(DISTINCT o) as count
-                """
-        records, _, _ = db.execute_query(query)
-        if len(records) <= 0:
-            return {'total': 0,
-                    'publication': 0,
-                    'dataset': 0,
-                    'other': 0,
-                    'software': 0}
-        counts = {x.data()["result_type"]: x.data()["count"] for x in records}
-        counts['total'] = sum(counts.values())
-        return counts
+        records, _, _ = db.execute_query(COUNT_OUTPUTS_QUERY)
+        return _count_outputs(records)
 
     @connect_to_db
-    def filter_type(self, db: Driver, result_type: str, skip: int, limit: int) -> List[Dict[str, Any]]:
+    def filter_type(self,
+                    db: Driver,
+                    result_type: str,
+                    skip: int,
+                    limit: int,
+                    cursor: str | None = None) -> List[Dict[str, Any]]:
         """Filter articles by result type and return with ordered authors.
 
+        Outputs are ordered by publication year, newest first.
+
         Parameters
         ----------
         db : Driver
             Neo4j database driver
         result_type : str
             Type of result to filter by (e.g. 'journal_article')
+        skip: int
+            Number of rows in the output to skip
+        limit: int
+            Number of rows to return
+        cursor: str, optional
+            Return the rows after this cursor instead of skipping rows
 
         Returns
         -------
@@ -120,37 +279,12 @@ class Output:
         ValueError
             If result_type is invalid
         """
-        query = """
-                MATCH (o:Output)
-                WHERE o.result_type = $result_type
-                OPTIONAL MATCH (o)-[:refers_to]->(c:Country)
-                CALL
-                {
-                WITH o
-                MATCH (a:Author)-[b:author_of]->(o)
-                RETURN a
-                ORDER BY b.rank
-                }
-
-                RETURN o as outputs,
-                       collect(DISTINCT c) as countries,
-                       collect(DISTINCT a) as authors
-                SKIP $skip
-                LIMIT $limit;
-        """
-        records, _, _ = db.execute_query(query,
+        params = {"skip": skip} | output_cursor(cursor)
+        records, _, _ = db.execute_query(FILTER_TYPE_QUERIES[bool(cursor)],
                                          result_type=result_type,
-                                         skip=skip,
-                                         limit=limit)
-        outputs = []
-        for x in records:
-            data = x.data()
-            package = data['outputs']
-            package['authors'] = data['authors']
-            package['countries'] = data['countries']
-            outputs.append(package)
-
-        return outputs
+                                         limit=limit,
+                                         **params)
+        return [_package_output(x) for x in records]
 
     @connect_to_db
     def filter_country(self,
@@ -158,9 +292,12 @@ class Output:
                        result_type: str,
                        skip: int,
                        limit: int,
-                       country: str) -> List[Dict[str, Any]]:
+                       country: str,
+                       cursor: str | None = None) -> List[Dict[str, Any]]:
         """Filter articles by country and result type and return with ordered authors.
 
+        Outputs are ordered by publication year, newest first.
+
         Parameters
         ----------
         db : Driver
@@ -173,6 +310,8 @@ class Output:
             Number of rows to return
         country: str
             Three letter ISO country code
+        cursor: str, optional
+            Return the rows after this cursor instead of skipping rows
 
         Returns
         -------
@@ -190,64 +329,157 @@ class Output:
         ValueError
             If result_type is invalid
         """
-        query = """
-                MATCH (o:Output)-[:refers_to]->(c:Country)
-                WHERE o.result_type = $result_type
-                AND c.id = $country_id
-                CALL
-                {
-                WITH o
-                MATCH (a:Author)-[b:author_of]->(o)
-                RETURN a
-                ORDER BY b.rank
-                }
-                RETURN o as outputs,
-                       collect(DISTINCT c) as countries,
-                       collect(DISTINCT a) as authors
-                SKIP $skip
-                LIMIT $limit;
+        params = {"skip": skip} | output_cursor(cursor)
+        records, summary, keys = db.execute_query(FILTER_COUNTRY_QUERIES[bool(cursor)],
+                                                  result_type=result_type,
+                                                  country_id=country,
+                                                  limit=limit,
+                                                  **params)
+        return [_package_output(x) for x in records]
+
+    def export(self,
+               result_type: str = 'publication',
+               country: str = None) -> Iterator[Dict[str, Any]]:
+        """Yield every output of ``result_type``, optionally referring to ``country``
+
+        Records are pulled from a single result ``EXPORT_FETCH_SIZE`` at a
+        time as the iterator is consumed, so memory use does not depend on
+        the number of outputs. The session stays open until the iterator is
+        exhausted or closed, which is why this does not use
+        :func:`connect_to_db`.
+
+        Parameters
+        ----------
+        result_type : str
+            Type of result to export
+        country: str, optional
+            Three letter ISO country code
+
+        Yields
+        ------
+        Dict[str, Any]
+            Output properties with its countries and authors ordered by rank
         """
-        records, summary, keys = db.execute_query(query,
-                                         result_type=result_type,
-                                         country_id=country,
-                                         skip=skip,
-                                         limit=limit)
-        outputs = []
-        for x in records:
-            data = x.data()
-            package = data['outputs']
-            package['authors'] = data['authors']
-            package['countries'] = data['countries']
-            outputs.append(package)
-
-        return outputs
+        query, params = _export_query(result_type, country)
+        with open_session("Output.export",
+                          fetch_size=settings.EXPORT_FETCH_SIZE) as session:
+            for record in session.run(query, **params):
+                yield _package_output(record)
 
     def get_outputs(self,
                     skip: int = 0,
                     limit: int = 20,
                     result_type: str = 'publication',
-                    country: str = None) -> OutputListModel:
+                    country: str = None,
+                    cursor: str = None) -> OutputListModel:
         """Return a list of outputs"""
         try:
             if country:
                 results = self.filter_country(
-                    result_type=result_type, skip=skip, limit=limit, country=country
+                    result_type=result_type, skip=skip, limit=limit, country=country,
+                    cursor=cursor
                 )
             else:
                 results = self.filter_type(result_type=result_type,
                                            skip=skip,
-                                           limit=limit)
+                                           limit=limit,
+                                           cursor=cursor)
 
             count = self.count()
 
-            return {
-                "meta": {
-                    "count": count,
-                    "skip": skip,
-                    "limit": limit,
-                    "result_type": result_type
-                },
-                "results": results,
-            }
+            return _output_list(results, count, skip, limit, result_type)
+        except ValueError as e:
+            raise ValueError(str(e)) from e
+
+
+class AsyncOutput:
+    """Asyncio variant of :class:`Output` for use in ``async def`` routes"""
+
+    @connect_to_async_db
+    async def get_output(self, id: UUID, db: AsyncDriver) -> OutputModel:
+        """Retrieve article output information from the database.
+
+        See :meth:`Output.get_output`
+        """
+        records, _, _ = await db.execute_query(OUTPUT_QUERY, uuid=str(id))
+        if records:
+            return _package_output(records[0])
+        else:
+            raise _output_not_found(id)
+
+    @connect_to_async_db
+    async def count(self, db: AsyncDriver) -> Dict[str, int]:
+        """Count articles by result type."""
+        records, _, _ = await db.execute_query(COUNT_OUTPUTS_QUERY)
+        return _count_outputs(records)
+
+    @connect_to_async_db
+    async def filter_type(self,
+                          db: AsyncDriver,
+                          result_type: str,
+                          skip: int,
+                          limit: int,
+                          cursor: str | None = None) -> List[Dict[str, Any]]:
+        """Filter articles by result type and return with ordered authors."""
+        params = {"skip": skip} | output_cursor(cursor)
+        records, _, _ = await db.execute_query(FILTER_TYPE_QUERIES[bool(cursor)],
+                                               result_type=result_type,
+                                               limit=limit,
+                                               **params)
+        return [_package_output(x) for x in records]
+
+    @connect_to_async_db
+    async def filter_country(self,
+                             db: AsyncDriver,
+                             result_type: str,
+                             skip: int,
+                             limit: int,
+                             country: str,
+                             cursor: str | None = None) -> List[Dict[str, Any]]:
+        """Filter articles by country and result type and return with ordered authors."""
+        params = {"skip": skip} | output_cursor(cursor)
+        records, _, _ = await db.execute_query(FILTER_COUNTRY_QUERIES[bool(cursor)],
+                                               result_type=result_type,
+                                               country_id=country,
+                                               limit=limit,
+                                               **params)
+        return [_package_output(x) for x in records]
+
+    async def export(self,
+                     result_type: str = 'publication',
+                     country: str = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every output of ``result_type``, optionally referring to ``country``
+
+        See :meth:`Output.export`
+        """
+        query, params = _export_query(result_type, country)
+        async with open_async_session("AsyncOutput.export",
+                                      fetch_size=settings.EXPORT_FETCH_SIZE) as session:
+            result = await session.run(query, **params)
+            async for record in result:
+                yield _package_output(record)
+
+    async def get_outputs(self,
+                          skip: int = 0,
+                          limit: int = 20,
+                          result_type: str = 'publication',
+                          country: str = None,
+                          cursor: str = None) -> OutputListModel:
+        """Return a list of outputs"""
+        try:
+            if country:
+                results = await self.filter_country(
+                    result_type=result_type, skip=skip, limit=limit, country=country,
+                    cursor=cursor
+                )
+            else:
+                results = await self.filter_type(result_type=result_type,
+                                                 skip=skip,
+                                                 limit=limit,
+                                                 cursor=cursor)
+
+            count = await self.count()
+
+            return _output_list(results, count, skip, limit, result_type)
         except ValueError as e:
-            raise ValueError(str(e)) from e
\ No newline at end of file
+            raise ValueError(str(e)) from e
@@ -0,0 +1,135 @@
+"""Documents of the search index and the outputs of search results
+
+See :mod:`app.core.search` for the index itself.
+"""
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.logger import logger
+from neo4j import AsyncDriver
+
+from app.core.config import settings
+from app.core.search import InvertedIndex, search_index
+from app.crud.output import _package_output
+from app.db.session import connect_to_async_db, open_session
+from app.schemas.search import SearchListModel
+
+SEARCH_DOCUMENTS_QUERY = """
+    MATCH (o:Output)
+    WHERE $since IS NULL OR o.modified > $since
+    OPTIONAL MATCH (o)-[:refers_to]->(c:Country)
+    RETURN o.uuid as uuid,
+           o.title as title,
+           o.abstract as abstract,
+           o.journal as journal,
+           o.result_type as result_type,
+           coalesce(o.modified, 0) as modified,
+           collect(c.id) as countries
+    """
+
+SEARCH_RESULTS_QUERY = """
+    UNWIND $uuids AS uuid
+    MATCH (o:Output {uuid: uuid})
+    OPTIONAL MATCH (o)-[:refers_to]->(c:Country)
+    CALL
+    {
+    WITH o
+    MATCH (a:Author)-[b:author_of]->(o)
+    RETURN a
+    ORDER BY b.rank
+    }
+    RETURN o as outputs, collect(DISTINCT c) as countries, collect(DISTINCT a) as authors
+    """
+
+
+def documents(since: float | None = None) -> Iterator[Dict[str, Any]]:
+    """Stream the documents of the outputs modified after ``since``, or of all outputs"""
+    with open_session("search.documents", fetch_size=settings.EXPORT_FETCH_SIZE) as session:
+        for record in session.run(SEARCH_DOCUMENTS_QUERY, since=since):
+            yield record.data()
+
+
+def build_index() -> Tuple[InvertedIndex, float]:
+    """Index every output, returning the index and the latest modification time"""
+    start = time.perf_counter()
+    index, modified = InvertedIndex(), 0.0
+    for document in documents():
+        index.add(document)
+        modified = max(modified, document["modified"])
+    logger.info(f"Indexed {len(index)} outputs in {time.perf_counter() - start:.1f}s")
+    return index, modified
+
+
+def _rank(*args) -> Tuple[int, List[Tuple[str, float]]]:
+    with search_index.lock:
+        return search_index.index.search(*args)
+
+
+def _search_list(total: int,
+                 scores: List[Tuple[str, float]],
+                 outputs: List[Dict[str, Any]],
+                 q: str,
+                 result_type: str | None,
+                 country: str | None,
+                 skip: int,
+                 limit: int) -> SearchListModel:
+    rank = {uuid: rank for rank, (uuid, _) in enumerate(scores)}
+    for output in outputs:
+        output["score"] = scores[rank[output["uuid"]]][1]
+    outputs.sort(key=lambda output: rank[output["uuid"]])
+    return {"meta": {"count": {"total": total},
+                     "q": q,
+                     "result_type": result_type,
+                     "country": country,
+                     "skip": skip,
+                     "limit": limit},
+            "results": outputs}
+
+
+class AsyncSearch:
+
+    @connect_to_async_db
+    async def changed_since(self, since: float, db: AsyncDriver) -> List[Dict[str, Any]]:
+        """Documents of the outputs modified after ``since``"""
+        records, _, _ = await db.execute_query(SEARCH_DOCUMENTS_QUERY, since=since)
+        return [record.data() for record in records]
+
+    @connect_to_async_db
+    async def fetch_outputs(self, uuids: List[str], db: AsyncDriver) -> List[Dict[str, Any]]:
+        """The outputs with ``uuids``, in no particular order"""
+        records, _, _ = await db.execute_query(SEARCH_RESULTS_QUERY, uuids=uuids)
+        return [_package_output(record) for record in records]
+
+    async def search(self,
+                     q: str,
+                     result_type: str | None = None,
+                     country: str | None = None,
+                     skip: int = 0,
+                     limit: int = 20) -> SearchListModel:
+        """Rank outputs by the BM25 score of ``q`` over their title, abstract and journal
+
+        The ranking runs in process, in the threadpool; only the page of
+        results is read from the graph.
+
+        Arguments
+        ---------
+        q: str
+            Search terms
+        result_type: str, optional
+            Only outputs of this type
+        country: str, optional
+            Only outputs referring to this country
+        skip: int, default = 0
+        limit: int, default = 20
+
+        Raises
+        ------
+        RuntimeError
+            If the search index has not been built yet
+        """
+        if not search_index.ready:
+            raise RuntimeError("The search index is not ready yet")
+        total, scores = await run_in_threadpool(_rank, q, result_type, country, skip, limit)
+        outputs = await self.fetch_outputs([uuid for uuid, _ in scores]) if scores else []
+        return _search_list(total, scores, outputs, q, result_type, country, skip, limit)
@@ -0,0 +1,319 @@
+"""Denormalised output counters
+
+The number of outputs of each result type is stored on every ``Country``,
+``Author`` and ``Workstream`` node as ``count_total``, ``count_publication``,
+``count_dataset``, ``count_software`` and ``count_other``. Corpus-wide totals
+are stored on a single ``(:Statistics {id: 'global'})`` node.
+
+The counters only change when outputs are ingested, so they are updated by
+:class:`app.crud.ingest.Ingest` for the nodes touched by the ingested DOIs,
+and the list and detail pages read them instead of aggregating over the
+graph. The corpus-wide totals are not recounted after an ingestion, the
+changes counted while writing are added to them instead, see
+:attr:`app.pipeline.writer.GraphWriter.counts`. :meth:`Statistics.rebuild`
+recomputes every counter from scratch.
+
+Outputs are listed newest first by ``sort_year``, their publication year or
+0 if it is unknown. Unlike ``publication_year`` it is never null, so the
+index on it can serve the range predicate of a page cursor. It is set when
+outputs are written, and on start-up and by :meth:`Statistics.rebuild` for
+outputs loaded by other means.
+
+The ``Statistics`` node also holds ``data_version``, which is incremented
+after every ingestion, and ``last_ingest``, the time of that ingestion in
+seconds since the epoch. Cached responses are keyed on the data version.
+"""
+import time
+from typing import Any, Dict, List, Tuple
+
+from fastapi.logger import logger
+from neo4j import AsyncDriver, Driver, ManagedTransaction
+
+from app.db.session import connect_to_async_db, connect_to_db
+from app.schemas.meta import CountPublication
+
+RESULT_TYPES = ["publication", "dataset", "software", "other"]
+
+COUNT_FIELDS = ["total"] + RESULT_TYPES
+
+
+def count_projection(node: str) -> str:
+    """Cypher projection returning the counters stored on ``node``"""
+    return ", ".join(f"coalesce({node}.count_{field}, 0) as {field}"
+                     for field in COUNT_FIELDS)
+
+
+def count_map(node: str) -> str:
+    """Cypher map literal of the counters stored on ``node``"""
+    fields = ", ".join(f"{field}: coalesce({node}.count_{field}, 0)"
+                       for field in COUNT_FIELDS)
+    return "{" + fields + "}"
+
+
+def count_from_record(data: Dict[str, Any]) -> CountPublication:
+    """Build a count from a record returned with :func:`count_projection`"""
+    return CountPublication(**{field: data[field] for field in COUNT_FIELDS})
+
+
+# Appended to a query that yields each node to update as ``n`` with each of
+# its outputs as ``o`` (or null when it has none). ``gained`` is the number
+# of nodes that now have outputs less those that no longer have any
+SET_COUNTS = """
+    WITH DISTINCT n, o
+    WITH n,
+         coalesce(n.count_total, 0) > 0 as had,
+         count(o) as total,
+         sum(CASE WHEN o.result_type = 'publication' THEN 1 ELSE 0 END) as publication,
+         sum(CASE WHEN o.result_type = 'dataset' THEN 1 ELSE 0 END) as dataset,
+         sum(CASE WHEN o.result_type = 'software' THEN 1 ELSE 0 END) as software,
+         sum(CASE WHEN o.result_type = 'other' THEN 1 ELSE 0 END) as other
+    SET n.count_total = total,
+        n.count_publication = publication,
+        n.count_dataset = dataset,
+        n.count_software = software,
+        n.count_other = other
+    RETURN count(n) as updated,
+           sum(CASE WHEN total > 0 AND NOT had THEN 1
+                    WHEN total = 0 AND had THEN -1
+                    ELSE 0 END) as gained
+"""
+
+OUTPUTS_OF = {
+    "Author": "OPTIONAL MATCH (n)-[:author_of]->(o:Output)",
+    "Country": "OPTIONAL MATCH (n)<-[:refers_to]-(o:Output)",
+    "Workstream": "OPTIONAL MATCH (n)<-[:member_of]-(:Author)-[:author_of]->(o:Output)",
+}
+
+# Nodes whose counters change when the outputs with DOIs in $dois change
+TOUCHED_BY = {
+    "Author": """MATCH (x:Output)<-[:author_of]-(n:Author)
+                 WHERE x.doi IN $dois""",
+    "Country": """MATCH (x:Output)-[:refers_to]->(n:Country)
+                  WHERE x.doi IN $dois""",
+    "Workstream": """MATCH (x:Output)<-[:author_of]-(:Author)-[:member_of]->(n:Workstream)
+                     WHERE x.doi IN $dois""",
+}
+
+# Nodes whose counters change when the authors or countries with $ids were
+# unlinked from outputs
+UNLINKED_FROM = {
+    "Author": """UNWIND $ids AS id
+                 MATCH (n:Author {uuid: id})""",
+    "Country": """UNWIND $ids AS id
+                  MATCH (n:Country {id: id})""",
+    "Workstream": """UNWIND $ids AS id
+                     MATCH (:Author {uuid: id})-[:member_of]->(n:Workstream)""",
+}
+
+GLOBAL_COUNTS_QUERY = """
+    MERGE (n:Statistics {id: 'global'})
+    WITH n
+    OPTIONAL MATCH (:Author)-[:author_of]->(o:Output)
+""" + SET_COUNTS
+
+GLOBAL_TOTALS_QUERY = """
+    MATCH (n:Statistics {id: 'global'})
+    OPTIONAL MATCH (c:Country) WHERE c.count_total > 0
+    WITH n, count(c) as countries
+    OPTIONAL MATCH (a:Author)
+    WITH n, countries, count(a) as authors
+    SET n.countries = countries, n.authors = authors
+    """
+
+ADD_COUNTS = ", ".join(f"n.count_{field} = coalesce(n.count_{field}, 0) + ${field}"
+                       for field in COUNT_FIELDS)
+
+# Adds the changes made by an ingestion to the corpus-wide totals
+GLOBAL_CHANGES_QUERY = f"""
+    MATCH (n:Statistics {{id: 'global'}})
+    SET {ADD_COUNTS},
+        n.countries = coalesce(n.countries, 0) + $countries,
+        n.authors = coalesce(n.authors, 0) + $authors
+    RETURN count(n) as updated
+    """
+
+STATISTICS_QUERY = f"""
+    MATCH (n:Statistics {{id: 'global'}})
+    RETURN {count_projection('n')},
+           coalesce(n.countries, 0) as countries,
+           coalesce(n.authors, 0) as authors
+    """
+
+SORT_YEAR_QUERY = """
+    MATCH (o:Output)
+    WHERE o.sort_year IS NULL OR o.sort_year <> coalesce(o.publication_year, 0)
+    SET o.sort_year = coalesce(o.publication_year, 0)
+    RETURN count(o) as updated
+    """
+
+DATA_VERSION_QUERY = """
+    MATCH (n:Statistics {id: 'global'})
+    RETURN coalesce(n.data_version, 0) as data_version,
+           n.last_ingest as last_ingest
+    """
+
+BUMP_VERSION_QUERY = """
+    MERGE (n:Statistics {id: 'global'})
+    SET n.data_version = coalesce(n.data_version, 0) + 1,
+        n.last_ingest = $now
+    RETURN n.data_version as data_version, n.last_ingest as last_ingest
+    """
+
+
+def _data_version(records) -> Dict[str, Any]:
+    if records:
+        data = records[0].data()
+        return {"data_version": data["data_version"],
+                "last_ingest": data.get("last_ingest")}
+    return {"data_version": 0, "last_ingest": None}
+
+
+def _set_counts(tx: ManagedTransaction, label: str, select: str, **params) -> Tuple[int, int]:
+    query = f"""{select}
+            WITH DISTINCT n
+            {OUTPUTS_OF[label]}
+            {SET_COUNTS}"""
+    record = tx.run(query, **params).single()
+    return record["updated"], record["gained"]
+
+
+def _update_nodes(tx: ManagedTransaction,
+                  label: str,
+                  dois: List[str] | None) -> Tuple[int, int]:
+    if dois is None:
+        return _set_counts(tx, label, f"MATCH (n:{label})")
+    return _set_counts(tx, label, TOUCHED_BY[label], dois=dois)
+
+
+def _update_global(tx: ManagedTransaction) -> None:
+    tx.run(GLOBAL_COUNTS_QUERY).consume()
+    tx.run(GLOBAL_TOTALS_QUERY).consume()
+
+
+def _add_changes(tx: ManagedTransaction, changes: Dict[str, int]) -> None:
+    params = {field: changes.get(field, 0) for field in COUNT_FIELDS + ["countries", "authors"]}
+    if not tx.run(GLOBAL_CHANGES_QUERY, **params).single()["updated"]:
+        # The totals were never built, so there is nothing to add to
+        _update_global(tx)
+
+
+def _update(tx: ManagedTransaction,
+            dois: List[str] | None,
+            authors: List[str] = [],
+            countries: List[str] = [],
+            counts: Dict[str, int] = {}) -> Dict[str, int]:
+    updated, gained = {}, {}
+    for label in OUTPUTS_OF:
+        updated[label], gained[label] = _update_nodes(tx, label, dois)
+    unlinked = {"Author": authors, "Country": countries, "Workstream": authors}
+    for label, select in UNLINKED_FROM.items():
+        if unlinked[label]:
+            nodes, nodes_gained = _set_counts(tx, label, select, ids=unlinked[label])
+            updated[label] += nodes
+            gained[label] += nodes_gained
+    if dois is None:
+        updated["Output"] = tx.run(SORT_YEAR_QUERY).single()["updated"]
+        _update_global(tx)
+    else:
+        _add_changes(tx, dict(counts) | {"countries": gained["Country"]})
+    return updated
+
+
+class Statistics:
+
+    @connect_to_db
+    def get(self, db: Driver) -> Dict[str, Any] | None:
+        """Return the corpus-wide counters, or None if they were never built"""
+        records, _, _ = db.execute_query(STATISTICS_QUERY)
+        if records:
+            return records[0].data()
+        return None
+
+    @connect_to_db
+    def update(self, dois: List[str], db: Driver,
+               authors: List[str] = [],
+               countries: List[str] = [],
+               counts: Dict[str, int] = {}) -> Dict[str, int]:
+        """Recompute the counters of the nodes linked to outputs with ``dois``
+
+        Arguments
+        ---------
+        dois: list[str]
+            DOIs of outputs that were created or updated
+        authors: list[str], optional
+            uuids of authors that were unlinked from these outputs, whose
+            counters and those of their workstreams are recomputed too
+        countries: list[str], optional
+            ids of countries that were unlinked from these outputs, whose
+            counters are recomputed too
+        counts: dict, optional
+            The change in the number of outputs of each result type, and of
+            ``authors``, added to the corpus-wide totals, see
+            :attr:`app.pipeline.writer.GraphWriter.counts`
+
+        Returns
+        -------
+        dict
+            The number of nodes updated for each label
+        """
+        with db.session() as session:
+            updated = session.execute_write(_update, list(dois), list(authors),
+                                            list(countries), dict(counts))
+        logger.info(f"Updated counters for {updated}")
+        return updated
+
+    @connect_to_db
+    def rebuild(self, db: Driver) -> Dict[str, int]:
+        """Recompute every counter in the graph"""
+        with db.session() as session:
+            updated = session.execute_write(_update, None)
+        logger.info(f"Rebuilt counters for {updated}")
+        return updated
+
+    @connect_to_db
+    def get_version(self, db: Driver) -> Dict[str, Any]:
+        """Return the data version and the time of the last ingestion
+
+        The version is 0 and the time None if no data was ever ingested.
+        """
+        records, _, _ = db.execute_query(DATA_VERSION_QUERY)
+        return _data_version(records)
+
+    @connect_to_db
+    def bump_version(self, db: Driver) -> Dict[str, Any]:
+        """Increment the data version after new data was written
+
+        Returns
+        -------
+        dict
+            The new ``data_version`` and ``last_ingest`` time
+        """
+        records, _, _ = db.execute_query(BUMP_VERSION_QUERY, now=time.time())
+        return _data_version(records)
+
+    @connect_to_db
+    def update_sort_years(self, db: Driver) -> int:
+        """Set ``sort_year`` on the outputs without one or with a changed year"""
+        records, _, _ = db.execute_query(SORT_YEAR_QUERY)
+        return records[0]["updated"]
+
+    def ensure(self) -> None:
+        """Build the counters if they have never been built
+
+        Otherwise only set the ``sort_year`` of outputs written since by
+        other means.
+        """
+        if self.get() is None:
+            self.rebuild()
+        elif updated := self.update_sort_years():
+            logger.info(f"Set the sort year of {updated} outputs")
+
+
+class AsyncStatistics:
+    """Asyncio variant of :class:`Statistics` for use in ``async def`` routes"""
+
+    @connect_to_async_db
+    async def get_version(self, db: AsyncDriver) -> Dict[str, Any]:
+        """Return the data version and the time of the last ingestion"""
+        records, _, _ = await db.execute_query(DATA_VERSION_QUERY)
+        return _data_version(records)
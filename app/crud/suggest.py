@@ -0,0 +1,105 @@
+"""Documents of the suggestion index
+
+See :mod:`app.core.suggest` for the index itself.
+"""
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+
+from fastapi.logger import logger
+from neo4j import AsyncDriver
+
+from app.core.config import settings
+from app.core.suggest import SuggestIndex, suggest_index
+from app.db.session import connect_to_async_db, open_session
+from app.schemas.suggest import SuggestListModel
+
+SUGGEST_OUTPUTS_QUERY = """
+    MATCH (o:Output)
+    WHERE $since IS NULL OR o.modified > $since
+    RETURN o.uuid as uuid,
+           'output' as type,
+           o.title as title,
+           coalesce(o.cited_by_count, 0) as weight,
+           coalesce(o.modified, 0) as modified
+    """
+
+SUGGEST_AUTHORS_QUERY = """
+    MATCH (a:Author)
+    RETURN a.uuid as uuid,
+           'author' as type,
+           a.first_name as first_name,
+           a.last_name as last_name,
+           a.orcid as orcid,
+           coalesce(a.count_total, 0) as weight,
+           0 as modified
+    """
+
+# Authors have no modification time, but their names and counters only
+# change when one of their outputs is written
+SUGGEST_TOUCHED_AUTHORS_QUERY = """
+    MATCH (a:Author)-[:author_of]->(o:Output)
+    WHERE o.modified > $since
+    WITH a, max(o.modified) as modified
+    RETURN a.uuid as uuid,
+           'author' as type,
+           a.first_name as first_name,
+           a.last_name as last_name,
+           a.orcid as orcid,
+           coalesce(a.count_total, 0) as weight,
+           modified
+    """
+
+
+def documents() -> Iterator[Dict[str, Any]]:
+    """Stream the documents of every author and output"""
+    with open_session("suggest.documents", fetch_size=settings.EXPORT_FETCH_SIZE) as session:
+        for query in (SUGGEST_AUTHORS_QUERY, SUGGEST_OUTPUTS_QUERY):
+            for record in session.run(query, since=None):
+                yield record.data()
+
+
+def build_suggestions() -> Tuple[SuggestIndex, float]:
+    """Index every author and output, returning the index and the latest modification time"""
+    start = time.perf_counter()
+    rows = list(documents())
+    index = SuggestIndex()
+    index.update(rows)
+    modified = max([0.0] + [row["modified"] for row in rows])
+    logger.info(f"Indexed {len(index)} suggestions in {time.perf_counter() - start:.1f}s")
+    return index, modified
+
+
+class AsyncSuggest:
+
+    @connect_to_async_db
+    async def changed_since(self, since: float, db: AsyncDriver) -> List[Dict[str, Any]]:
+        """Documents of the outputs modified after ``since`` and of their authors"""
+        authors, _, _ = await db.execute_query(SUGGEST_TOUCHED_AUTHORS_QUERY, since=since)
+        outputs, _, _ = await db.execute_query(SUGGEST_OUTPUTS_QUERY, since=since)
+        return [record.data() for record in authors + outputs]
+
+    def suggest(self,
+                prefix: str,
+                type: str | None = None,
+                limit: int = 10) -> SuggestListModel:
+        """Authors and outputs whose name, ORCID or title start with ``prefix``
+
+        Suggestions are read from the in-process index only.
+
+        Arguments
+        ---------
+        prefix: str
+            Start of a name, ORCID or title
+        type: str, optional
+            Only ``author`` or ``output`` suggestions
+        limit: int, default = 10
+
+        Raises
+        ------
+        RuntimeError
+            If the suggestion index has not been built yet
+        """
+        if not suggest_index.ready:
+            raise RuntimeError("The suggestion index is not ready yet")
+        return {"meta": {"prefix": prefix, "type": type, "limit": limit},
+                "results": suggest_index.index.suggest(prefix, type, limit)}
@@ -1,15 +1,64 @@
 from typing import Any, Dict, List
 
-from neo4j import Driver
+from neo4j import AsyncDriver, Driver
 
-from app.db.session import connect_to_db
+from app.core.cache import data_version
+from app.core.workstreams import WorkstreamTree, workstream_snapshot
+from app.db.session import connect_to_async_db, connect_to_db
 from app.schemas.workstream import WorkstreamDetailModel, WorkstreamListModel, WorkstreamBase
-from .author import Author
+from .author import AsyncAuthor, Author, _author_list
 from app.schemas.author import AuthorListModel
 from app.schemas.output import OutputListModel
-from .output import Output
+from .output import AsyncOutput, Output
+
+# One row per workstream and parent, with the authors who are members of it
+WORKSTREAM_TREE_QUERY = """MATCH (p:Workstream)
+        OPTIONAL MATCH (p)-[:unit_of]->(u:Workstream)
+        OPTIONAL MATCH (a:Author)-[:member_of]->(p)
+        RETURN p.id as id, p.name as name, u.id as unit_id, u.name as unit_name,
+               collect(DISTINCT {uuid: a.uuid, last_name: a.last_name}) as members
+        """
+
+
+def _page(tree: WorkstreamTree, skip: int, limit: int) -> list[WorkstreamBase]:
+    results = [dict(workstream) for workstream in tree.listing[skip:skip + limit]]
+    if not results:
+        raise KeyError("No records returned")
+    return results
+
+
+def _workstream_list(results: list[WorkstreamBase],
+                     count: int,
+                     skip: int,
+                     limit: int) -> WorkstreamListModel:
+    return {'results': results,
+            'meta': {'count': {'total': count},
+                     'skip': skip,
+                     'limit': limit}}
+
 
 class Workstream:
+    """Workstreams and their members
+
+    The hierarchy and the members of each workstream are read from the
+    snapshot of the current data version, see :mod:`app.core.workstreams`,
+    which is loaded with a single query when the data version changes. Only
+    the page of members shown is read from the graph.
+    """
+
+    def tree(self) -> WorkstreamTree:
+        """The workstream hierarchy at the current data version"""
+        tree = workstream_snapshot.current()
+        if tree is None:
+            version = data_version.current
+            tree = WorkstreamTree(self.fetch_tree(), version)
+            workstream_snapshot.replace(tree)
+        return tree
+
+    @connect_to_db
+    def fetch_tree(self, db: Driver) -> List[Dict[str, Any]]:
+        records, _, _ = db.execute_query(WORKSTREAM_TREE_QUERY)
+        return [record.data() for record in records]
 
     def get_all(self, skip: int = 0, limit: int = 20) -> WorkstreamListModel:
         """Return a list of all workstreams
@@ -25,10 +74,8 @@ class Workstream:
         -------
         app.schema.workstream.WorkstreamListModel
         """
-        return {'results': self.get_workstreams(skip=skip, limit=limit),
-                'meta': {'count': {'total': self.count_members()},
-                         'skip': skip,
-                         'limit': limit}}
+        tree = self.tree()
+        return _workstream_list(_page(tree, skip, limit), tree.total, skip, limit)
 
     def get(self,
             id: str,
@@ -36,6 +83,8 @@ class Workstream:
             limit: int = 20) -> WorkstreamDetailModel:
         """Return a list of members for a workstream
 
+        Members of the workstreams below it, at any depth, are included.
+
         Arguments
         ---------
         id: str
@@ -49,61 +98,80 @@ class Workstream:
         -------
         app.schema.workstream.WorkstreamDetailModel
 
+        Raises
+        ------
+        KeyError
+            If there is no workstream ``id``
         """
-        workstream = self.get_workstream_detail(id)
-        if workstream:
-            members = self.get_members([id] + workstream.pop('children'),
-                                    skip=skip,
-                                    limit=limit)  # typing: AuthorListModel
-            return workstream | {'members': members}
-        else:
-            return {'members': {}}
-
-    @connect_to_db
-    def get_workstream_detail(self, id: str, db: Driver) -> dict:
-        query = """MATCH (p:Workstream)
-                WHERE p.id = $id
-                OPTIONAL MATCH (p)<-[:unit_of]-(b:Workstream)
-                RETURN p.id as id, p.name as name, collect(b.id) as children
-                """
-        records, _, _ = db.execute_query(query, id=id)
-        if records:
-            return records[0].data()
-        else:
-            raise KeyError("No records returned for {id}")
+        tree = self.tree()
+        workstream = tree.detail(id)
+        del workstream['children']
+        return workstream | {'members': self.get_members(tree.descendants(id), skip, limit)}
 
     def get_outputs(self, id: str, skip, limit) -> OutputListModel:
         output = Output()
         return output.get_outputs(skip, limit)
 
-    @connect_to_db
-    def get_workstreams(self,
-                        db: Driver,
-                        skip: int = 0,
-                        limit: int = 20
-                        ) -> list[WorkstreamBase]:
-        query = """MATCH (p:Workstream)-[]-(:Author)
-                OPTIONAL MATCH (u:Workstream)<-[:unit_of]-(p)
-                RETURN DISTINCT u.id as unit_id, u.name as unit_name, p.id as id, p.name as name
-                ORDER BY unit_name, name
-                SKIP $skip
-                LIMIT $limit"""
-        records, _, _ = db.execute_query(query, skip=skip, limit=limit)
-        if len(records) == 0:
-            raise KeyError("No records returned")
-        else:
-            return [x.data() for x in records]
-
     def get_members(self,
                     id: list[str],
                     skip: int = 0,
                     limit: int = 20) -> AuthorListModel:
-        author = Author()
-        return author.get_authors(skip, limit, id)
+        """Return a page of the members of the workstreams ``id``"""
+        members = self.tree().members(id)
+        page = [uuid for _, uuid in members[skip:skip + limit]]
+        authors = Author().fetch_authors_by_uuid(page, list(id)) if page else []
+        return _author_list(authors, len(members), skip, limit)
 
-    @connect_to_db
-    def count_members(self, db: Driver) -> int:
-        query = """MATCH (p:Workstream)
-                RETURN count(DISTINCT p) as count"""
-        records, _, _ = db.execute_query(query)
-        return records[0].data()['count']
+
+class AsyncWorkstream:
+    """Asyncio variant of :class:`Workstream` for use in ``async def`` routes"""
+
+    async def tree(self) -> WorkstreamTree:
+        """See :meth:`Workstream.tree`"""
+        tree = workstream_snapshot.current()
+        if tree is None:
+            version = data_version.current
+            tree = WorkstreamTree(await self.fetch_tree(), version)
+            workstream_snapshot.replace(tree)
+        return tree
+
+    @connect_to_async_db
+    async def fetch_tree(self, db: AsyncDriver) -> List[Dict[str, Any]]:
+        records, _, _ = await db.execute_query(WORKSTREAM_TREE_QUERY)
+        return [record.data() for record in records]
+
+    async def get_all(self, skip: int = 0, limit: int = 20) -> WorkstreamListModel:
+        """Return a list of all workstreams
+
+        See :meth:`Workstream.get_all`
+        """
+        tree = await self.tree()
+        return _workstream_list(_page(tree, skip, limit), tree.total, skip, limit)
+
+    async def get(self,
+                  id: str,
+                  skip: int = 0,
+                  limit: int = 20) -> WorkstreamDetailModel:
+        """Return a list of members for a workstream
+
+        See :meth:`Workstream.get`
+        """
+        tree = await self.tree()
+        workstream = tree.detail(id)
+        del workstream['children']
+        members = await self.get_members(tree.descendants(id), skip, limit)
+        return workstream | {'members': members}
+
+    async def get_outputs(self, id: str, skip, limit) -> OutputListModel:
+        output = AsyncOutput()
+        return await output.get_outputs(skip, limit)
+
+    async def get_members(self,
+                          id: list[str],
+                          skip: int = 0,
+                          limit: int = 20) -> AuthorListModel:
+        """See :meth:`Workstream.get_members`"""
+        members = (await self.tree()).members(id)
+        page = [uuid for _, uuid in members[skip:skip + limit]]
+        authors = await AsyncAuthor().fetch_authors_by_uuid(page, list(id)) if page else []
+        return _author_list(authors, len(members), skip, limit)
@@ -0,0 +1,181 @@
+"""Indexes and constraints required by the CRUD queries
+
+:data:`SCHEMA` declares every property the queries look nodes up by. Without
+an index each detail page is a scan over all nodes with the label.
+:func:`bootstrap_schema` creates whatever is missing and is idempotent. It
+runs on start-up and from ``python -m app.cli schema``.
+
+Memgraph and Neo4j use different syntax for schema commands, so the server
+agent reported by the driver selects the dialect. In Memgraph a uniqueness
+constraint is not backed by an index, so unique keys get both.
+"""
+from typing import Any, Dict, List, NamedTuple, Set, Tuple
+
+from fastapi.logger import logger
+from neo4j import Driver
+
+from app.db.session import connect_to_db
+
+
+class SchemaItem(NamedTuple):
+    label: str
+    property: str
+    unique: bool = False
+
+    def __str__(self) -> str:
+        kind = "unique" if self.unique else "index"
+        return f"{kind} :{self.label}({self.property})"
+
+
+SCHEMA: List[SchemaItem] = [
+    SchemaItem("Output", "uuid", unique=True),
+    SchemaItem("Output", "doi"),
+    SchemaItem("Output", "result_type"),
+    SchemaItem("Output", "publication_year"),
+    SchemaItem("Output", "sort_year"),
+    SchemaItem("Output", "modified"),
+    SchemaItem("Author", "uuid", unique=True),
+    SchemaItem("Author", "last_name"),
+    SchemaItem("Author", "orcid"),
+    SchemaItem("Country", "id", unique=True),
+    SchemaItem("Workstream", "id", unique=True),
+    SchemaItem("Statistics", "id", unique=True),
+]
+
+
+def _properties(value: Any) -> Tuple[str, ...]:
+    if value is None:
+        return ()
+    if isinstance(value, str):
+        return (value,)
+    return tuple(value)
+
+
+class Memgraph:
+    @staticmethod
+    def existing(db: Driver) -> Tuple[Set[Tuple[str, str]], Set[Tuple[str, str]]]:
+        indexes, constraints = set(), set()
+        records, _, _ = db.execute_query("SHOW INDEX INFO;")
+        for record in records:
+            props = _properties(record["property"])
+            if len(props) == 1:
+                indexes.add((record["label"], props[0]))
+        records, _, _ = db.execute_query("SHOW CONSTRAINT INFO;")
+        for record in records:
+            props = _properties(record["properties"])
+            if record["constraint type"] == "unique" and len(props) == 1:
+                constraints.add((record["label"], props[0]))
+        return indexes, constraints
+
+    @staticmethod
+    def create_index(item: SchemaItem) -> str:
+        return f"CREATE INDEX ON :{item.label}({item.property});"
+
+    @staticmethod
+    def create_constraint(item: SchemaItem) -> str:
+        return (f"CREATE CONSTRAINT ON (n:{item.label}) "
+                f"ASSERT n.{item.property} IS UNIQUE;")
+
+    @staticmethod
+    def statements(item: SchemaItem, indexes, constraints) -> List[str]:
+        key = (item.label, item.property)
+        statements = []
+        if key not in indexes:
+            statements.append(Memgraph.create_index(item))
+        if item.unique and key not in constraints:
+            statements.append(Memgraph.create_constraint(item))
+        return statements
+
+
+class Neo4j:
+    @staticmethod
+    def existing(db: Driver) -> Tuple[Set[Tuple[str, str]], Set[Tuple[str, str]]]:
+        indexes, constraints = set(), set()
+        records, _, _ = db.execute_query(
+            "SHOW INDEXES YIELD labelsOrTypes, properties, entityType")
+        for record in records:
+            labels = _properties(record["labelsOrTypes"])
+            props = _properties(record["properties"])
+            if record["entityType"] == "NODE" and len(labels) == 1 and len(props) == 1:
+                indexes.add((labels[0], props[0]))
+        records, _, _ = db.execute_query(
+            "SHOW CONSTRAINTS YIELD labelsOrTypes, properties, type")
+        for record in records:
+            labels = _properties(record["labelsOrTypes"])
+            props = _properties(record["properties"])
+            if "UNIQUE" in record["type"] and len(labels) == 1 and len(props) == 1:
+                constraints.add((labels[0], props[0]))
+        return indexes, constraints
+
+    @staticmethod
+    def statements(item: SchemaItem, indexes, constraints) -> List[str]:
+        key = (item.label, item.property)
+        name = f"{item.label.lower()}_{item.property}"
+        if item.unique:
+            if key in constraints:
+                return []
+            # The constraint is backed by an index, which must not exist yet
+            statements = []
+            if key in indexes:
+                statements.append(f"DROP INDEX {name}_index IF EXISTS")
+            statements.append(
+                f"CREATE CONSTRAINT {name}_unique IF NOT EXISTS "
+                f"FOR (n:{item.label}) REQUIRE n.{item.property} IS UNIQUE")
+            return statements
+        if key in indexes:
+            return []
+        return [f"CREATE INDEX {name}_index IF NOT EXISTS "
+                f"FOR (n:{item.label}) ON (n.{item.property})"]
+
+
+def _dialect(db: Driver):
+    agent = db.get_server_info().agent or ""
+    return Memgraph if agent.lower().startswith("memgraph") else Neo4j
+
+
+def _missing(items, dialect, indexes, constraints) -> Dict[SchemaItem, List[str]]:
+    missing = {}
+    for item in items:
+        if statements := dialect.statements(item, indexes, constraints):
+            missing[item] = statements
+    return missing
+
+
+@connect_to_db
+def check_schema(db: Driver) -> List[SchemaItem]:
+    """Return the items of :data:`SCHEMA` missing from the database"""
+    dialect = _dialect(db)
+    indexes, constraints = dialect.existing(db)
+    return list(_missing(SCHEMA, dialect, indexes, constraints))
+
+
+@connect_to_db
+def bootstrap_schema(db: Driver) -> Dict[str, List[str]]:
+    """Create the items of :data:`SCHEMA` missing from the database
+
+    Returns
+    -------
+    dict
+        ``created`` lists the items created, ``present`` those that already
+        existed and ``failed`` those that could not be created, e.g. because
+        existing nodes violate a uniqueness constraint.
+    """
+    dialect = _dialect(db)
+    indexes, constraints = dialect.existing(db)
+    missing = _missing(SCHEMA, dialect, indexes, constraints)
+    report = {"present": [str(item) for item in SCHEMA if item not in missing],
+              "created": [],
+              "failed": []}
+    for item, statements in missing.items():
+        try:
+            for statement in statements:
+                # Schema commands cannot run in an explicit transaction
+                with db.session() as session:
+                    session.run(statement).consume()
+        except Exception as e:
+            logger.error(f"Could not create {item}: {str(e)}")
+            report["failed"].append(str(item))
+        else:
+            logger.info(f"Created {item}")
+            report["created"].append(str(item))
+    return report
@@ -1,28 +1,362 @@
+import asyncio
+import time
 from functools import wraps
-from  app.core.config import settings
+from threading import Lock
 
+from fastapi.logger import logger
+from neo4j import AsyncDriver, AsyncGraphDatabase, Driver, GraphDatabase
 
-from neo4j import GraphDatabase
+from app.core.config import settings
+from app.core.metrics import record_query, record_query_error, record_query_time
+from app.db.slowlog import query_parameters, slow_queries
 
 MG_HOST = settings.MG_HOST
 MG_PORT = settings.MG_PORT
 MG_USER = settings.MG_USER
 MG_PASS = settings.MG_PASS
 
+_driver: Driver | None = None
+_driver_lock = Lock()
 
-def connect_to_db(f):
-    @wraps(f)
-    def with_connection_(*args, **kwargs):
+_async_driver: AsyncDriver | None = None
+_async_driver_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _driver_config() -> dict:
+    return dict(
+        auth=(MG_USER, MG_PASS),
+        max_connection_pool_size=settings.MG_MAX_POOL_SIZE,
+        max_connection_lifetime=settings.MG_MAX_CONNECTION_LIFETIME,
+        connection_acquisition_timeout=settings.MG_CONNECTION_ACQUISITION_TIMEOUT,
+        fetch_size=settings.MG_FETCH_SIZE,
+    )
+
+
+def get_driver() -> Driver:
+    """Return the driver shared by every CRUD call in this process
+
+    The driver owns a pool of Bolt connections, so it is created once per
+    worker and reused. It is normally opened by the application lifespan
+    hook, but is created lazily if a CRUD class is used outside the app
+    (e.g. from a script or a test client without a lifespan).
+    """
+    global _driver
+    if _driver is None:
+        with _driver_lock:
+            if _driver is None:
+                URI = f"bolt://{MG_HOST}:{MG_PORT}"
+                _driver = GraphDatabase.driver(URI, **_driver_config())
+    return _driver
+
+
+def _discard_async_driver(driver: AsyncDriver, loop: asyncio.AbstractEventLoop) -> None:
+    """Close a driver bound to another event loop
+
+    Its connections can only be closed on that loop. If the loop no longer
+    runs, e.g. the loop of a finished test client request, the driver is
+    dropped and its sockets are closed when they are collected.
+    """
+    if loop.is_running():
+        asyncio.run_coroutine_threadsafe(driver.close(), loop)
+    else:
+        logger.warning("Dropping the async driver of an event loop that no longer runs")
+
+
+def get_async_driver() -> AsyncDriver:
+    """Return the asyncio driver shared by the async CRUD classes
+
+    An async driver is bound to the event loop it was created on, so a new
+    one is created if it is requested from a different loop, and the one of
+    the previous loop is closed, see :func:`_discard_async_driver`.
+    """
+    global _async_driver, _async_driver_loop
+    loop = asyncio.get_running_loop()
+    if _async_driver is None or _async_driver_loop is not loop:
+        if _async_driver is not None:
+            _discard_async_driver(_async_driver, _async_driver_loop)
+        URI = f"bolt://{MG_HOST}:{MG_PORT}"
+        _async_driver = AsyncGraphDatabase.driver(URI, **_driver_config())
+        _async_driver_loop = loop
+    return _async_driver
+
+
+def open_driver() -> Driver:
+    """Create the shared driver and check that the database is reachable"""
+    driver = get_driver()
+    try:
+        driver.verify_connectivity()
+    except Exception as e:
+        logger.error(f"Could not connect to the database: {str(e)}")
+    return driver
+
+
+async def open_async_driver() -> AsyncDriver:
+    """Create the shared async driver and check the database is reachable"""
+    driver = get_async_driver()
+    try:
+        await driver.verify_connectivity()
+    except Exception as e:
+        logger.error(f"Could not connect to the database: {str(e)}")
+    return driver
+
+
+async def close_async_driver() -> None:
+    """Close the shared async driver and all pooled connections"""
+    global _async_driver, _async_driver_loop
+    if _async_driver is not None:
+        await _async_driver.close()
+        _async_driver = None
+        _async_driver_loop = None
+
+
+def close_driver() -> None:
+    """Close the shared driver and all pooled connections"""
+    global _driver
+    with _driver_lock:
+        if _driver is not None:
+            _driver.close()
+            _driver = None
+
+
+class InstrumentedTransaction:
+    """Transaction proxy keeping the ``(query, parameters)`` of each statement it runs"""
+
+    def __init__(self, tx):
+        self._tx = tx
+        self.statements = []
+
+    def run(self, query, parameters=None, **kwargs):
+        self.statements.append((query, {**(parameters or {}), **kwargs}))
+        return self._tx.run(query, parameters, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._tx, name)
+
+
+class AsyncInstrumentedTransaction(InstrumentedTransaction):
+    """Asyncio variant of :class:`InstrumentedTransaction`"""
+
+    async def run(self, query, parameters=None, **kwargs):
+        self.statements.append((query, {**(parameters or {}), **kwargs}))
+        return await self._tx.run(query, parameters, **kwargs)
+
+
+class InstrumentedSession:
+    """Session proxy recording its queries and managed transactions under ``name``
+
+    A managed transaction (``execute_read`` or ``execute_write``) is timed as
+    a whole, including the retries of the driver, and passed to the slow-query
+    log with the statements of its last attempt. A query of ``run`` streams its
+    records as the caller reads them, so it is timed until the session runs
+    the next query or closes, and is not passed to the slow-query log, as its
+    time includes the caller's.
+
+    Any other attribute is looked up on the wrapped session.
+    """
+
+    def __init__(self, session, name: str):
+        self._session = session
+        self._name = name
+        self._started: float | None = None
+
+    def __enter__(self):
+        self._session.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._finish(exc_info[0] is not None)
+        return self._session.__exit__(*exc_info)
+
+    def run(self, query, parameters=None, **kwargs):
+        self._finish(False)
+        self._started = time.perf_counter()
+        try:
+            return self._session.run(query, parameters, **kwargs)
+        except Exception:
+            self._finish(True)
+            raise
+
+    def execute_read(self, transaction_function, *args, **kwargs):
+        return self._execute(self._session.execute_read, transaction_function, args, kwargs)
+
+    def execute_write(self, transaction_function, *args, **kwargs):
+        return self._execute(self._session.execute_write, transaction_function, args, kwargs)
+
+    def _execute(self, execute, transaction_function, args: tuple, kwargs: dict):
+        attempt = None
+
+        def work(tx):
+            nonlocal attempt
+            attempt = InstrumentedTransaction(tx)
+            return transaction_function(attempt, *args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            result = execute(work)
+        except Exception:
+            record_query_error(self._name)
+            raise
+        self._record(time.perf_counter() - start, attempt.statements if attempt else [])
+        return result
+
+    def _finish(self, failed: bool) -> None:
+        """Record the query of ``run`` in progress, if any"""
+        if self._started is None:
+            return
+        if failed:
+            record_query_error(self._name)
+        else:
+            record_query_time(self._name, time.perf_counter() - self._started)
+        self._started = None
 
+    def _record(self, seconds: float, statements: list) -> None:
+        record_query_time(self._name, seconds)
+        if len(statements) == 1:
+            query, parameters = statements[0]
+            slow_queries.observe(self._name, query, parameters, seconds, None, get_driver)
+        else:
+            # The statements of a transaction cannot be profiled on their own
+            slow_queries.observe(self._name,
+                                 ";\n".join(query for query, _ in statements),
+                                 {str(number): parameters
+                                  for number, (_, parameters) in enumerate(statements)},
+                                 seconds, None, get_driver, profile=False)
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+class AsyncInstrumentedSession(InstrumentedSession):
+    """Asyncio variant of :class:`InstrumentedSession`"""
+
+    async def __aenter__(self):
+        await self._session.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._finish(exc_info[0] is not None)
+        return await self._session.__aexit__(*exc_info)
+
+    async def run(self, query, parameters=None, **kwargs):
+        self._finish(False)
+        self._started = time.perf_counter()
+        try:
+            return await self._session.run(query, parameters, **kwargs)
+        except Exception:
+            self._finish(True)
+            raise
+
+    async def execute_read(self, transaction_function, *args, **kwargs):
+        return await self._execute(self._session.execute_read, transaction_function,
+                                   args, kwargs)
+
+    async def execute_write(self, transaction_function, *args, **kwargs):
+        return await self._execute(self._session.execute_write, transaction_function,
+                                   args, kwargs)
+
+    async def _execute(self, execute, transaction_function, args: tuple, kwargs: dict):
+        attempt = None
+
+        async def work(tx):
+            nonlocal attempt
+            attempt = AsyncInstrumentedTransaction(tx)
+            return await transaction_function(attempt, *args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            result = await execute(work)
+        except Exception:
+            record_query_error(self._name)
+            raise
+        self._record(time.perf_counter() - start, attempt.statements if attempt else [])
+        return result
+
+
+class InstrumentedDriver:
+    """Driver proxy recording the timings of each query under ``name``
+
+    Queries of ``execute_query`` are recorded with their records and summary,
+    and slow ones are passed to the slow-query log, see :mod:`app.db.slowlog`.
+    Sessions are wrapped in an :class:`InstrumentedSession`, recording their
+    queries and managed transactions under the same name.
+
+    Any other attribute is looked up on the wrapped driver.
+    """
+
+    def __init__(self, driver: Driver, name: str):
+        self._driver = driver
+        self._name = name
+
+    def execute_query(self, query, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = self._driver.execute_query(query, *args, **kwargs)
+        except Exception:
+            record_query_error(self._name)
+            raise
+        self._record(time.perf_counter() - start, result, query, args, kwargs)
+        return result
+
+    def session(self, **config) -> InstrumentedSession:
+        return InstrumentedSession(self._driver.session(**config), self._name)
+
+    def _record(self, seconds: float, result, query, args: tuple, kwargs: dict) -> None:
+        record_query(self._name, seconds, result)
+        slow_queries.observe(self._name, query, query_parameters(args, kwargs),
+                             seconds, result[1], get_driver)
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+
+class AsyncInstrumentedDriver(InstrumentedDriver):
+    """Asyncio variant of :class:`InstrumentedDriver`"""
+
+    async def execute_query(self, query, *args, **kwargs):
+        start = time.perf_counter()
         try:
-            URI = f"bolt://{MG_HOST}:{MG_PORT}"
-            AUTH = (MG_USER, MG_PASS)
-            with GraphDatabase.driver(URI, auth=AUTH) as db:
-                db.verify_connectivity()
-                return f(*args, db, **kwargs)
+            result = await self._driver.execute_query(query, *args, **kwargs)
         except Exception:
+            record_query_error(self._name)
             raise
-        finally:
-            db.close()
+        self._record(time.perf_counter() - start, result, query, args, kwargs)
+        return result
+
+    def session(self, **config) -> AsyncInstrumentedSession:
+        return AsyncInstrumentedSession(self._driver.session(**config), self._name)
+
+
+def open_session(name: str, **config) -> InstrumentedSession:
+    """Open a session of the shared driver recording its queries under ``name``"""
+    return InstrumentedDriver(get_driver(), name).session(**config)
+
+
+def open_async_session(name: str, **config) -> AsyncInstrumentedSession:
+    """Open a session of the shared async driver recording its queries under ``name``"""
+    return AsyncInstrumentedDriver(get_async_driver(), name).session(**config)
+
+
+def connect_to_db(f):
+    """Pass the shared driver to ``f`` after its positional arguments
+
+    Queries are recorded under the qualified name of ``f``, see
+    :mod:`app.core.metrics`.
+    """
+    name = f.__qualname__
+
+    @wraps(f)
+    def with_connection_(*args, **kwargs):
+        return f(*args, InstrumentedDriver(get_driver(), name), **kwargs)
+
+    return with_connection_
+
+
+def connect_to_async_db(f):
+    """Pass the shared async driver to ``f`` after its positional arguments"""
+    name = f.__qualname__
+
+    @wraps(f)
+    async def with_connection_(*args, **kwargs):
+        return await f(*args, AsyncInstrumentedDriver(get_async_driver(), name), **kwargs)
 
     return with_connection_
@@ -0,0 +1,182 @@
+"""Slow-query log with PROFILE capture
+
+Queries run through the CRUD layer that take longer than
+``SLOW_QUERY_THRESHOLD`` seconds are logged with their name, parameters and
+timings. Each is then re-run under ``PROFILE`` in a background thread, and
+the operator plan with its db hits is appended to ``SLOW_QUERY_LOG_FILE`` as
+one JSON object per line::
+
+    {"time": ..., "query": "Output.filter_country", "seconds": 1.2,
+     "available_after_ms": 1150, "consumed_after_ms": 40,
+     "parameters": {...}, "plan": [{"operator": "ScanAll", "db_hits": 120000}, ...]}
+
+Parameters are summarised by :func:`summarise_parameters`, as a write may
+carry a whole batch of rows: lists are replaced by their length and long
+strings are cut short. The query is profiled with the full parameters.
+
+Profiling re-executes the query, so it is limited to one run per query name
+every ``SLOW_QUERY_PROFILE_INTERVAL`` seconds, at most one run at a time, and
+to read-only queries.
+"""
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from fastapi.logger import logger
+from neo4j import Driver
+
+from app.core.config import settings
+
+# Longest string parameter logged in full
+LOGGED_STRING = 100
+
+WRITE_CLAUSES = re.compile(r"\b(CREATE|MERGE|SET|DELETE|REMOVE|DROP|LOAD|FOREACH)\b",
+                           re.IGNORECASE)
+
+
+def query_parameters(args: tuple, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """The query parameters of an ``execute_query`` call
+
+    Keyword arguments ending with an underscore configure the driver and are
+    not parameters.
+    """
+    parameters = dict(args[0]) if args and args[0] else {}
+    parameters.update(kwargs.get("parameters_") or {})
+    parameters.update({k: v for k, v in kwargs.items() if not k.endswith("_")})
+    return parameters
+
+
+def summarise_parameters(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """The parameters with each list replaced by ``"<list of n>"`` and long strings cut short
+
+    Maps, e.g. the parameters of each statement of a transaction, are
+    summarised in turn.
+    """
+    summary = {}
+    for key, value in parameters.items():
+        if isinstance(value, dict):
+            summary[key] = summarise_parameters(value)
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            summary[key] = f"<list of {len(value)}>"
+        elif isinstance(value, str) and len(value) > LOGGED_STRING:
+            summary[key] = f"{value[:LOGGED_STRING]}... <{len(value)} characters>"
+        else:
+            summary[key] = value
+    return summary
+
+
+def _plan_from_profile(profile: Dict[str, Any], depth: int = 0) -> List[Dict[str, Any]]:
+    """Flatten the profile tree returned by Neo4j"""
+    plan = [{"operator": profile.get("operatorType"),
+             "db_hits": profile.get("dbHits"),
+             "rows": profile.get("rows"),
+             "details": profile.get("args", {}).get("Details"),
+             "depth": depth}]
+    for child in profile.get("children", []):
+        plan.extend(_plan_from_profile(child, depth + 1))
+    return plan
+
+
+def _plan_from_records(records) -> List[Dict[str, Any]]:
+    """Operator plan from the rows returned by Memgraph"""
+    return [{"operator": row.get("OPERATOR", "").strip(),
+             "db_hits": row.get("ACTUAL HITS"),
+             "relative_time": row.get("RELATIVE TIME"),
+             "absolute_time": row.get("ABSOLUTE TIME")}
+            for row in (record.data() for record in records)]
+
+
+def profile_query(db: Driver, query: str, parameters: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Run ``query`` under PROFILE and return its operator plan"""
+    records, summary, _ = db.execute_query(f"PROFILE {query}", parameters)
+    if summary.profile:
+        return _plan_from_profile(summary.profile)
+    return _plan_from_records(records)
+
+
+class SlowQueryLog:
+    """Log queries slower than ``threshold`` seconds and profile them in the background"""
+
+    def __init__(self,
+                 threshold: float,
+                 path: str,
+                 profile: bool = True,
+                 interval: float = 300):
+        self.threshold = threshold
+        self.path = path
+        self.profile = profile
+        self.interval = interval
+        self._last_profiled: Dict[str, float] = {}
+        self._busy = False
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile")
+
+    def observe(self,
+                name: str,
+                query: str,
+                parameters: Dict[str, Any],
+                seconds: float,
+                summary,
+                get_driver: Callable[[], Driver],
+                profile: bool = True) -> None:
+        """Record a query that took ``seconds`` if it is slow
+
+        ``profile=False`` only logs the query, e.g. the joined statements of a
+        transaction, which cannot be profiled as one query.
+        """
+        if self.threshold <= 0 or seconds < self.threshold:
+            return
+        entry = {"time": time.time(),
+                 "query": name,
+                 "seconds": seconds,
+                 "available_after_ms": getattr(summary, "result_available_after", None),
+                 "consumed_after_ms": getattr(summary, "result_consumed_after", None),
+                 "parameters": summarise_parameters(parameters)}
+        logger.warning(f"Slow query {name} took {seconds:.3f}s with {entry['parameters']}")
+        if profile and self._should_profile(name, query):
+            self._executor.submit(self._profile, entry, query, parameters, get_driver)
+        else:
+            self._write(entry)
+
+    def _should_profile(self, name: str, query: str) -> bool:
+        if not self.profile or WRITE_CLAUSES.search(query):
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if self._busy or now - self._last_profiled.get(name, -self.interval) < self.interval:
+                return False
+            self._busy = True
+            self._last_profiled[name] = now
+        return True
+
+    def _profile(self,
+                 entry: Dict[str, Any],
+                 query: str,
+                 parameters: Dict[str, Any],
+                 get_driver: Callable[[], Driver]) -> None:
+        try:
+            entry["plan"] = profile_query(get_driver(), query, parameters)
+        except Exception as e:
+            logger.error(f"Could not profile {entry['query']}: {str(e)}")
+            entry["profile_error"] = str(e)
+        finally:
+            with self._lock:
+                self._busy = False
+        self._write(entry)
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        try:
+            with self._write_lock, open(self.path, "a") as log_file:
+                log_file.write(json.dumps(entry, default=str) + "\n")
+        except OSError as e:
+            logger.error(f"Could not write the slow-query log: {str(e)}")
+
+
+slow_queries = SlowQueryLog(threshold=settings.SLOW_QUERY_THRESHOLD,
+                            path=settings.SLOW_QUERY_LOG_FILE,
+                            profile=settings.SLOW_QUERY_PROFILE,
+                            interval=settings.SLOW_QUERY_PROFILE_INTERVAL)
@@ -4,17 +4,38 @@ from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 
+import asyncio
+from contextlib import asynccontextmanager
 from typing import Annotated
 from uuid import UUID
 
-from app.crud.author import Author
-from app.crud.country import Country
-from app.crud.output import Output
-from app.crud.workstream import Workstream
+from app.crud.author import AsyncAuthor
+from app.crud.collaboration import Collaborations
+from app.crud.country import AsyncCountry
+from app.crud.ingest import shutdown_ingest_jobs
+from app.crud.output import AsyncOutput
+from app.crud.search import AsyncSearch, build_index
+from app.crud.suggest import AsyncSuggest, build_suggestions
+from app.core.cache import poll_data_version
+from app.core.conditional import ConditionalGetMiddleware
+from app.core.fragments import render_fragment
+from app.core.jobs import writer_lock
+from app.core.config import settings
+from app.core.metrics import MetricsMiddleware
+from app.core.pagination import page_window
+from app.core.search import poll_index, search_index
+from app.core.suggest import suggest_index
+from app.crud.statistics import AsyncStatistics, Statistics
+from app.crud.workstream import AsyncWorkstream
+from app.db.schema import bootstrap_schema
+from app.db.session import (close_async_driver, close_driver,
+                            open_async_driver, open_driver)
 from app.schemas.query import (FilterWorkstream, FilterParams, FilterBase, FilterOutputList)
 
-from app.api import author, country, ingest, output, workstream
+from app.api import (author, cache, country, graph, ingest, metrics, output, search,
+                     suggest, workstream)
 
 import logging
 
@@ -32,8 +53,79 @@ console_handler.setFormatter(formatter)
 uvicorn_access_logger = logging.getLogger("uvicorn.access")
 logger.handlers = uvicorn_access_logger.handlers
 
-app = FastAPI()
 
+def ensure_counters() -> None:
+    """Build the output counters and collaborations if they do not exist yet
+
+    Only the worker that takes the writer lock builds them. Workers that find
+    it taken skip this, as another worker is building them or an ingestion
+    job is writing to the graph.
+    """
+    with writer_lock(settings.INGEST_JOBS_DIR, wait=False) as locked:
+        if not locked:
+            logger.info("Another process holds the writer lock, not building counters")
+            return
+        try:
+            Statistics().ensure()
+        except Exception as e:
+            logger.error(f"Could not build the output counters: {str(e)}")
+        try:
+            Collaborations().ensure()
+        except Exception as e:
+            logger.error(f"Could not build the collaborations: {str(e)}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the pooled database drivers per worker and close them on shutdown
+
+    Missing indexes and constraints are created, the denormalised output
+    counters and collaborations are built by one worker on first start-up if
+    they do not exist yet, see :func:`ensure_counters`, and the data version
+    is polled in the background to invalidate the response cache after an
+    ingestion. The search and suggestion indexes are built in the background
+    and refreshed when the data version changes.
+    """
+    open_driver()
+    await open_async_driver()
+    if settings.SCHEMA_BOOTSTRAP:
+        try:
+            report = await run_in_threadpool(bootstrap_schema)
+            if report["failed"]:
+                logger.warning(f"Missing indexes or constraints: {report['failed']}")
+        except Exception as e:
+            logger.error(f"Could not check indexes and constraints: {str(e)}")
+    await run_in_threadpool(ensure_counters)
+    tasks = [asyncio.create_task(
+        poll_data_version(AsyncStatistics().get_version, settings.CACHE_VERSION_POLL))]
+    if settings.SEARCH_ENABLED:
+        tasks.append(asyncio.create_task(
+            poll_index(search_index,
+                       lambda: run_in_threadpool(build_index),
+                       AsyncSearch().changed_since,
+                       settings.CACHE_VERSION_POLL)))
+    if settings.SUGGEST_ENABLED:
+        tasks.append(asyncio.create_task(
+            poll_index(suggest_index,
+                       lambda: run_in_threadpool(build_suggestions),
+                       AsyncSuggest().changed_since,
+                       settings.CACHE_VERSION_POLL)))
+    yield
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    shutdown_ingest_jobs()
+    await close_async_driver()
+    close_driver()
+
+
+app = FastAPI(lifespan=lifespan)
+
+app.add_middleware(ConditionalGetMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -41,21 +133,29 @@ app.add_middleware(
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"]
     )
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(author.router)
+app.include_router(cache.router)
 app.include_router(country.router)
+app.include_router(graph.router)
 app.include_router(ingest.router)
+app.include_router(metrics.router)
 app.include_router(output.router)
+app.include_router(search.router)
+app.include_router(suggest.router)
 app.include_router(workstream.router)
 
 templates = Jinja2Templates(directory="app/templates")
+templates.env.globals["fragment"] = render_fragment
+templates.env.globals["page_window"] = page_window
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 
 @app.get("/", response_class=HTMLResponse)
 @app.get("/index", response_class=HTMLResponse)
-def index(request: Request):
-    countries = Country().get_countries(skip=0, limit=200)
+async def index(request: Request):
+    countries = await AsyncCountry().get_countries(skip=0, limit=200)
     return templates.TemplateResponse(
         request,
         "index.html",
@@ -64,13 +164,14 @@ def index(request: Request):
 
 
 @app.get("/countries/{id}", response_class=HTMLResponse)
-def country(request: Request,
-            id: Annotated[str, Path(examples=['KEN'], title="Country identifier", pattern="^([A-Z]{3})$")],
-            query: Annotated[FilterParams, Query()]
-            ):
-    country_model = Country()
+async def country(request: Request,
+                  id: Annotated[str, Path(examples=['KEN'], title="Country identifier", pattern="^([A-Z]{3})$")],
+                  query: Annotated[FilterParams, Query()]
+                  ):
+    country_model = AsyncCountry()
     try:
-        country = country_model.get_country(id, query.skip, query.limit, query.result_type)
+        country = await country_model.get_country(id, query.skip, query.limit, query.result_type,
+                                                  query.cursor)
     except KeyError:
         raise HTTPException(status_code=404,
                             detail=f"Country with id '{id}' not found")
@@ -86,13 +187,13 @@ def country(request: Request,
 
 
 @app.get("/countries", response_class=HTMLResponse)
-def country_list(request: Request,
-                 query: Annotated[FilterBase, Query()]
+async def country_list(request: Request,
+                       query: Annotated[FilterBase, Query()]
 
-                 ):
-    country_model = Country()
+                       ):
+    country_model = AsyncCountry()
     try:
-        entity = country_model.get_countries(query.skip, query.limit)
+        entity = await country_model.get_countries(query.skip, query.limit)
     except Exception as e:
         raise HTTPException(status_code=500,
                             detail=f"Server error: {str(e)}") from e
@@ -105,16 +206,17 @@ def country_list(request: Request,
 
 
 @app.get("/authors/{id}", response_class=HTMLResponse)
-def author(request: Request,
-           id: Annotated[UUID, Path(title="Unique author identifier")],
-           query: Annotated[FilterParams, Query()]):
-    author = Author()
+async def author(request: Request,
+                 id: Annotated[UUID, Path(title="Unique author identifier")],
+                 query: Annotated[FilterParams, Query()]):
+    author = AsyncAuthor()
     try:
-        entity = author.get_author(
+        entity = await author.get_author(
             id,
             result_type=query.result_type,
             skip=query.skip,
-            limit=query.limit)
+            limit=query.limit,
+            cursor=query.cursor)
     except KeyError:
         raise HTTPException(status_code=404,
                             detail=f"Author '{id}' not found")
@@ -127,13 +229,14 @@ def author(request: Request,
 
 
 @app.get("/authors", response_class=HTMLResponse)
-def author_list(request: Request,
-                query: Annotated[FilterWorkstream, Query()]):
-    authors = Author()
+async def author_list(request: Request,
+                      query: Annotated[FilterWorkstream, Query()]):
+    authors = AsyncAuthor()
     try:
-        entity = authors.get_authors(skip=query.skip,
-                                     limit=query.limit,
-                                     workstream=query.workstream)
+        entity = await authors.get_authors(skip=query.skip,
+                                           limit=query.limit,
+                                           workstream=query.workstream,
+                                           cursor=query.cursor)
     except KeyError as ex:
         raise HTTPException(status_code=404,
                             detail=f"Authors not found")
@@ -146,16 +249,17 @@ def author_list(request: Request,
 
 
 @app.get("/outputs", response_class=HTMLResponse)
-def output_list(request: Request,
-                query: Annotated[FilterOutputList, Query()]
-                ):
+async def output_list(request: Request,
+                      query: Annotated[FilterOutputList, Query()]
+                      ):
 
-    model = Output()
+    model = AsyncOutput()
     try:
-        package = model.get_outputs(skip=query.skip,
-                                    limit=query.limit,
-                                    result_type=query.result_type,
-                                    country=query.country)
+        package = await model.get_outputs(skip=query.skip,
+                                          limit=query.limit,
+                                          result_type=query.result_type,
+                                          country=query.country,
+                                          cursor=query.cursor)
     except ValueError as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
     else:
@@ -167,12 +271,12 @@ def output_list(request: Request,
 
 
 @app.get("/outputs/{id}", response_class=HTMLResponse)
-def output(request: Request,
-           id: Annotated[UUID, Path(title="Unique output identifier")]
-           ):
-    output_model = Output()
+async def output(request: Request,
+                 id: Annotated[UUID, Path(title="Unique output identifier")]
+                 ):
+    output_model = AsyncOutput()
     try:
-        entity = output_model.get_output(id)
+        entity = await output_model.get_output(id)
     except KeyError as e:
         raise HTTPException(
                 status_code=404, detail=f"Output with id {id} not found"
@@ -188,16 +292,16 @@ def output(request: Request,
 
 
 @app.get("/workstreams", response_class=HTMLResponse)
-def workstream_list(request: Request):
-    model = Workstream()
+async def workstream_list(request: Request):
+    model = AsyncWorkstream()
     try:
-        all = model.get_all()
+        all = await model.get_all()
     except KeyError as e:
         raise HTTPException(status_code=500,
                             detail=f"Database error: {str(e)}") from e
     else:
         try:
-            entity = model.get(all['results'][0]['id'])
+            entity = await model.get(all['results'][0]['id'])
         except KeyError as e:
             raise HTTPException(status_code=500,
                                 detail=f"Database error: {str(e)}") from e
@@ -211,14 +315,14 @@ def workstream_list(request: Request):
 
 
 @app.get("/workstreams/{id}", response_class=HTMLResponse)
-def workstream(request: Request,
-               id: str,
-               query: Annotated[FilterBase, Query()]
-               ):
-    model = Workstream()
-    all = model.get_all()
+async def workstream(request: Request,
+                     id: str,
+                     query: Annotated[FilterBase, Query()]
+                     ):
+    model = AsyncWorkstream()
+    all = await model.get_all()
     try:
-        entity = model.get(id, skip=query.skip, limit=query.limit)
+        entity = await model.get(id, skip=query.skip, limit=query.limit)
     except KeyError as e:
         raise HTTPException(status_code=404,
                             detail=f"Workstream '{id}' not found")
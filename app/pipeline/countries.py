@@ -0,0 +1,258 @@
+"""Link outputs to the countries named in their title and abstract
+
+Country names, alternative names and demonyms (``Kenyan``, ``Zimbabwe's``)
+are compiled once per linker, and so once per ingestion job, into an
+Aho–Corasick automaton, which finds every term in a text in a single pass
+over its characters, however many terms there are. Matches must start and
+end on a word boundary, and where matches overlap the longest wins, so
+"Equatorial Guinea" does not also count as "Guinea" and "Nigeria" is not
+"Niger".
+
+After an ingestion job only the outputs it created or updated are matched
+and re-linked, see :meth:`CountryLinker.link`. ``python -m app.cli
+relink-countries`` re-links every output, see :meth:`CountryLinker.relink_all`.
+The relationships of each batch of outputs are replaced in one write
+transaction, and the ids of the countries they were linked to before are
+kept in :attr:`CountryLinker.unlinked_countries` so that their counters can
+be recomputed.
+"""
+import csv
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from neo4j import Driver, ManagedTransaction
+
+from app.core.config import settings
+from app.db.session import connect_to_db
+from app.pipeline.writer import batches
+
+TERMS_FILE = Path(__file__).with_name("country_terms.csv")
+
+COUNTRY_NAMES_QUERY = """
+    MATCH (c:Country)
+    RETURN c.id as id, c.name as name, c.official_name as official_name
+    """
+
+OUTPUT_TEXT_QUERY = """
+    UNWIND $dois AS doi
+    MATCH (o:Output {doi: doi})
+    RETURN o.doi as doi, o.title as title, o.abstract as abstract
+    """
+
+OUTPUT_TEXT_PAGE_QUERY = """
+    MATCH (o:Output)
+    WHERE o.doi > $after
+    RETURN o.doi as doi, o.title as title, o.abstract as abstract
+    ORDER BY o.doi
+    LIMIT $limit
+    """
+
+# The countries of an output are searchable, so relinking modifies it
+TOUCH_OUTPUTS_QUERY = """
+    UNWIND $dois AS doi
+    MATCH (o:Output {doi: doi})
+    SET o.modified = $now
+    """
+
+CLEAR_COUNTRIES_QUERY = """
+    UNWIND $dois AS doi
+    MATCH (:Output {doi: doi})-[r:refers_to]->(c:Country)
+    DELETE r
+    RETURN DISTINCT c.id as id
+    """
+
+MERGE_COUNTRIES_QUERY = """
+    UNWIND $rows AS row
+    MATCH (o:Output {doi: row.doi}), (c:Country {id: row.country})
+    MERGE (o)-[:refers_to]->(c)
+    """
+
+
+class Automaton:
+    """Aho–Corasick automaton matching a fixed set of terms
+
+    Arguments
+    ---------
+    terms: dict
+        Maps each term to the value reported when it matches. Terms are
+        matched case-sensitively.
+    """
+
+    def __init__(self, terms: Dict[str, str]):
+        # Node 0 is the root; each node has its transitions, failure link and
+        # the (length, value) of the terms ending there
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str]]] = [[]]
+        for term, value in terms.items():
+            self._add(term, value)
+        self._link()
+
+    def _add(self, term: str, value: str) -> None:
+        node = 0
+        for char in term:
+            if char not in self._goto[node]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[node][char] = len(self._goto) - 1
+            node = self._goto[node][char]
+        self._out[node].append((len(term), value))
+
+    def _link(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def iter(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """Yield ``(start, end, value)`` for every occurrence of a term in ``text``"""
+        node = 0
+        for end, char in enumerate(text, start=1):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, value in self._out[node]:
+                yield end - length, end, value
+
+
+def _word(text: str, start: int, end: int) -> bool:
+    """Whether ``text[start:end]`` is a whole word, allowing a plural ending in s"""
+    if end < len(text) and text[end] in "sS":
+        end += 1
+    return ((start == 0 or not text[start - 1].isalnum())
+            and (end == len(text) or not text[end].isalnum()))
+
+
+class CountryMatcher:
+    """Find the countries named in a text
+
+    Names and demonyms are proper nouns, so they are matched as they are
+    written, or in upper case for titles in capitals. Otherwise common words
+    such as "turkey", "chad" or "guinea pig" would refer to countries.
+
+    Arguments
+    ---------
+    terms: dict
+        Maps each name or demonym to the id of its country
+    """
+
+    def __init__(self, terms: Dict[str, str]):
+        self.terms = terms
+        self._automaton = Automaton({term.upper(): id for term, id in terms.items()}
+                                    | terms)
+
+    def find(self, text: str | None) -> Set[str]:
+        """Return the ids of the countries named in ``text``"""
+        if not text:
+            return set()
+        matches = [(start, end, value) for start, end, value in self._automaton.iter(text)
+                   if _word(text, start, end)]
+        # Leftmost-longest: drop matches that overlap a longer or earlier one
+        matches.sort(key=lambda match: (match[0], match[0] - match[1]))
+        countries, covered = set(), 0
+        for start, end, value in matches:
+            if start >= covered:
+                countries.add(value)
+                covered = end
+        return countries
+
+
+def load_terms(path: Path = TERMS_FILE) -> Dict[str, str]:
+    """Read the alternative names and demonyms of countries"""
+    with open(path, newline="", encoding="utf-8") as terms_file:
+        return {row["term"]: row["id"] for row in csv.DictReader(terms_file)}
+
+
+@connect_to_db
+def graph_terms(db: Driver) -> Dict[str, str]:
+    """The terms of the countries in the graph, including their names"""
+    records, _, _ = db.execute_query(COUNTRY_NAMES_QUERY)
+    ids = {record["id"] for record in records}
+    terms = {term: id for term, id in load_terms().items() if id in ids}
+    for record in records:
+        for name in (record["name"], record["official_name"]):
+            if name:
+                terms[name] = record["id"]
+    return terms
+
+
+def output_countries(matcher: CountryMatcher,
+                     outputs: Iterable[Dict[str, str]]) -> Iterator[Dict[str, str]]:
+    """Rows linking each output to the countries named in its title or abstract"""
+    for output in outputs:
+        countries = matcher.find(output["title"]) | matcher.find(output["abstract"])
+        for country in sorted(countries):
+            yield {"doi": output["doi"], "country": country}
+
+
+def _replace_countries(tx: ManagedTransaction,
+                       dois: List[str],
+                       rows: List[Dict[str, str]]) -> List[str]:
+    tx.run(TOUCH_OUTPUTS_QUERY, dois=dois, now=time.time()).consume()
+    result = tx.run(CLEAR_COUNTRIES_QUERY, dois=dois)
+    unlinked = [record["id"] for record in result]
+    if rows:
+        tx.run(MERGE_COUNTRIES_QUERY, rows=rows).consume()
+    return unlinked
+
+
+class CountryLinker:
+    """Replace the ``refers_to`` relationships of outputs in batches"""
+
+    def __init__(self, matcher: CountryMatcher = None, batch_size: int = None):
+        self._matcher = matcher
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.unlinked_countries: set[str] = set()
+
+    @property
+    def matcher(self) -> CountryMatcher:
+        """The matcher given, or one of the countries in the graph when first used
+
+        The matcher is not shared between linkers, so a new job sees the
+        countries added to the graph since the last one.
+        """
+        if self._matcher is None:
+            self._matcher = CountryMatcher(graph_terms())
+        return self._matcher
+
+    @connect_to_db
+    def link(self, dois: List[str], db: Driver) -> int:
+        """Re-link the outputs of ``dois``, returning the number of relationships"""
+        linked = 0
+        with db.session() as session:
+            for batch in batches(({"doi": doi} for doi in dois), self.batch_size):
+                records, _, _ = db.execute_query(
+                    OUTPUT_TEXT_QUERY, dois=[row["doi"] for row in batch])
+                linked += self._replace(session, [record.data() for record in records])
+        return linked
+
+    @connect_to_db
+    def relink_all(self, db: Driver) -> Tuple[int, int]:
+        """Re-link every output, returning the numbers of outputs and relationships"""
+        outputs, linked, after = 0, 0, ""
+        with db.session() as session:
+            while True:
+                records, _, _ = db.execute_query(
+                    OUTPUT_TEXT_PAGE_QUERY, after=after, limit=self.batch_size)
+                if not records:
+                    break
+                linked += self._replace(session, [record.data() for record in records])
+                outputs += len(records)
+                after = records[-1]["doi"]
+        return outputs, linked
+
+    def _replace(self, session, outputs: List[Dict[str, str]]) -> int:
+        rows = list(output_countries(self.matcher, outputs))
+        dois = [output["doi"] for output in outputs]
+        unlinked = session.execute_write(_replace_countries, dois, rows)
+        self.unlinked_countries.update(unlinked)
+        return len(rows)
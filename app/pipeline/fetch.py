@@ -0,0 +1,231 @@
+"""Concurrent fetching of DOI metadata with an on-disk response cache
+
+The metadata of each DOI is requested from OpenAlex and from the OpenAIRE
+Graph API concurrently, with at most ``per_host`` requests in flight and at
+most ``rate`` requests started per second for each host. Rate-limited (429)
+and server error responses are retried with exponential back-off, honouring
+``Retry-After``.
+
+Raw responses are stored in a content-addressed cache on disk: the file of a
+response is named by the SHA-256 of its URL. A cached response younger than
+``ttl`` seconds is returned without a request, so re-ingesting a DOI, or
+updating its metadata, only goes to the network once the cached copy has
+expired::
+
+    fetcher = MetadataFetcher()
+    metadata = asyncio.run(fetcher.fetch_all(["10.3390/en14185827"]))
+    metadata["10.3390/en14185827"].openalex  # the OpenAlex work, or None
+"""
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+from urllib.parse import quote, urlsplit
+
+import httpx
+from fastapi.logger import logger
+
+from app.core.config import settings
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ResponseStore:
+    """Content-addressed cache of JSON response bodies on disk
+
+    Arguments
+    ---------
+    directory: str
+        Where responses are stored, in subdirectories named by the first two
+        characters of their hash
+    ttl: float
+        Seconds a stored response stays fresh
+    """
+
+    def __init__(self, directory: str, ttl: float):
+        self.directory = Path(directory)
+        self.ttl = ttl
+
+    def _path(self, url: str) -> Path:
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        return self.directory / digest[:2] / f"{digest}.json"
+
+    def get(self, url: str) -> tuple[bool, Any]:
+        """Return ``(True, body)`` for a fresh response to ``url``, else ``(False, None)``
+
+        ``body`` is None for a cached 404, i.e. a DOI the service does not know.
+        """
+        path = self._path(url)
+        try:
+            with open(path) as cache_file:
+                entry = json.load(cache_file)
+        except (OSError, ValueError):
+            return False, None
+        if time.time() - entry["fetched_at"] > self.ttl:
+            return False, None
+        return True, entry["body"]
+
+    def put(self, url: str, status: int, body: Any) -> None:
+        path = self._path(url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"url": url, "status": status, "fetched_at": time.time(), "body": body}
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as cache_file:
+            json.dump(entry, cache_file)
+        os.replace(tmp, path)
+
+
+class HostLimiter:
+    """Limit the concurrency and the request rate to one host"""
+
+    def __init__(self, concurrency: int, rate: float):
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._interval = 1 / rate if rate > 0 else 0
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_start - now
+            self._next_start = max(now, self._next_start) + self._interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._semaphore.release()
+
+
+@dataclass
+class Metadata:
+    """The raw metadata of a DOI from each source, None where it was not found"""
+    doi: str
+    openalex: Dict[str, Any] | None = None
+    openaire: Dict[str, Any] | None = None
+
+
+def _retry_after(response: httpx.Response, attempt: int) -> float:
+    header = response.headers.get("retry-after")
+    if header:
+        try:
+            return float(header)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(header).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return 0.5 * 2 ** attempt
+
+
+class MetadataFetcher:
+    """Fetch the OpenAlex and OpenAIRE metadata of DOIs concurrently
+
+    The defaults are read from the ``METADATA_*``, ``OPENALEX_URL`` and
+    ``OPENAIRE_URL`` settings.
+    """
+
+    def __init__(self,
+                 openalex_url: str = None,
+                 openaire_url: str = None,
+                 store: ResponseStore = None,
+                 concurrency: int = None,
+                 per_host: int = None,
+                 rate: float = None,
+                 retries: int = 3,
+                 timeout: float = 30,
+                 transport: httpx.AsyncBaseTransport = None):
+        self.openalex_url = (openalex_url or settings.OPENALEX_URL).rstrip("/")
+        self.openaire_url = (openaire_url or settings.OPENAIRE_URL).rstrip("/")
+        self.store = store or ResponseStore(settings.METADATA_CACHE_DIR,
+                                            settings.METADATA_CACHE_TTL)
+        self.concurrency = concurrency or settings.METADATA_CONCURRENCY
+        self.per_host = per_host or settings.METADATA_PER_HOST
+        self.rate = rate if rate is not None else settings.METADATA_RATE
+        self.retries = retries
+        self.timeout = timeout
+        self.transport = transport
+        self.requests = 0
+        self.cache_hits = 0
+
+    def openalex(self, doi: str) -> str:
+        url = f"{self.openalex_url}/works/https://doi.org/{quote(doi, safe='/')}"
+        if settings.OPENALEX_MAILTO:
+            url += f"?mailto={quote(settings.OPENALEX_MAILTO)}"
+        return url
+
+    def openaire(self, doi: str) -> str:
+        return f"{self.openaire_url}/researchProducts?pid={quote(doi, safe='')}"
+
+    async def fetch_all(self, dois: Iterable[str]) -> Dict[str, Metadata]:
+        """Return the metadata of each of ``dois``, keyed by DOI"""
+        dois = list(dict.fromkeys(dois))
+        limiters: Dict[str, HostLimiter] = {}
+        slots = asyncio.Semaphore(self.concurrency)
+        limits = httpx.Limits(max_connections=self.concurrency)
+        async with httpx.AsyncClient(timeout=self.timeout, limits=limits,
+                                     transport=self.transport,
+                                     follow_redirects=True) as client:
+
+            async def get(url: str) -> Any:
+                host = urlsplit(url).netloc
+                limiter = limiters.setdefault(host, HostLimiter(self.per_host, self.rate))
+                async with slots:
+                    return await self._get(client, limiter, url)
+
+            async def fetch(doi: str) -> Metadata:
+                openalex, openaire = await asyncio.gather(get(self.openalex(doi)),
+                                                          get(self.openaire(doi)))
+                return Metadata(doi, openalex, _openaire_result(openaire))
+
+            results = await asyncio.gather(*(fetch(doi) for doi in dois))
+        return {metadata.doi: metadata for metadata in results}
+
+    async def _get(self, client: httpx.AsyncClient, limiter: HostLimiter, url: str) -> Any:
+        found, body = self.store.get(url)
+        if found:
+            self.cache_hits += 1
+            return body
+        for attempt in range(self.retries + 1):
+            try:
+                async with limiter:
+                    self.requests += 1
+                    response = await client.get(url)
+            except httpx.TransportError as e:
+                if attempt == self.retries:
+                    logger.error(f"Could not fetch {url}: {str(e)}")
+                    return None
+                await asyncio.sleep(0.5 * 2 ** attempt)
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                await asyncio.sleep(_retry_after(response, attempt))
+                continue
+            if response.status_code == 404:
+                self.store.put(url, 404, None)
+                return None
+            if response.is_success:
+                body = response.json()
+                self.store.put(url, response.status_code, body)
+                return body
+            logger.error(f"Could not fetch {url}: status {response.status_code}")
+            return None
+        return None
+
+
+def _openaire_result(body: Any) -> Dict[str, Any] | None:
+    """The research product in an OpenAIRE Graph API search response"""
+    if body and body.get("results"):
+        return body["results"][0]
+    return None
+
+
+def fetch_metadata(dois: List[str], **kwargs) -> Dict[str, Metadata]:
+    """Blocking wrapper of :meth:`MetadataFetcher.fetch_all`"""
+    return asyncio.run(MetadataFetcher(**kwargs).fetch_all(dois))
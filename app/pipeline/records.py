@@ -0,0 +1,188 @@
+"""Validated output and author records built from raw DOI metadata
+
+OpenAlex is preferred for bibliographic fields and the author list, OpenAIRE
+for the result type (OpenAlex has no software type) and for given and family
+names, which OpenAlex does not split.
+"""
+import re
+import uuid
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from fastapi.logger import logger
+from pydantic import BaseModel, Field
+
+from app.pipeline.fetch import Metadata
+
+DOI_PATTERN = re.compile(r"^10\.\d{4,9}/[-._;()/:a-zA-Z0-9]+$")
+
+DOI_PREFIXES = ("https://doi.org/", "http://doi.org/", "https://dx.doi.org/", "doi:")
+
+OPENALEX_TYPES = {"dataset": "dataset", "article": "publication", "review": "publication",
+                  "book": "publication", "book-chapter": "publication",
+                  "preprint": "publication", "report": "publication",
+                  "dissertation": "publication", "letter": "publication",
+                  "editorial": "publication"}
+
+RESULT_TYPES = {"publication", "dataset", "software", "other"}
+
+
+class AuthorRecord(BaseModel):
+    uuid: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    first_name: str = Field(min_length=1)
+    last_name: str = Field(min_length=1)
+    orcid: Optional[str] = None
+    rank: int
+
+
+class OutputRecord(BaseModel):
+    uuid: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    doi: str = Field(pattern=DOI_PATTERN.pattern)
+    title: str
+    result_type: str
+    abstract: Optional[str] = None
+    journal: Optional[str] = None
+    publisher: Optional[str] = None
+    publication_day: Optional[int] = None
+    publication_month: Optional[int] = None
+    publication_year: Optional[int] = None
+    cited_by_count: Optional[int] = None
+    cited_by_count_date: Optional[int] = None
+    openalex: Optional[str] = None
+    authors: List[AuthorRecord] = Field(default_factory=list)
+
+    def properties(self) -> Dict[str, Any]:
+        """Node properties, without the identifiers and authors"""
+        return self.model_dump(exclude={"uuid", "doi", "authors"}, exclude_none=True)
+
+
+def normalise_doi(doi: str) -> str:
+    """Strip the resolver prefix and whitespace from a DOI"""
+    doi = doi.strip()
+    for prefix in DOI_PREFIXES:
+        if doi.lower().startswith(prefix):
+            return doi[len(prefix):]
+    return doi
+
+
+def valid_doi(doi: str) -> bool:
+    return DOI_PATTERN.match(doi) is not None
+
+
+def abstract_from_index(index: Dict[str, List[int]] | None) -> str | None:
+    """Rebuild an abstract from an OpenAlex ``abstract_inverted_index``"""
+    if not index:
+        return None
+    words = sorted((position, word) for word, positions in index.items()
+                   for position in positions)
+    return " ".join(word for _, word in words)
+
+
+def _split_name(display_name: str) -> tuple[str, str]:
+    first, _, last = display_name.strip().rpartition(" ")
+    return first, last
+
+
+def _orcid(value: str | None) -> str | None:
+    if not value:
+        return None
+    if value.startswith("http"):
+        return value
+    return f"https://orcid.org/{value}"
+
+
+def _openaire_orcid(author: Dict[str, Any]) -> str | None:
+    pid = (author.get("pid") or {}).get("id") or {}
+    if pid.get("scheme") == "orcid":
+        return _orcid(pid.get("value"))
+    return None
+
+
+def _author(first: str | None,
+            last: str | None,
+            orcid: str | None,
+            rank: int) -> AuthorRecord | None:
+    """The author record, or None if the first or last name is missing
+
+    Author nodes need both names, so an author known by a single word is
+    skipped rather than written with an empty first name.
+    """
+    first, last = (first or "").strip(), (last or "").strip()
+    if not first or not last:
+        logger.warning(f"Skipped author {rank} without a first and last name: "
+                       f"{f'{first} {last}'.strip()!r}")
+        return None
+    return AuthorRecord(first_name=first, last_name=last, orcid=orcid, rank=rank)
+
+
+def _authors(openalex: Dict[str, Any] | None,
+             openaire: Dict[str, Any] | None) -> List[AuthorRecord]:
+    openaire_authors = sorted((openaire or {}).get("authors") or [],
+                              key=lambda a: a.get("rank") or 0)
+    if openalex and openalex.get("authorships"):
+        authors = []
+        for rank, authorship in enumerate(openalex["authorships"], start=1):
+            author = authorship.get("author") or {}
+            first, last = _split_name(author.get("display_name")
+                                      or authorship.get("raw_author_name") or "")
+            if len(openaire_authors) == len(openalex["authorships"]):
+                match = openaire_authors[rank - 1]
+                first = match.get("name") or first
+                last = match.get("surname") or last
+            authors.append(_author(first, last, _orcid(author.get("orcid")), rank))
+        return [author for author in authors if author is not None]
+    authors = []
+    for rank, author in enumerate(openaire_authors, start=1):
+        first, last = _split_name(author.get("fullName") or "")
+        authors.append(_author(author.get("name") or first,
+                               author.get("surname") or last,
+                               _openaire_orcid(author),
+                               rank))
+    return [author for author in authors if author is not None]
+
+
+def _result_type(openalex: Dict[str, Any] | None, openaire: Dict[str, Any] | None) -> str:
+    if openaire and openaire.get("type") in RESULT_TYPES:
+        return openaire["type"]
+    if openalex:
+        return OPENALEX_TYPES.get(openalex.get("type"), "other")
+    return "other"
+
+
+def _date(value: str | None) -> tuple[int | None, int | None, int | None]:
+    try:
+        published = date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None, None, None
+    return published.year, published.month, published.day
+
+
+def output_record(doi: str, metadata: Metadata) -> OutputRecord | None:
+    """Build the record of ``doi``, or None if no source has a title for it"""
+    openalex, openaire = metadata.openalex, metadata.openaire
+    if not openalex and not openaire:
+        return None
+    openalex = openalex or {}
+    openaire = openaire or {}
+    title = openalex.get("title") or openaire.get("mainTitle")
+    if not title:
+        return None
+    source = (openalex.get("primary_location") or {}).get("source") or {}
+    year, month, day = _date(openalex.get("publication_date") or openaire.get("publicationDate"))
+    descriptions = openaire.get("descriptions") or []
+    return OutputRecord(
+        doi=doi,
+        title=title,
+        result_type=_result_type(openalex, openaire),
+        abstract=abstract_from_index(openalex.get("abstract_inverted_index"))
+        or (descriptions[0] if descriptions else None),
+        journal=source.get("display_name") or (openaire.get("container") or {}).get("name"),
+        publisher=source.get("host_organization_name") or openaire.get("publisher"),
+        publication_year=year or openalex.get("publication_year"),
+        publication_month=month,
+        publication_day=day,
+        cited_by_count=openalex.get("cited_by_count"),
+        cited_by_count_date=date.today().year if "cited_by_count" in openalex else None,
+        openalex=openalex.get("id"),
+        authors=_authors(openalex or None, openaire or None),
+    )
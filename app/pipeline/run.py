@@ -0,0 +1,64 @@
+"""Ingest a list of DOIs: validate, fetch metadata, build records and write them"""
+import asyncio
+import time
+from collections import Counter
+from typing import List, Tuple
+
+from app.pipeline.fetch import MetadataFetcher
+from app.pipeline.records import normalise_doi, output_record, valid_doi
+from app.pipeline.writer import GraphWriter
+from app.schemas.ingest import IngestionMetrics, IngestionStates
+
+
+def ingest(dois: List[str],
+           update_metadata: bool = False,
+           fetcher: MetadataFetcher = None,
+           writer: GraphWriter = None) -> Tuple[IngestionMetrics, IngestionStates]:
+    """Ingest ``dois`` and report what happened to each of them
+
+    DOIs that already have an output in the graph are skipped, unless
+    ``update_metadata`` is set, in which case their metadata is refreshed.
+    """
+    start = time.perf_counter()
+    fetcher = fetcher or MetadataFetcher()
+    writer = writer or GraphWriter()
+
+    submitted = [normalise_doi(doi) for doi in dois]
+    counts = Counter(submitted)
+    duplicated = [doi for doi, count in counts.items() if count > 1]
+    processed = list(counts)
+    valid = [doi for doi in processed if valid_doi(doi)]
+    invalid = [doi for doi in processed if not valid_doi(doi)]
+
+    existing_set = writer.existing_dois(valid) if valid else set()
+    existing = [doi for doi in valid if doi in existing_set]
+    new = [doi for doi in valid if doi not in existing_set]
+    to_fetch = new + existing if update_metadata else new
+
+    metadata = asyncio.run(fetcher.fetch_all(to_fetch)) if to_fetch else {}
+    records = {doi: output_record(doi, metadata[doi]) for doi in to_fetch}
+    passed = [doi for doi in to_fetch if records[doi] is not None]
+    failed = [doi for doi in to_fetch if records[doi] is None]
+
+    writer.write([records[doi] for doi in passed])
+
+    passed_set = set(passed)
+    states = IngestionStates(
+        submitted_dois=list(dois),
+        duplicated_submissions=duplicated,
+        processed_dois=processed,
+        new_dois=new,
+        existing_dois=existing,
+        updated_existing_dois=[doi for doi in existing if doi in passed_set],
+        ingested_dois=[doi for doi in new if doi in passed_set],
+        metadata_pass=passed,
+        metadata_failure=failed,
+        openalex_success=[doi for doi in to_fetch if metadata[doi].openalex],
+        openaire_success=[doi for doi in to_fetch if metadata[doi].openaire],
+        valid_pattern_dois=valid,
+        invalid_pattern_dois=invalid,
+    )
+    metrics = IngestionMetrics(
+        **{field: len(getattr(states, field)) for field in IngestionStates.model_fields},
+        total_time_seconds=time.perf_counter() - start)
+    return metrics, states
@@ -0,0 +1,186 @@
+"""Batched writes of output records to the graph
+
+Outputs, authors and ``author_of`` relationships are written with
+parameterised ``UNWIND $rows AS row MERGE ...`` statements instead of one
+statement per node and relationship. Each batch of ``batch_size`` outputs is
+written in one write transaction, which replaces the authorship of the
+outputs as a whole, so readers never see an output without its authors.
+
+Outputs are merged on their DOI and keep their uuid once created. Authors
+are merged on their ORCID when they have one, and on their first and last
+name otherwise. Written outputs get the time of the write as ``modified``,
+in seconds since the epoch, from which the search index picks up changes,
+and ``sort_year``, see :mod:`app.crud.statistics`.
+
+The uuids of the authors the written outputs were linked to before are kept
+in :attr:`GraphWriter.unlinked_authors`, as the counters and collaborations
+of an author dropped from an output must be recomputed too. Those left
+without any output or membership, e.g. after their name was corrected, are
+deleted. The change the
+writes make to the corpus-wide counters, see :mod:`app.crud.statistics`, is
+kept in :attr:`GraphWriter.counts`, so they need not be counted again.
+"""
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from neo4j import Driver, ManagedTransaction
+
+from app.core.config import settings
+from app.crud.statistics import RESULT_TYPES
+from app.db.session import connect_to_db
+from app.pipeline.records import OutputRecord
+
+EXISTING_DOIS_QUERY = """
+    UNWIND $dois AS doi
+    MATCH (o:Output {doi: doi})
+    RETURN DISTINCT o.doi as doi
+    """
+
+MERGE_OUTPUTS_QUERY = """
+    UNWIND $rows AS row
+    MERGE (o:Output {doi: row.doi})
+    ON CREATE SET o.uuid = row.uuid
+    SET o += row.properties
+    SET o.sort_year = coalesce(o.publication_year, 0)
+    """
+
+# Authors are re-linked in their current order, so drop the old links first,
+# returning the result type each output had while it was counted
+CLEAR_AUTHORSHIP_QUERY = """
+    UNWIND $dois AS doi
+    MATCH (o:Output {doi: doi})<-[r:author_of]-(a:Author)
+    DELETE r
+    RETURN doi, o.result_type as result_type, a.uuid as uuid
+    """
+
+# An author was created by the statement if it has the new uuid of its row
+MERGE_ORCID_AUTHORS_QUERY = """
+    UNWIND $rows AS row
+    MATCH (o:Output {doi: row.doi})
+    MERGE (a:Author {orcid: row.orcid})
+    ON CREATE SET a.uuid = row.uuid,
+                  a.first_name = row.first_name,
+                  a.last_name = row.last_name
+    MERGE (a)-[r:author_of]->(o)
+    SET r.rank = row.rank
+    RETURN sum(CASE WHEN a.uuid = row.uuid THEN 1 ELSE 0 END) as created
+    """
+
+MERGE_NAMED_AUTHORS_QUERY = """
+    UNWIND $rows AS row
+    MATCH (o:Output {doi: row.doi})
+    MERGE (a:Author {first_name: row.first_name, last_name: row.last_name})
+    ON CREATE SET a.uuid = row.uuid
+    MERGE (a)-[r:author_of]->(o)
+    SET r.rank = row.rank
+    RETURN sum(CASE WHEN a.uuid = row.uuid THEN 1 ELSE 0 END) as created
+    """
+
+# Authors unlinked by the batch that are no longer an author of any output
+# nor a member of a workstream or partner
+DELETE_ORPHANS_QUERY = """
+    UNWIND $uuids AS uuid
+    MATCH (a:Author {uuid: uuid})
+    WHERE NOT (a)-[:author_of]->() AND NOT (a)-[:member_of]->()
+    DETACH DELETE a
+    RETURN uuid
+    """
+
+
+def batches(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def output_rows(records: Iterable[OutputRecord], modified: float) -> Iterator[Dict[str, Any]]:
+    for record in records:
+        yield {"doi": record.doi,
+               "uuid": record.uuid,
+               "properties": record.properties() | {"modified": modified}}
+
+
+def authorship_rows(records: Iterable[OutputRecord], orcid: bool) -> Iterator[Dict[str, Any]]:
+    for record in records:
+        for author in record.authors:
+            if bool(author.orcid) == orcid:
+                yield {"doi": record.doi} | author.model_dump()
+
+
+def output_counts(result_types: Iterable[str | None]) -> Counter:
+    """The counters of the outputs with ``result_types``, see :mod:`app.crud.statistics`"""
+    counts = Counter()
+    for result_type in result_types:
+        counts["total"] += 1
+        if result_type in RESULT_TYPES:
+            counts[result_type] += 1
+    return counts
+
+
+def _write_batch(tx: ManagedTransaction,
+                 outputs: List[Dict[str, Any]],
+                 orcid_authors: List[Dict[str, Any]],
+                 named_authors: List[Dict[str, Any]]
+                 ) -> Tuple[List[Dict[str, Any]], int, List[str]]:
+    result = tx.run(CLEAR_AUTHORSHIP_QUERY, dois=[row["doi"] for row in outputs])
+    unlinked = [record.data() for record in result]
+    tx.run(MERGE_OUTPUTS_QUERY, rows=outputs).consume()
+    created = 0
+    for query, rows in ((MERGE_ORCID_AUTHORS_QUERY, orcid_authors),
+                        (MERGE_NAMED_AUTHORS_QUERY, named_authors)):
+        if rows:
+            created += tx.run(query, rows=rows).single()["created"]
+    deleted = []
+    if unlinked:
+        uuids = list({row["uuid"] for row in unlinked})
+        deleted = [record["uuid"] for record in tx.run(DELETE_ORPHANS_QUERY, uuids=uuids)]
+    return unlinked, created, deleted
+
+
+class GraphWriter:
+    """Write output records to the graph in batches of ``batch_size`` outputs"""
+
+    def __init__(self, batch_size: int = None):
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.transactions = 0
+        self.unlinked_authors: set[str] = set()
+        self.counts = Counter()
+
+    @connect_to_db
+    def existing_dois(self, dois: List[str], db: Driver) -> set[str]:
+        """The DOIs of ``dois`` that already have an output in the graph"""
+        records, _, _ = db.execute_query(EXISTING_DOIS_QUERY, dois=list(dois))
+        return {record["doi"] for record in records}
+
+    @connect_to_db
+    def write(self, records: List[OutputRecord], db: Driver) -> None:
+        """Create or update the outputs, their authors and authorship
+
+        The uuids of the authors the outputs were linked to before are added
+        to :attr:`unlinked_authors`, unless they were deleted. The outputs
+        counted before and after the write, those with authors, and the
+        number of authors created less those deleted are added to
+        :attr:`counts`.
+        """
+        modified = time.time()
+        with db.session() as session:
+            for batch in batches(records, self.batch_size):
+                unlinked, created, deleted = session.execute_write(
+                    _write_batch,
+                    list(output_rows(batch, modified)),
+                    list(authorship_rows(batch, True)),
+                    list(authorship_rows(batch, False)))
+                self.unlinked_authors.update({row["uuid"] for row in unlinked}
+                                             - set(deleted))
+                before = {row["doi"]: row["result_type"] for row in unlinked}
+                self.counts.update(output_counts(
+                    record.result_type for record in batch if record.authors))
+                self.counts.subtract(output_counts(before.values()))
+                self.counts["authors"] += created - len(deleted)
+                self.transactions += 1
@@ -6,7 +6,7 @@ from uuid import UUID
 from . import AuthorBase
 from .affiliation import AffiliationModel
 from .output import OutputListModel
-from .meta import MetaAuthor
+from .meta import MetaAuthor, MetaCollaborator
 from . import WorkstreamBase
 
 
@@ -31,3 +31,14 @@ class AuthorOutputModel(AuthorColabModel):
     """An author with collaborators, workstreams, affiliations and outputs"""
     collaborators: List[AuthorBase] = None
     outputs: OutputListModel
+
+
+class CollaboratorModel(AuthorBase):
+    """An author with the number of outputs shared with another author"""
+    num_colabs: int
+
+
+class AuthorCollaboratorListModel(BaseModel):
+    """A page of the collaborators of an author, most frequent first"""
+    meta: MetaCollaborator
+    results: List[CollaboratorModel]
@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+
+
+class CacheCounters(BaseModel):
+    """Counters of an in-process cache of one worker"""
+    size: int
+    maxsize: int
+    ttl: float
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    invalidations: int
+    hit_rate: float
+
+
+class CacheStats(CacheCounters):
+    """Counters of the in-process response cache of one worker
+
+    ``fragments`` holds the counters of the cache of rendered HTML fragments.
+    """
+    data_version: int
+    fragments: CacheCounters
@@ -1,4 +1,5 @@
-from typing import List
+from datetime import datetime
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel
 
@@ -34,3 +35,19 @@ class IngestionStates(BaseModel):
     openaire_success: List[str]
     valid_pattern_dois: List[str]
     invalid_pattern_dois: List[str]
+
+
+class IngestionJob(BaseModel):
+    """A background ingestion job
+
+    ``metrics`` are updated as the DOIs are processed, in chunks.
+    """
+    id: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    submitted_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    total_dois: int
+    processed_dois: int = 0
+    metrics: Optional[IngestionMetrics] = None
+    error: Optional[str] = None
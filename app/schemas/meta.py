@@ -51,6 +51,7 @@ class MetaPublication(BaseModel):
     skip: int
     limit: int
     result_type: str
+    next_cursor: Optional[str] = None
 
 
 class MetaAuthor(BaseModel):
@@ -66,3 +67,17 @@ class MetaAuthor(BaseModel):
     count: CountAuthor | None
     skip: int
     limit: int
+    next_cursor: Optional[str] = None
+
+
+class MetaCollaborator(BaseModel):
+    """Count and page of the collaborators of an author
+
+    ```json
+    "count": {'total': 42}
+    ```
+    """
+    count: CountAuthor
+    skip: int
+    limit: int
+    result_type: str
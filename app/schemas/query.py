@@ -1,15 +1,37 @@
-from typing import Literal, List
+from typing import ClassVar, Literal, List
 
 from pydantic import BaseModel, Field, field_validator
 from fastapi import HTTPException
 
+from app.core.cursor import decode_cursor
+
 
 class FilterBase(BaseModel):
     skip: int = Field(default=0, ge=0, title="Skip", description="Number of records to skip")
     limit: int = Field(default=20, ge=1, title="Limit", description="Number of records to return")
 
 
-class FilterParams(FilterBase):
+class FilterCursor(FilterBase):
+    cursor: str | None = Field(default=None,
+                               title="Cursor",
+                               description="Token from `meta.next_cursor` of the previous page. "
+                                           "When given, `skip` is ignored.")
+
+    _cursor_kind: ClassVar[str] = "output"
+
+    @field_validator("cursor")
+    @classmethod
+    def check_cursor(cls, value: str | None) -> str | None:
+        if value is not None:
+            decode_cursor(value, cls._cursor_kind)
+        return value
+
+
+class FilterParams(FilterCursor):
+    result_type: Literal["publication", "software", "dataset", "other"] = "publication"
+
+
+class FilterCollaborators(FilterBase):
     result_type: Literal["publication", "software", "dataset", "other"] = "publication"
 
 
@@ -20,9 +42,37 @@ class FilterCountry(FilterParams):
 class FilterOutputList(FilterCountry):
     pass
 
-class FilterWorkstream(FilterBase):
+
+class FilterOutputExport(BaseModel):
+    result_type: Literal["publication", "software", "dataset", "other"] = "publication"
+    country: str | None = Field(default=None, examples=['KEN'], pattern="^([A-Z]{3})$")
+    format: Literal["ndjson", "csv"] = "ndjson"
+
+
+class FilterSearch(FilterBase):
+    q: str = Field(min_length=1, max_length=500, title="Search terms")
+    result_type: Literal["publication", "software", "dataset", "other"] | None = None
+    country: str | None = Field(default=None, examples=['KEN'], pattern="^([A-Z]{3})$")
+
+
+class FilterSuggest(BaseModel):
+    prefix: str = Field(min_length=1, max_length=200, title="Start of a name, ORCID or title")
+    type: Literal["author", "output"] | None = None
+    limit: int = Field(default=10, ge=1, le=20, title="Limit", description="Number of suggestions")
+
+
+class FilterGraph(BaseModel):
+    workstream: str | None = Field(default=None, description="Only authors of this workstream")
+    country: str | None = Field(default=None, examples=['KEN'], pattern="^([A-Z]{3})$")
+    result_type: Literal["publication", "software", "dataset", "other"] | None = None
+    format: Literal["json", "columnar", "binary"] = "json"
+
+
+class FilterWorkstream(FilterCursor):
     workstream: List[str] | None = Field(default=None)
 
+    _cursor_kind: ClassVar[str] = "author"
+
 
 class FilterAuthorDetail(FilterCountry):
-    pass
\ No newline at end of file
+    pass
@@ -0,0 +1,27 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from .meta import CountAuthor
+from .output import OutputModel
+
+
+class SearchResultModel(OutputModel):
+    """An output with its BM25 score for the search terms"""
+    score: float
+
+
+class MetaSearch(BaseModel):
+    """The search terms and filters with the number of matching outputs"""
+    count: CountAuthor
+    q: str
+    result_type: Optional[str] = None
+    country: Optional[str] = None
+    skip: int
+    limit: int
+
+
+class SearchListModel(BaseModel):
+    """A page of search results, best first"""
+    meta: MetaSearch
+    results: List[SearchResultModel]
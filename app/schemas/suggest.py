@@ -0,0 +1,23 @@
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel
+
+
+class SuggestionModel(BaseModel):
+    """An author or output matching a prefix"""
+    type: Literal["author", "output"]
+    id: str
+    label: str
+    orcid: Optional[str] = None
+
+
+class MetaSuggest(BaseModel):
+    prefix: str
+    type: Optional[str] = None
+    limit: int
+
+
+class SuggestListModel(BaseModel):
+    """Suggestions for a prefix, most outputs or citations first"""
+    meta: MetaSuggest
+    results: List[SuggestionModel]
@@ -1,6 +1,33 @@
 // static/js/network.js
 
-function main() {
+// Load the co-authorship graph from /api/graph in its binary format: "RIG1",
+// the length of the JSON node columns as a little-endian uint32, the node
+// columns, then a (source, target) pair of uint32 node indices per link.
+async function loadGraph(params = "") {
+  const response = await fetch("/api/graph?format=binary" + params);
+  const buffer = await response.arrayBuffer();
+  const view = new DataView(buffer);
+  const decoder = new TextDecoder();
+  if (decoder.decode(new Uint8Array(buffer, 0, 4)) !== "RIG1") {
+    throw new Error("Unexpected graph format");
+  }
+  const length = view.getUint32(4, true);
+  const columns = JSON.parse(decoder.decode(new Uint8Array(buffer, 8, length)));
+  const nodes = columns.id.map((id, i) => ({
+    id: id,
+    group: columns.group[i],
+    name: columns.name[i],
+    url: columns.url[i],
+  }));
+  const links = [];
+  for (let offset = 8 + length; offset + 8 <= buffer.byteLength; offset += 8) {
+    links.push({source: view.getUint32(offset, true),
+                target: view.getUint32(offset + 4, true)});
+  }
+  return {nodes, links};
+}
+
+function main(data_nodes, data_links) {
 
 // Specify the dimensions of the chart.
 const width = 928;
@@ -21,7 +48,7 @@ var div = d3.select("body").append("div")
 
 // Create a simulation with several forces.
 const simulation = d3.forceSimulation(nodes)
-    .force("link", d3.forceLink(links).id(d => d.id))
+    .force("link", d3.forceLink(links))
     .force("charge", d3.forceManyBody())
     .force("x", d3.forceX())
     .force("y", d3.forceY());
@@ -126,4 +153,4 @@ function dragended(event) {
 // stop naturally, but it’s a good practice.)
 //   invalidation.then(() => simulation.stop());
 }
-main();
\ No newline at end of file
+loadGraph().then(({nodes, links}) => main(nodes, links));
\ No newline at end of file
@@ -1,3 +1,9 @@
+import csv
+import io
+import json
+import struct
+
+import pytest
 from fastapi.testclient import TestClient
 
 from app.main import app
@@ -27,6 +33,24 @@ class TestOutput:
         response = client.get("/api/outputs?limit=1&skip=1&result_type=notallowed")
         assert response.status_code == 422
 
+    def test_output_list_cursor(self):
+        first = client.get("/api/outputs?limit=1").json()
+        cursor = first["meta"]["next_cursor"]
+        response = client.get(f"/api/outputs?limit=1&cursor={cursor}")
+        assert response.status_code == 200
+        assert response.json()["results"][0]["uuid"] != first["results"][0]["uuid"]
+
+    def test_output_cursor_holds_sort_year(self):
+        from app.crud.output import next_output_cursor, output_cursor
+        results = [{"uuid": "a", "publication_year": 2020, "sort_year": 2019}]
+        cursor = next_output_cursor(results, 1)
+        assert output_cursor(cursor) == {"after_year": 2019, "after_uuid": "a", "skip": 0}
+        assert next_output_cursor(results, 2) is None
+
+    def test_output_list_cursor_invalid(self):
+        response = client.get("/api/outputs?cursor=blabla")
+        assert response.status_code == 422
+
     def test_output_error_id_wrong_format(self):
         response = client.get("/api/outputs/blabla")
         assert response.status_code == 422
@@ -36,6 +60,44 @@ class TestOutput:
         assert response.status_code == 404
 
 
+class TestOutputExport:
+    def test_export_ndjson(self):
+        response = client.get("/api/outputs/export?result_type=publication")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = response.text.splitlines()
+        assert lines
+        assert all(json.loads(line)["result_type"] == "publication" for line in lines)
+
+    def test_export_csv_country(self):
+        response = client.get("/api/outputs/export?format=csv&country=KEN")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert all("KEN" in row["countries"].split("; ") for row in rows)
+
+    def test_export_format_wrong(self):
+        response = client.get("/api/outputs/export?format=xml")
+        assert response.status_code == 422
+
+    def test_invalid_outputs_skipped(self):
+        import asyncio
+
+        from app.core.export import ndjson_lines
+
+        async def outputs():
+            yield {"uuid": "bad", "title": "No DOI"}
+            yield {"uuid": "f05b1fc5-f831-4755-966f-06de074ab51c",
+                   "doi": "10.5281/zenodo.7015450", "title": "An example title",
+                   "result_type": "publication", "countries": [], "authors": []}
+
+        async def lines():
+            return [line async for line in ndjson_lines(outputs())]
+
+        lines = asyncio.run(lines())
+        assert [json.loads(line)["title"] for line in lines] == ["An example title"]
+
+
 class TestAuthor:
 
     def test_author_list(self):
@@ -58,6 +120,19 @@ class TestAuthor:
         response = client.get("/api/authors?limit=0")
         assert response.status_code == 422
 
+    def test_author_list_cursor(self):
+        first = client.get("/api/authors?limit=1").json()
+        cursor = first["meta"]["next_cursor"]
+        response = client.get(f"/api/authors?limit=1&cursor={cursor}")
+        assert response.status_code == 200
+        assert response.json()["results"][0]["uuid"] != first["results"][0]["uuid"]
+
+    def test_author_list_cursor_wrong_kind(self):
+        outputs = client.get("/api/outputs?limit=1").json()
+        cursor = outputs["meta"]["next_cursor"]
+        response = client.get(f"/api/authors?cursor={cursor}")
+        assert response.status_code == 422
+
     def test_author_error_on_author_id_wrong_format(self):
         response = client.get("/api/authors/blabla")
         assert response.status_code == 422
@@ -70,10 +145,54 @@ class TestAuthor:
         response = client.get("/api/authors?workstream=ws7a")
         assert response.status_code == 200
 
+    def test_author_workstream_total(self):
+        page = client.get("/api/authors?workstream=ws7a&limit=1").json()
+        members = client.get("/api/authors?workstream=ws7a&limit=100").json()
+        assert page["meta"]["count"]["total"] == len(members["results"])
+        beyond = client.get("/api/authors?workstream=ws7a&skip=1000").json()
+        assert beyond["meta"]["count"]["total"] == len(members["results"])
+
+    def test_member_page_total(self):
+        from app.crud.author import _member_page
+
+        class Record(dict):
+            def data(self):
+                return dict(self)
+
+        authors, total = _member_page([Record(uuid="a", total=42), Record(uuid="b", total=42)])
+        assert total == 42
+        assert authors == [{"uuid": "a"}, {"uuid": "b"}]
+        assert _member_page([]) == ([], None)
+
     def test_author_multiple_workstream(self):
         response = client.get("/api/authors?workstream=ws7a&workstream=ws5a")
         assert response.status_code == 200
 
+    def test_author_collaborators(self):
+        id = "4c112571-59b8-4afc-b6cc-63905cc2fbe6"
+        response = client.get(f"/api/authors/{id}/collaborators?limit=50")
+        assert response.status_code == 200
+        page = response.json()
+        counts = [collaborator["num_colabs"] for collaborator in page["results"]]
+        assert counts == sorted(counts, reverse=True)
+        assert len(counts) == min(50, page["meta"]["count"]["total"])
+
+    def test_author_collaborators_paged(self):
+        id = "4c112571-59b8-4afc-b6cc-63905cc2fbe6"
+        all = client.get(f"/api/authors/{id}/collaborators?limit=4").json()["results"]
+        second = client.get(f"/api/authors/{id}/collaborators?limit=2&skip=2").json()["results"]
+        assert second == all[2:4]
+
+    def test_author_collaborators_match_detail(self):
+        id = "4c112571-59b8-4afc-b6cc-63905cc2fbe6"
+        detail = client.get(f"/api/authors/{id}").json()["collaborators"]
+        page = client.get(f"/api/authors/{id}/collaborators?limit=5").json()["results"]
+        assert [c["uuid"] for c in detail] == [c["uuid"] for c in page]
+
+    def test_author_collaborators_not_exist(self):
+        response = client.get("/api/authors/97c945d6-e172-4e7f-8a3a-02a7a51ae62b/collaborators")
+        assert response.status_code == 404
+
 
 class TestCountry:
 
@@ -144,6 +263,259 @@ class TestWorkstream:
         response = client.get("/api/workstreams/XXX")
         assert response.status_code == 404
 
+    rows = [
+        {"id": "ws1", "name": "Workstream 1", "unit_id": None, "unit_name": None,
+         "members": [{"uuid": None, "last_name": None}]},
+        {"id": "ws1a", "name": "Unit 1a", "unit_id": "ws1", "unit_name": "Workstream 1",
+         "members": [{"uuid": "b", "last_name": "Brown"}]},
+        {"id": "ws1a1", "name": "Team 1a1", "unit_id": "ws1a", "unit_name": "Unit 1a",
+         "members": [{"uuid": "a", "last_name": "Adams"}, {"uuid": "b", "last_name": "Brown"}]},
+    ]
+
+    def test_tree_transitive_members(self):
+        from app.core.workstreams import WorkstreamTree
+        tree = WorkstreamTree(self.rows, 0)
+        assert tree.descendants("ws1") == ("ws1", "ws1a", "ws1a1")
+        assert tree.members(["ws1"]) == (("Adams", "a"), ("Brown", "b"))
+        assert tree.members(["ws1a", "ws1a1"]) == (("Adams", "a"), ("Brown", "b"))
+        assert tree.detail("ws1") == {"id": "ws1", "name": "Workstream 1", "children": ["ws1a"]}
+        assert [item["id"] for item in tree.listing] == ["ws1a1", "ws1a"]
+        assert tree.total == 3
+        with pytest.raises(KeyError):
+            tree.detail("XXX")
+
+    def test_snapshot_expires_with_data_version(self):
+        from app.core.cache import data_version
+        from app.core.workstreams import WorkstreamSnapshot, WorkstreamTree
+        snapshot = WorkstreamSnapshot()
+        snapshot.replace(WorkstreamTree(self.rows, data_version.current))
+        assert snapshot.current() is not None
+        data_version.set(data_version.current + 1)
+        assert snapshot.current() is None
+
+
+class TestGraph:
+    def test_graph_json(self):
+        response = client.get("/api/graph?result_type=publication")
+        assert response.status_code == 200
+        graph = response.json()
+        assert graph["fields"] == ["id", "group", "name", "url"]
+        assert all(0 <= index < len(graph["nodes"])
+                   for link in graph["links"] for index in link)
+
+    def test_graph_columnar_matches_json(self):
+        rows = client.get("/api/graph?country=KEN").json()
+        columns = client.get("/api/graph?country=KEN&format=columnar").json()
+        assert columns["nodes"]["id"] == [node[0] for node in rows["nodes"]]
+        assert list(zip(columns["links"]["source"], columns["links"]["target"])) == \
+            [tuple(link) for link in rows["links"]]
+
+    def test_graph_binary(self):
+        response = client.get("/api/graph?format=binary")
+        assert response.status_code == 200
+        body = response.content
+        assert body[:4] == b"RIG1"
+        length = struct.unpack("<I", body[4:8])[0]
+        json.loads(body[8:8 + length])
+        assert len(body[8 + length:]) % 8 == 0
+
+    def test_graph_gzip(self):
+        response = client.get("/api/graph", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["etag"].startswith("W/")
+        assert "nodes" in response.json()
+
+    def test_graph_format_wrong(self):
+        response = client.get("/api/graph?format=xml")
+        assert response.status_code == 422
+
+
+class TestSearch:
+    documents = [
+        {"uuid": "a", "title": "Hydropower in Kenya", "abstract": "Dams and rivers",
+         "journal": "Energies", "result_type": "publication", "countries": ["KEN"]},
+        {"uuid": "b", "title": "Solar mini-grids", "abstract": "Hydropower is compared",
+         "journal": None, "result_type": "dataset", "countries": []},
+        {"uuid": "c", "title": "Économie du climat", "abstract": None,
+         "journal": None, "result_type": "publication", "countries": ["ZWE"]},
+    ]
+
+    def index(self):
+        from app.core.search import InvertedIndex
+        index = InvertedIndex()
+        index.update(self.documents)
+        return index
+
+    def test_tokenize(self):
+        from app.core.search import tokenize
+        assert tokenize("The Économie of Kenya's grid") == ["economie", "kenya", "grid"]
+
+    def test_title_ranks_first(self):
+        total, results = self.index().search("hydropower")
+        assert total == 2
+        assert [uuid for uuid, _ in results] == ["a", "b"]
+
+    def test_filters(self):
+        index = self.index()
+        assert index.search("hydropower", result_type="dataset")[1][0][0] == "b"
+        assert index.search("hydropower", country="KEN") == (1, index.search("hydropower")[1][:1])
+        assert index.search("economie climat", country="KEN") == (0, [])
+
+    def test_replace_and_compact(self):
+        index = self.index()
+        index.add(dict(self.documents[0], title="Wind power in Kenya", abstract=None))
+        assert [uuid for uuid, _ in index.search("hydropower")[1]] == ["b"]
+        assert index.tombstones == 1
+        index.compact()
+        assert index.tombstones == 0
+        assert [uuid for uuid, _ in index.search("kenya wind")[1]] == ["a"]
+
+    def test_search_api(self):
+        from app.core.search import search_index
+        from app.crud.search import build_index
+        index, modified = build_index()
+        search_index.replace(index, None, modified)
+        response = client.get("/api/search?q=energy&limit=5")
+        assert response.status_code == 200
+        result = response.json()
+        assert result["meta"]["q"] == "energy"
+        scores = [output["score"] for output in result["results"]]
+        assert scores == sorted(scores, reverse=True)
+
+    def test_search_query_required(self):
+        response = client.get("/api/search")
+        assert response.status_code == 422
+
+
+class TestSuggest:
+    documents = [
+        {"uuid": "a1", "type": "author", "first_name": "José", "last_name": "Ñúñez",
+         "orcid": "https://orcid.org/0000-0002-1825-0097", "weight": 3, "modified": 0},
+        {"uuid": "a2", "type": "author", "first_name": "Jo", "last_name": "Smith",
+         "orcid": None, "weight": 7, "modified": 0},
+        {"uuid": "o1", "type": "output", "title": "Joint modelling of energy: a review",
+         "weight": 12, "modified": 1},
+    ]
+
+    def index(self):
+        from app.core.suggest import SuggestIndex
+        index = SuggestIndex()
+        index.update(self.documents)
+        return index
+
+    def test_prefix_ranked_by_weight(self):
+        results = self.index().suggest("Jo")
+        assert [result["id"] for result in results] == ["o1", "a2", "a1"]
+
+    def test_names_orcid_and_accents(self):
+        index = self.index()
+        assert [r["id"] for r in index.suggest("nunez jo")] == ["a1"]
+        assert [r["id"] for r in index.suggest("jose n")] == ["a1"]
+        assert [r["id"] for r in index.suggest("0000-0002-18")] == ["a1"]
+        assert [r["id"] for r in index.suggest("joint modelling of energy a")] == ["o1"]
+
+    def test_type_and_limit(self):
+        index = self.index()
+        assert [r["id"] for r in index.suggest("jo", type="author", limit=1)] == ["a2"]
+        assert index.suggest("  ") == []
+
+    def test_update_replaces(self):
+        index = self.index()
+        assert index.suggest("smith")
+        index.update([dict(self.documents[1], last_name="Smyth")])
+        assert index.suggest("smith") == []
+        assert [r["id"] for r in index.suggest("smy")] == ["a2"]
+        assert len(index) == 3
+
+    def test_update_merges_many_entries(self, monkeypatch):
+        from app.core import suggest
+        monkeypatch.setattr(suggest, "MOVED_ENTRIES", 0)
+        index = self.index()
+        index.update([dict(self.documents[1], last_name="Smyth"),
+                      {"uuid": "o2", "type": "output", "title": "Smelting", "weight": 1}])
+        assert [r["id"] for r in index.suggest("sm")] == ["a2", "o2"]
+        entries = index._state[0]
+        assert entries == sorted(entries) and len(index) == 4
+
+    def test_suggest_api(self):
+        from app.core.suggest import suggest_index
+        suggest_index.replace(self.index(), None, 1)
+        response = client.get("/api/suggest?prefix=jo&type=output")
+        assert response.status_code == 200
+        assert response.json()["results"][0]["label"] == "Joint modelling of energy: a review"
+
+    def test_suggest_limit_wrong(self):
+        response = client.get("/api/suggest?prefix=jo&limit=100")
+        assert response.status_code == 422
+
+
+class TestSerialise:
+    output = {"uuid": "f05b1fc5-f831-4755-966f-06de074ab51c",
+              "doi": "10.5281/zenodo.7015450",
+              "title": "An example title",
+              "result_type": "publication",
+              "authors": [{"uuid": "c613b25b-967c-4586-9101-ece3a901fd9c",
+                           "first_name": "Will",
+                           "last_name": "Usher",
+                           "orcid": "https://orcid.org/0000-0001-9367-1791",
+                           "rank": 1}],
+              "countries": [{"id": "KEN", "name": "Kenya"}]}
+
+    def test_matches_validation(self):
+        from app.core.serialise import compile_serialiser
+        from app.schemas.output import OutputModel
+        expected = OutputModel.model_validate(self.output).model_dump(mode="json")
+        assert compile_serialiser(OutputModel)(self.output) == expected
+        assert "rank" not in compile_serialiser(OutputModel)(self.output)["authors"][0]
+
+    def test_strict_responses(self, monkeypatch):
+        from fastapi.exceptions import ResponseValidationError
+        from app.core.config import settings
+        from app.core.serialise import encode
+        from app.schemas.output import OutputModel
+        invalid = dict(self.output, doi="not a doi")
+        assert json.loads(encode(OutputModel, invalid))["doi"] == "not a doi"
+        monkeypatch.setattr(settings, "STRICT_RESPONSES", True)
+        with pytest.raises(ResponseValidationError):
+            encode(OutputModel, invalid)
+
+    def test_response_model_in_schema(self):
+        schema = client.get("/openapi.json").json()
+        response = schema["paths"]["/api/outputs"]["get"]["responses"]["200"]
+        assert response["content"]["application/json"]["schema"] == \
+            {"$ref": "#/components/schemas/OutputListModel"}
+
+
+class TestPagination:
+    def test_window(self):
+        from app.core.pagination import page_window
+        pages = page_window(1_000_000, 500_000, 20)
+        assert [page and page["number"] for page in pages] == \
+            [1, None, 24999, 25000, 25001, 25002, 25003, None, 50000]
+        assert [page["active"] for page in pages if page] == \
+            [False, False, False, True, False, False, False]
+
+    def test_window_edges(self):
+        from app.core.pagination import page_window
+        assert page_window(0, 0, 20) == []
+        assert [page["skip"] for page in page_window(40, 0, 20)] == [0, 20]
+        assert [page["number"] for page in page_window(None, 40, 20)] == [1, 2, 3]
+
+    def test_window_without_total(self):
+        from app.core.pagination import page_window
+        pages = page_window(None, 500_000, 20)
+        assert [page and page["number"] for page in pages] == [1, None, 24999, 25000, 25001]
+        assert pages[-1]["active"]
+        assert [page["number"] for page in page_window(None, 0, 20)] == [1]
+
+    def test_render_is_bounded(self):
+        from app.main import templates
+        html = templates.get_template("pagination.html").render(
+            meta={"count": {"total": 1_000_000}, "skip": 20, "limit": 20}, results=[])
+        assert html.count("<li") == 8
+        assert "skip=999980" in html and "Next" in html and "Previous" in html
+
+
 class TestCORS:
     def test_cors_preflight(self):
         response = client.options("/api/authors", headers={
@@ -169,4 +541,286 @@ class TestCORS:
             "Access-Control-Request-Headers": "Content-Type, Authorization"
         })
         assert response.status_code == 200
-        assert "authorization" in response.headers["access-control-allow-headers"].lower()
\ No newline at end of file
+        assert "authorization" in response.headers["access-control-allow-headers"].lower()
+
+class TestCache:
+    def test_cache_stats(self):
+        response = client.get("/api/cache")
+        assert response.status_code == 200
+        assert {"hits", "misses", "evictions", "data_version"} <= response.json().keys()
+
+    def test_repeated_request_is_a_hit(self):
+        client.get("/api/outputs?limit=3")
+        before = client.get("/api/cache").json()["hits"]
+        response = client.get("/api/outputs?limit=3")
+        assert response.status_code == 200
+        assert client.get("/api/cache").json()["hits"] == before + 1
+
+    def test_data_version_change_clears_cache(self):
+        from app.core.cache import data_version, response_cache
+        client.get("/api/outputs?limit=4")
+        data_version.set(data_version.current + 1)
+        assert len(response_cache) == 0
+
+    def test_keyed_on_index_version(self):
+        import asyncio
+        from app.core.cache import cached
+        index = {"version": 1}
+        calls = []
+
+        @cached(version=lambda: index["version"])
+        async def handler(q):
+            calls.append(q)
+            return len(calls)
+
+        assert [asyncio.run(handler(q="energy")) for _ in range(2)] == [1, 1]
+        index["version"] = 2
+        assert asyncio.run(handler(q="energy")) == 2
+
+    def fragment(self, **entity):
+        from starlette.requests import Request
+        from app.main import templates
+        request = Request({"type": "http", "method": "GET", "path": "/outputs",
+                           "query_string": b"", "headers": [(b"host", b"testserver")],
+                           "scheme": "http", "server": ("testserver", 80), "app": app,
+                           "router": app.router})
+        template = templates.env.from_string(
+            "{% for output in results %}{{ fragment('output_card.html', output=output) }}{% endfor %}")
+        return template.render(request=request, **entity)
+
+    def test_fragment_cached_per_version(self):
+        from app.core.cache import data_version
+        from app.core.fragments import fragment_cache
+        output = {"uuid": "f05b1fc5-f831-4755-966f-06de074ab51c", "title": "A title",
+                  "doi": "10.5281/zenodo.7015450", "authors": [], "countries": []}
+        first = self.fragment(results=[output])
+        assert "A title" in first
+        hits = fragment_cache.hits
+        assert self.fragment(results=[dict(output, title="Changed")]) == first
+        assert fragment_cache.hits == hits + 1
+        data_version.set(data_version.current + 1)
+        assert "Changed" in self.fragment(results=[dict(output, title="Changed")])
+
+
+class TestConditionalGet:
+    def test_etag(self):
+        response = client.get("/api/outputs?limit=2")
+        assert response.status_code == 200
+        assert response.headers["etag"].startswith('"')
+
+    def test_if_none_match(self):
+        etag = client.get("/api/outputs?limit=2").headers["etag"]
+        response = client.get("/api/outputs?limit=2", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+
+    def test_etag_depends_on_parameters(self):
+        first = client.get("/api/outputs?limit=2").headers["etag"]
+        second = client.get("/api/outputs?limit=3").headers["etag"]
+        assert first != second
+
+    def test_ingest_not_tagged(self):
+        response = client.get("/api/ingest/ingest_dois")
+        assert "etag" not in response.headers
+
+    def test_suggest_tagged_with_index_version(self, monkeypatch):
+        from app.core.suggest import SuggestIndex, suggest_index
+        monkeypatch.setattr(suggest_index, "index", None)
+        monkeypatch.setattr(suggest_index, "version", None)
+        assert "etag" not in client.get("/api/suggest?prefix=jo").headers
+        suggest_index.replace(SuggestIndex(), 1, 0.0)
+        response = client.get("/api/suggest?prefix=jo")
+        assert response.status_code == 200
+        assert "last-modified" not in response.headers
+        etag = response.headers["etag"]
+        suggest_index.version = 2
+        assert client.get("/api/suggest?prefix=jo").headers["etag"] != etag
+
+
+class TestSchema:
+    def test_memgraph_unique_key_gets_index_and_constraint(self):
+        from app.db.schema import Memgraph, SchemaItem
+        item = SchemaItem("Output", "uuid", unique=True)
+        statements = Memgraph.statements(item, set(), set())
+        assert statements == ["CREATE INDEX ON :Output(uuid);",
+                              "CREATE CONSTRAINT ON (n:Output) ASSERT n.uuid IS UNIQUE;"]
+
+    def test_existing_items_are_skipped(self):
+        from app.db.schema import Memgraph, Neo4j, SchemaItem
+        item = SchemaItem("Country", "id", unique=True)
+        present = {("Country", "id")}
+        assert Memgraph.statements(item, present, present) == []
+        assert Neo4j.statements(item, present, present) == []
+
+    def test_schema_is_complete(self):
+        from app.db.schema import check_schema
+        assert check_schema() == []
+
+
+class TestMetrics:
+    def test_metrics(self):
+        client.get("/api/outputs?limit=1")
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'research_index_http_request_seconds_count{method="GET",route="/api/outputs"' in response.text
+
+    def test_session_queries_recorded(self):
+        from prometheus_client import REGISTRY
+        from app.db.session import InstrumentedSession
+
+        class Transaction:
+            def run(self, query, parameters=None, **kwargs):
+                return [query]
+
+        class Session:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                return False
+
+            def run(self, query, parameters=None, **kwargs):
+                return iter([query])
+
+            def execute_write(self, work):
+                return work(Transaction())
+
+        def count():
+            return REGISTRY.get_sample_value("research_index_query_seconds_count",
+                                             {"query": "Test.session"}) or 0
+
+        before = count()
+        with InstrumentedSession(Session(), "Test.session") as session:
+            assert session.execute_write(lambda tx, uuid: tx.run("MERGE", uuid=uuid), "a") == ["MERGE"]
+            assert list(session.run("MATCH")) == ["MATCH"]
+            assert count() == before + 1
+        assert count() == before + 2
+
+    def test_driver_of_other_loop_closed(self):
+        import asyncio
+        import threading
+        from app.db.session import _discard_async_driver
+
+        class Driver:
+            closed = threading.Event()
+
+            async def close(self):
+                self.closed.set()
+
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        driver = Driver()
+        _discard_async_driver(driver, loop)
+        assert driver.closed.wait(5)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+        _discard_async_driver(Driver(), loop)
+
+
+class TestSlowQueryLog:
+    def test_query_parameters(self):
+        from app.db.slowlog import query_parameters
+        assert query_parameters((), {"uuid": "a", "database_": "memgraph"}) == {"uuid": "a"}
+
+    def test_parameters_summarised(self):
+        from app.db.slowlog import summarise_parameters
+        summary = summarise_parameters({"uuid": "a", "rows": [{"doi": "10.1/x"}] * 500,
+                                        "abstract": "x" * 1000, "0": {"dois": ["10.1/x"]}})
+        assert summary == {"uuid": "a", "rows": "<list of 500>",
+                           "abstract": "x" * 100 + "... <1000 characters>",
+                           "0": {"dois": "<list of 1>"}}
+
+    def test_profile_rate_limited(self):
+        from app.db.slowlog import SlowQueryLog
+        log = SlowQueryLog(threshold=1, path="/dev/null", interval=300)
+        assert log._should_profile("Output.filter_type", "MATCH (o) RETURN o")
+        log._busy = False
+        assert not log._should_profile("Output.filter_type", "MATCH (o) RETURN o")
+
+    def test_writes_not_profiled(self):
+        from app.db.slowlog import SlowQueryLog
+        log = SlowQueryLog(threshold=1, path="/dev/null")
+        assert not log._should_profile("Statistics.bump_version", "MERGE (n) SET n.x = 1")
+
+
+class TestIngestJobs:
+    def test_unknown_job(self):
+        response = client.get("/api/ingest/jobs/8e7b6c9c-5f39-4a8e-9f8c-2a1b3c4d5e6f")
+        assert response.status_code == 404
+
+    def test_malformed_job_id(self):
+        response = client.get("/api/ingest/jobs/..%2F..%2Fetc")
+        assert response.status_code == 404
+
+    def test_write_metadata_deprecated(self):
+        schema = client.get("/openapi.json").json()
+        parameters = schema["paths"]["/api/ingest/ingest_dois"]["post"]["parameters"]
+        assert [p["deprecated"] for p in parameters if p["name"] == "write_metadata"] == [True]
+
+    def test_empty_file(self):
+        response = client.post("/api/ingest/ingest_dois",
+                               files={"file": ("dois.txt", b"\n\n")})
+        assert response.status_code == 400
+
+    def test_writer_lock_without_waiting(self, tmp_path):
+        from app.core.jobs import writer_lock
+        with writer_lock(tmp_path) as locked:
+            assert locked
+            with writer_lock(tmp_path, wait=False) as other:
+                assert not other
+        with writer_lock(tmp_path, wait=False) as locked:
+            assert locked
+
+    def test_rebuild_counters_holds_writer_lock(self, monkeypatch, tmp_path):
+        from app import cli
+        from app.core.jobs import writer_lock
+        held = []
+
+        class Statistics:
+            def rebuild(self):
+                with writer_lock(tmp_path, wait=False) as locked:
+                    held.append(not locked)
+                return {}
+
+        class Collaborations:
+            def rebuild(self):
+                return 0
+
+        monkeypatch.setattr(cli.settings, "INGEST_JOBS_DIR", str(tmp_path))
+        monkeypatch.setattr(cli, "Statistics", Statistics)
+        monkeypatch.setattr(cli, "Collaborations", Collaborations)
+        assert cli.rebuild_counters(None) == 0
+        assert held == [True]
+
+    def test_broken_pool_replaced(self, monkeypatch, tmp_path):
+        from concurrent.futures import Future
+        from concurrent.futures.process import BrokenProcessPool
+
+        from app.core.jobs import JobStore
+        from app.crud import ingest
+
+        class BrokenPool:
+            def submit(self, *args):
+                raise BrokenProcessPool("A child process terminated abruptly")
+
+            def shutdown(self, wait=True, cancel_futures=False):
+                pass
+
+        class QueuingPool:
+            def __init__(self):
+                self.jobs = []
+
+            def submit(self, f, *args):
+                self.jobs.append(args[0])
+                return Future()
+
+        pool = QueuingPool()
+        monkeypatch.setattr(ingest, "jobs", JobStore(tmp_path))
+        monkeypatch.setattr(ingest, "_pool", BrokenPool())
+        monkeypatch.setattr(ingest, "_new_pool", lambda: pool)
+        job = ingest.submit_ingest_job(["10.3390/en14185827"], 50, False)
+        assert pool.jobs == [job["id"]]
+        assert ingest._pool is pool
@@ -0,0 +1,357 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+from neo4j import Record
+
+from app.crud.ingest import Ingest
+from app.pipeline.countries import (CountryMatcher, _replace_countries, load_terms,
+                                    output_countries)
+from app.pipeline.fetch import MetadataFetcher, ResponseStore
+from app.pipeline.records import _authors, normalise_doi, output_record
+from app.pipeline.run import ingest
+from app.pipeline.writer import (DELETE_ORPHANS_QUERY, MERGE_NAMED_AUTHORS_QUERY, GraphWriter,
+                                 _write_batch, authorship_rows, batches, output_counts,
+                                 output_rows)
+
+CASSETTE = Path(__file__).parent / "fixtures" / "metadata_cassette.json"
+
+ZIMBABWE = "10.3390/en14185827"
+KENYA = "10.1038/s41598-023-28377-7"
+UNKNOWN = "10.9999/not-a-doi"
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """Replay the responses recorded in the cassette, counting requests per path"""
+
+    def __init__(self, delay: float = 0):
+        super().__init__(("127.0.0.1", 0), ReplayHandler)
+        with open(CASSETTE) as cassette:
+            self.interactions = {i["path"]: list(i["responses"])
+                                 for i in json.load(cassette)["interactions"]}
+        self.delay = delay
+        self.requests = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests[self.path] = server.requests.get(self.path, 0) + 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            responses = server.interactions.get(self.path)
+            if responses and len(responses) > 1:
+                response = responses.pop(0)
+            elif responses:
+                response = responses[0]
+            else:
+                response = {"status": 404, "body": {"error": "Not found"}}
+        time.sleep(server.delay)
+        body = json.dumps(response["body"]).encode()
+        self.send_response(response["status"])
+        for name, value in response.get("headers", {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with server.lock:
+            server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def replay():
+    server = ReplayServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_fetcher(server: ReplayServer, directory, ttl: float = 3600, **kwargs) -> MetadataFetcher:
+    return MetadataFetcher(openalex_url=f"{server.url}/openalex",
+                           openaire_url=f"{server.url}/openaire",
+                           store=ResponseStore(str(directory), ttl),
+                           **kwargs)
+
+
+class TestMetadataFetcher:
+    def test_fetch_all(self, replay, tmp_path):
+        fetcher = make_fetcher(replay, tmp_path)
+        metadata = asyncio.run(fetcher.fetch_all([ZIMBABWE, KENYA, UNKNOWN]))
+        assert metadata[ZIMBABWE].openalex["publication_year"] == 2021
+        assert metadata[ZIMBABWE].openaire["pids"][0]["value"] == ZIMBABWE
+        assert len(metadata[KENYA].openalex["authorships"]) == 7
+        assert metadata[UNKNOWN].openalex is None
+        assert metadata[UNKNOWN].openaire is None
+
+    def test_retry_after_rate_limit(self, replay, tmp_path):
+        fetcher = make_fetcher(replay, tmp_path)
+        metadata = asyncio.run(fetcher.fetch_all([KENYA]))
+        assert metadata[KENYA].openaire is not None
+        assert replay.requests["/openaire/researchProducts?pid=10.1038%2Fs41598-023-28377-7"] == 2
+
+    def test_cached_responses_are_not_requested(self, replay, tmp_path):
+        asyncio.run(make_fetcher(replay, tmp_path).fetch_all([ZIMBABWE, UNKNOWN]))
+        requests = sum(replay.requests.values())
+        fetcher = make_fetcher(replay, tmp_path)
+        metadata = asyncio.run(fetcher.fetch_all([ZIMBABWE, UNKNOWN]))
+        assert sum(replay.requests.values()) == requests
+        assert fetcher.cache_hits == 4
+        assert metadata[ZIMBABWE].openalex["title"].startswith("Potential Climate Change Risks")
+
+    def test_expired_responses_are_requested(self, replay, tmp_path):
+        asyncio.run(make_fetcher(replay, tmp_path).fetch_all([ZIMBABWE]))
+        fetcher = make_fetcher(replay, tmp_path, ttl=0)
+        asyncio.run(fetcher.fetch_all([ZIMBABWE]))
+        assert fetcher.requests == 2
+
+    def test_per_host_concurrency(self, replay, tmp_path):
+        replay.delay = 0.05
+        dois = [f"10.9999/{i}" for i in range(12)]
+        fetcher = make_fetcher(replay, tmp_path, per_host=3, rate=0)
+        start = time.perf_counter()
+        asyncio.run(fetcher.fetch_all(dois))
+        elapsed = time.perf_counter() - start
+        # Both sources share the replay host
+        assert replay.max_in_flight <= 3
+        assert elapsed < 24 * 0.05
+
+
+class RecordingWriter(GraphWriter):
+    """Keep the records in memory instead of writing them to the graph"""
+
+    def __init__(self, existing=()):
+        super().__init__(batch_size=2)
+        self.existing = set(existing)
+        self.records = []
+
+    def existing_dois(self, dois):
+        return self.existing & set(dois)
+
+    def write(self, records):
+        self.records.extend(records)
+
+
+class RecordingIngest(Ingest):
+    """Ingest in chunks without linking countries or updating counters"""
+
+    def _link_countries(self, states):
+        pass
+
+    def _update_counters(self, states):
+        pass
+
+
+class RecordingResult:
+    def __init__(self, records):
+        self.records = [Record(record) for record in records]
+
+    def consume(self):
+        pass
+
+    def single(self):
+        return self.records[0]
+
+    def __iter__(self):
+        return iter(self.records)
+
+
+class RecordingTransaction:
+    """Keep the statements run in a transaction, returning ``results`` in turn"""
+
+    def __init__(self, *results):
+        self.statements = []
+        self.results = list(results)
+
+    def run(self, query, **params):
+        self.statements.append((query, params))
+        return RecordingResult(self.results.pop(0) if self.results else [])
+
+
+class TestRecords:
+    def test_output_record(self, replay, tmp_path):
+        metadata = asyncio.run(make_fetcher(replay, tmp_path).fetch_all([ZIMBABWE]))
+        record = output_record(ZIMBABWE, metadata[ZIMBABWE])
+        assert record.result_type == "publication"
+        assert (record.publication_year, record.publication_month) == (2021, 9)
+        assert record.journal == "Energies"
+        assert record.abstract.startswith("Almost all countries have committed")
+        assert [a.last_name for a in record.authors] == ["Howells", "Boehlert", "Benitez"]
+        assert record.authors[0].orcid == "https://orcid.org/0000-0001-6419-4957"
+        assert record.authors[2].first_name == "Pablo C."
+
+    def test_single_word_name_skipped(self):
+        openalex = {"authorships": [{"author": {"display_name": "Suharto"}},
+                                    {"author": {"display_name": "Jane Doe"}}]}
+        authors = _authors(openalex, None)
+        assert [(a.first_name, a.last_name, a.rank) for a in authors] == [("Jane", "Doe", 2)]
+        openaire = {"authors": [{"fullName": "Suharto", "rank": 1},
+                                {"name": "Jane", "surname": "Doe", "rank": 2}]}
+        assert [a.last_name for a in _authors(None, openaire)] == ["Doe"]
+
+    def test_normalise_doi(self):
+        assert normalise_doi(" https://doi.org/10.3390/en14185827 ") == ZIMBABWE
+
+    def test_authorship_rows_split_by_orcid(self, replay, tmp_path):
+        metadata = asyncio.run(make_fetcher(replay, tmp_path).fetch_all([KENYA]))
+        record = output_record(KENYA, metadata[KENYA])
+        with_orcid = list(authorship_rows([record], orcid=True))
+        without_orcid = list(authorship_rows([record], orcid=False))
+        assert len(with_orcid) == 3 and len(without_orcid) == 4
+        assert [list(batch) for batch in batches(range(5), 2)] == [[0, 1], [2, 3], [4]]
+
+    def test_batch_written_in_one_transaction(self, replay, tmp_path):
+        metadata = asyncio.run(make_fetcher(replay, tmp_path).fetch_all([KENYA]))
+        record = output_record(KENYA, metadata[KENYA])
+        cleared = {"doi": KENYA, "result_type": "publication", "uuid": "unlinked"}
+        tx = RecordingTransaction([cleared], [], [{"created": 1}], [{"created": 2}],
+                                  [{"uuid": "unlinked"}])
+        unlinked, created, deleted = _write_batch(
+            tx, list(output_rows([record], 0)),
+            list(authorship_rows([record], orcid=True)),
+            list(authorship_rows([record], orcid=False)))
+        assert (unlinked, created, deleted) == ([cleared], 3, ["unlinked"])
+        assert len(tx.statements) == 5
+        query, params = tx.statements[3]
+        assert query == MERGE_NAMED_AUTHORS_QUERY and len(params["rows"]) == 4
+        query, params = tx.statements[4]
+        assert query == DELETE_ORPHANS_QUERY and params["uuids"] == ["unlinked"]
+
+    def test_output_counts(self):
+        counts = output_counts(["publication", "dataset", "publication", None])
+        assert counts == {"total": 4, "publication": 2, "dataset": 1}
+
+
+class TestIngest:
+    def test_ingest(self, replay, tmp_path):
+        writer = RecordingWriter(existing=[KENYA])
+        dois = [ZIMBABWE, f"https://doi.org/{ZIMBABWE}", KENYA, UNKNOWN, "not a doi"]
+        metrics, states = ingest(dois, fetcher=make_fetcher(replay, tmp_path), writer=writer)
+        assert states.ingested_dois == [ZIMBABWE]
+        assert states.existing_dois == [KENYA]
+        assert states.metadata_failure == [UNKNOWN]
+        assert states.invalid_pattern_dois == ["not a doi"]
+        assert states.duplicated_submissions == [ZIMBABWE]
+        assert metrics.submitted_dois == 5
+        assert [record.doi for record in writer.records] == [ZIMBABWE]
+
+    def test_duplicates_across_chunks_ingested_once(self, replay, tmp_path):
+        dois = [ZIMBABWE, KENYA, f"https://doi.org/{ZIMBABWE}"]
+        ingest = RecordingIngest(dois, 50, False, chunk_size=1)
+        ingest.fetcher, ingest.writer = make_fetcher(replay, tmp_path), RecordingWriter()
+        metrics, states = ingest.ingest_dois()
+        assert [record.doi for record in ingest.writer.records] == [ZIMBABWE, KENYA]
+        assert states.duplicated_submissions == [ZIMBABWE]
+        assert states.submitted_dois == dois
+        assert (metrics.submitted_dois, metrics.processed_dois) == (3, 2)
+
+    def test_update_metadata(self, replay, tmp_path):
+        writer = RecordingWriter(existing=[KENYA])
+        _, states = ingest([KENYA], update_metadata=True,
+                           fetcher=make_fetcher(replay, tmp_path), writer=writer)
+        assert states.updated_existing_dois == [KENYA]
+        assert states.ingested_dois == []
+
+
+class TestCountryMatcher:
+    matcher = CountryMatcher(load_terms() | {"Kenya": "KEN", "Zimbabwe": "ZWE"})
+
+    def test_names_and_demonyms(self):
+        assert self.matcher.find("Zimbabwe’s NDC goals") == {"ZWE"}
+        assert self.matcher.find("Cooking fuels in Kenyan households") == {"KEN"}
+        assert self.matcher.find("Survey of Kenyans") == {"KEN"}
+        assert self.matcher.find(None) == set()
+
+    def test_whole_words_longest_first(self):
+        assert self.matcher.find("Energy access in Nigeria") == {"NGA"}
+        assert self.matcher.find("Equatorial Guinea and Guinea-Bissau") == {"GNQ", "GNB"}
+        assert self.matcher.find("Malian and Somalian") == {"MLI"}
+
+    def test_proper_names_only(self):
+        assert self.matcher.find("Roast turkey and guinea pig in the lake chad basin") == set()
+        assert self.matcher.find("Turkey and Chad") == {"TUR", "TCD"}
+        assert self.matcher.find("ENERGY ACCESS IN KENYA") == {"KEN"}
+
+    def test_output_countries(self, replay, tmp_path):
+        metadata = asyncio.run(make_fetcher(replay, tmp_path).fetch_all([ZIMBABWE, KENYA]))
+        outputs = [output_record(doi, metadata[doi]).model_dump() for doi in (ZIMBABWE, KENYA)]
+        assert list(output_countries(self.matcher, outputs)) == [
+            {"doi": ZIMBABWE, "country": "ZWE"}, {"doi": KENYA, "country": "KEN"}]
+
+    def test_relinked_in_one_transaction(self):
+        tx = RecordingTransaction([], [{"id": "KEN"}])
+        rows = [{"doi": ZIMBABWE, "country": "ZWE"}]
+        assert _replace_countries(tx, [ZIMBABWE], rows) == ["KEN"]
+        assert [params for _, params in tx.statements][-1] == {"rows": rows}
+        assert len(tx.statements) == 3
+
+
+# The outputs with $dois as compared between the backend package and the
+# pipeline. Authors are compared by ORCID where they have one, as ORCID
+# authors are shared and keep the names they were created with
+OUTPUT_GRAPH_QUERY = """
+    UNWIND $dois AS doi
+    MATCH (o:Output {doi: doi})
+    OPTIONAL MATCH (o)<-[r:author_of]-(a:Author)
+    WITH o, r, a ORDER BY r.rank
+    WITH o, collect(coalesce(a.orcid, a.first_name + ' ' + a.last_name)) as authors
+    OPTIONAL MATCH (o)-[:refers_to]->(c:Country)
+    RETURN o.doi as doi, o.title as title, o.result_type as result_type,
+           o.publication_year as publication_year, authors,
+           collect(c.id) as countries
+    """
+
+DELETE_OUTPUTS_QUERY = """
+    UNWIND $dois AS doi
+    MATCH (o:Output {doi: doi})
+    DETACH DELETE o
+    """
+
+
+@pytest.mark.skipif(not os.getenv("INGEST_PARITY"),
+                    reason="writes to the graph and fetches live metadata")
+class TestBackendParity:
+    """The pipeline writes the same graph as research_index_backend"""
+
+    def output_graph(self, driver, dois):
+        records, _, _ = driver.execute_query(OUTPUT_GRAPH_QUERY, dois=dois)
+        return sorted((record.data() | {"countries": sorted(record["countries"])}
+                       for record in records), key=lambda output: output["doi"])
+
+    def test_graph_matches_backend(self, replay, tmp_path):
+        backend = pytest.importorskip("research_index_backend.create_graph_from_doi")
+        from app.crud.ingest import Ingest
+        from app.db.session import get_driver
+        driver, dois = get_driver(), [ZIMBABWE, KENYA]
+
+        driver.execute_query(DELETE_OUTPUTS_QUERY, dois=dois)
+        backend.main(dois, limit=len(dois), update_metadata=False, write_metadata=False)
+        backend.add_country_relations()
+        expected = self.output_graph(driver, dois)
+
+        driver.execute_query(DELETE_OUTPUTS_QUERY, dois=dois)
+        # The pipeline reads the recorded responses, so only the backend
+        # needs network access
+        ingest = Ingest(dois, len(dois), update_metadata=False)
+        ingest.fetcher = make_fetcher(replay, tmp_path)
+        ingest.ingest_dois()
+        assert self.output_graph(driver, dois) == expected
+        assert len(expected) == len(dois)
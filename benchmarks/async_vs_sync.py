@@ -0,0 +1,97 @@
+"""Compare the synchronous and asyncio data-access paths under load
+
+Both paths are driven from a single event loop, i.e. the equivalent of one
+uvicorn worker:
+
+- ``sync``: the blocking CRUD classes are run through the Starlette
+  threadpool (``anyio.to_thread.run_sync``), exactly as FastAPI runs a plain
+  ``def`` route handler. Concurrency is capped by the threadpool size
+  (40 threads by default).
+- ``async``: the ``Async*`` CRUD classes are awaited directly on the event
+  loop, as the ``async def`` route handlers do.
+
+The database configured in ``.env`` must be running and populated. Run with::
+
+    python -m benchmarks.async_vs_sync --concurrency 200 --requests 2000
+
+"""
+import argparse
+import asyncio
+import json
+import time
+from functools import partial
+
+import anyio.to_thread
+
+from app.crud.author import AsyncAuthor, Author
+from app.crud.country import AsyncCountry, Country
+from app.crud.output import AsyncOutput, Output
+from app.db.session import close_async_driver, close_driver
+from benchmarks.stats import format_row, summarise
+
+
+def scenarios(author_id: str) -> dict:
+    """Pairs of equivalent (sync, async) calls, one per list/detail route"""
+    return {
+        "authors": (partial(Author().get_authors, skip=0, limit=20),
+                    partial(AsyncAuthor().get_authors, skip=0, limit=20)),
+        "author": (partial(Author().get_author, author_id),
+                   partial(AsyncAuthor().get_author, author_id)),
+        "outputs": (partial(Output().get_outputs, skip=0, limit=20),
+                    partial(AsyncOutput().get_outputs, skip=0, limit=20)),
+        "countries": (partial(Country().get_countries, skip=0, limit=20),
+                      partial(AsyncCountry().get_countries, skip=0, limit=20)),
+    }
+
+
+async def drive(call, mode: str, requests: int, concurrency: int) -> dict:
+    """Issue ``requests`` calls from ``concurrency`` concurrent clients"""
+    latencies = []
+    remaining = iter(range(requests))
+
+    async def client():
+        for _ in remaining:
+            start = time.perf_counter()
+            if mode == "sync":
+                await anyio.to_thread.run_sync(call)
+            else:
+                await call()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return summarise(latencies, elapsed) | {"concurrency": concurrency}
+
+
+async def main(requests: int, concurrency: int, output: str | None):
+    authors, _ = Author().fetch_author_nodes(skip=0, limit=1)
+    author_id = authors[0]["uuid"]
+
+    report = {}
+    for name, (sync_call, async_call) in scenarios(author_id).items():
+        report[name] = {}
+        for mode, call in (("sync", sync_call), ("async", async_call)):
+            await drive(call, mode, min(requests, concurrency), concurrency)  # warm up
+            result = await drive(call, mode, requests, concurrency)
+            report[name][mode] = result
+            print(format_row(f"{name} {mode}", result))
+
+    await close_async_driver()
+    close_driver()
+
+    if output:
+        with open(output, "w") as json_file:
+            json.dump(report, json_file, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000,
+                        help="Number of calls per scenario and path")
+    parser.add_argument("--concurrency", type=int, default=100,
+                        help="Number of concurrent clients")
+    parser.add_argument("--output", default=None,
+                        help="Write the results to this JSON file")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.output))
@@ -0,0 +1,144 @@
+"""Latency and throughput of every route of a running server
+
+Each route is driven by concurrent HTTP clients in turn. Detail routes are
+requested for ids sampled from the list routes and list routes with random
+pages, so that results are not only served from the response cache (run
+the server with ``CACHE_ENABLED=false`` to measure the database alone).
+
+Start the server against a database loaded with
+:mod:`benchmarks.generate`, then run::
+
+    python -m benchmarks.endpoints --base-url http://localhost:8000 \\
+        --concurrency 50 --requests 1000 --label 100k --output endpoints-100k.json
+
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+import httpx
+
+from benchmarks.stats import format_row, summarise
+
+PAGES = 50
+
+
+def routes(samples: Dict[str, List[str]], rng: random.Random) -> Dict[str, Callable[[], str]]:
+    """URL factories, one per route, keyed by a short name"""
+    def page() -> int:
+        return rng.randrange(PAGES) * 20
+
+    def pick(kind: str) -> str:
+        return rng.choice(samples[kind])
+
+    return {
+        "api_outputs": lambda: f"/api/outputs?skip={page()}",
+        "api_outputs_type": lambda: f"/api/outputs?skip={page()}&result_type=dataset",
+        "api_outputs_country": lambda: f"/api/outputs?country={pick('countries')}",
+        "api_output": lambda: f"/api/outputs/{pick('outputs')}",
+        "api_authors": lambda: f"/api/authors?skip={page()}",
+        "api_author": lambda: f"/api/authors/{pick('authors')}",
+        "api_countries": lambda: "/api/countries",
+        "api_country": lambda: f"/api/countries/{pick('countries')}",
+        "api_workstreams": lambda: "/api/workstreams",
+        "api_workstream": lambda: f"/api/workstreams/{pick('workstreams')}",
+        "html_index": lambda: "/",
+        "html_outputs": lambda: f"/outputs?skip={page()}",
+        "html_output": lambda: f"/outputs/{pick('outputs')}",
+        "html_authors": lambda: f"/authors?skip={page()}",
+        "html_author": lambda: f"/authors/{pick('authors')}",
+        "html_countries": lambda: "/countries",
+        "html_country": lambda: f"/countries/{pick('countries')}",
+        "html_workstreams": lambda: "/workstreams",
+        "html_workstream": lambda: f"/workstreams/{pick('workstreams')}",
+    }
+
+
+async def sample_ids(client: httpx.AsyncClient, size: int) -> Dict[str, List[str]]:
+    """Ids of outputs, authors, countries and workstreams to request"""
+    samples = {}
+    for kind, url, key in (("outputs", "/api/outputs", "uuid"),
+                           ("authors", "/api/authors", "uuid"),
+                           ("countries", "/api/countries", "id"),
+                           ("workstreams", "/api/workstreams", "id")):
+        response = await client.get(url, params={"limit": size})
+        response.raise_for_status()
+        samples[kind] = [row[key] for row in response.json()["results"]]
+        if not samples[kind]:
+            raise SystemExit(f"No {kind} in the database, load it with benchmarks.generate")
+    return samples
+
+
+async def drive(client: httpx.AsyncClient, url: Callable[[], str],
+                requests: int, concurrency: int) -> dict:
+    """Issue ``requests`` GETs from ``concurrency`` concurrent clients"""
+    latencies = []
+    statuses = Counter()
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                response = await client.get(url())
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return summarise(latencies, elapsed) | {"concurrency": concurrency,
+                                            "statuses": dict(statuses)}
+
+
+async def main(base_url: str, requests: int, concurrency: int, only: List[str] | None,
+               label: str | None, seed: int, output: str | None) -> dict:
+    rng = random.Random(seed)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        samples = await sample_ids(client, 200)
+        report = {"label": label,
+                  "base_url": base_url,
+                  "started_at": datetime.now(timezone.utc).isoformat(),
+                  "requests": requests,
+                  "concurrency": concurrency,
+                  "endpoints": {}}
+        for name, url in routes(samples, rng).items():
+            if only and name not in only:
+                continue
+            await drive(client, url, min(requests, concurrency), concurrency)  # warm up
+            result = await drive(client, url, requests, concurrency)
+            report["endpoints"][name] = result
+            print(format_row(name, result))
+
+    if output:
+        with open(output, "w") as json_file:
+            json.dump(report, json_file, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=500,
+                        help="Number of requests per route")
+    parser.add_argument("--concurrency", type=int, default=50,
+                        help="Number of concurrent clients")
+    parser.add_argument("--only", nargs="*", default=None,
+                        help="Only run these routes, e.g. api_outputs api_author")
+    parser.add_argument("--label", default=None,
+                        help="Recorded in the results, e.g. the size of the graph")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None,
+                        help="Write the results to this JSON file")
+    args = parser.parse_args()
+    asyncio.run(main(args.base_url, args.requests, args.concurrency, args.only,
+                     args.label, args.seed, args.output))
@@ -0,0 +1,253 @@
+"""Load a synthetic research graph for benchmarking
+
+The shape of the graph is scaled from the sample data in ``data/``:
+
+- the ratio of authors to outputs (``authors.csv`` and ``papers.csv``)
+- the number of authors of each output (``relations.csv``)
+- the skew in the number of outputs per author (``relations.csv``)
+- the lengths of titles and abstracts (``papers.csv``)
+
+Outputs also get a result type, publication year and zero to three
+countries, and a share of the authors are members of workstreams and partner
+institutions, so that every route has data to return.
+
+The graph is written to the database configured in ``.env`` in batches with
+``UNWIND``. Use a dedicated database, e.g. a local container::
+
+    docker run -d -p 7687:7687 memgraph/memgraph
+    python -m benchmarks.generate --outputs 100000 --clear
+
+``--clear`` deletes every node in the database first.
+"""
+import argparse
+import csv
+import random
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Iterator, List
+
+from app.crud.statistics import Statistics
+from app.db.schema import bootstrap_schema
+from app.db.session import close_driver, get_driver
+
+DATA = Path(__file__).resolve().parent.parent / "data"
+
+RESULT_TYPES = ["publication"] * 70 + ["dataset"] * 12 + ["software"] * 10 + ["other"] * 8
+
+COUNTRIES = ["AGO", "BEN", "BWA", "BFA", "BDI", "CMR", "CPV", "CAF", "TCD", "COM",
+             "COD", "DJI", "EGY", "GNQ", "ERI", "SWZ", "ETH", "GAB", "GMB", "GHA",
+             "GIN", "GNB", "CIV", "KEN", "LSO", "LBR", "LBY", "MDG", "MWI", "MLI",
+             "MRT", "MUS", "MAR", "MOZ", "NAM", "NER", "NGA", "COG", "RWA", "STP",
+             "SEN", "SYC", "SLE", "SOM", "ZAF", "SSD", "SDN", "TZA", "TGO", "TUN",
+             "UGA", "ZMB", "ZWE", "LAO", "KHM", "VNM", "IND", "NPL", "BGD", "GBR"]
+
+WORKSTREAM_UNITS = 4
+WORKSTREAMS_PER_UNIT = 5
+PARTNERS = 20
+
+WORDS = ("energy climate model system access policy finance grid solar wind "
+         "hydro transition emission pathway rural demand supply cost scenario "
+         "resilience storage battery mini-grid electricity planning open data "
+         "development growth investment risk adaptation mitigation").split()
+
+
+class Shape:
+    """Distributions measured from the sample data"""
+
+    def __init__(self, data: Path = DATA):
+        with open(data / "authors.csv", newline="") as f:
+            n_authors = sum(1 for _ in csv.DictReader(f))
+        with open(data / "papers.csv", newline="") as f:
+            papers = list(csv.DictReader(f))
+        with open(data / "relations.csv", newline="") as f:
+            relations = list(csv.DictReader(f))
+
+        self.authors_per_output = n_authors / len(papers)
+        self.team_sizes = list(Counter(r["paper_uuid"] for r in relations).values())
+        self.author_weights = list(Counter(r["uuid"] for r in relations).values())
+        self.title_words = [len(p["title"].split()) for p in papers]
+        self.abstract_words = [len(p["Abstract"].split()) for p in papers if p["Abstract"]]
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _text(rng: random.Random, lengths: List[int]) -> str:
+    return " ".join(rng.choices(WORDS, k=rng.choice(lengths)))
+
+
+def _batches(items: Iterator[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+CREATE_COUNTRIES = """UNWIND $rows as row
+    MERGE (c:Country {id: row.id})
+    SET c.name = row.name"""
+
+CREATE_WORKSTREAMS = """UNWIND $rows as row
+    CREATE (w:Workstream {id: row.id, name: row.name})
+    WITH w, row
+    MATCH (u:Workstream {id: row.unit})
+    CREATE (w)-[:unit_of]->(u)"""
+
+CREATE_UNITS = """UNWIND $rows as row
+    CREATE (:Workstream {id: row.id, name: row.name})"""
+
+CREATE_PARTNERS = """UNWIND $rows as row
+    CREATE (:Partner {id: row.id, name: row.name, ccg_partner: true})"""
+
+CREATE_AUTHORS = """UNWIND $rows as row
+    CREATE (a:Author {uuid: row.uuid, first_name: row.first_name,
+                      last_name: row.last_name, orcid: row.orcid})
+    WITH a, row
+    OPTIONAL MATCH (w:Workstream {id: row.workstream})
+    OPTIONAL MATCH (p:Partner {id: row.partner})
+    FOREACH (_ IN CASE WHEN w IS NULL THEN [] ELSE [1] END | CREATE (a)-[:member_of]->(w))
+    FOREACH (_ IN CASE WHEN p IS NULL THEN [] ELSE [1] END | CREATE (a)-[:member_of]->(p))"""
+
+CREATE_OUTPUTS = """UNWIND $rows as row
+    CREATE (o:Output {uuid: row.uuid, doi: row.doi, title: row.title,
+                      abstract: row.abstract, result_type: row.result_type,
+                      publication_year: row.publication_year})
+    WITH o, row
+    UNWIND row.countries as country
+    MATCH (c:Country {id: country})
+    CREATE (o)-[:refers_to]->(c)"""
+
+CREATE_AUTHORSHIP = """UNWIND $rows as row
+    MATCH (a:Author {uuid: row.author}), (o:Output {uuid: row.output})
+    CREATE (a)-[:author_of {rank: row.rank}]->(o)"""
+
+CLEAR = """MATCH (n) WITH n LIMIT 10000 DETACH DELETE n RETURN count(*) as deleted"""
+
+
+class Generator:
+    """Generate the nodes and relationships of a graph with ``outputs`` outputs"""
+
+    def __init__(self, outputs: int, seed: int = 42, shape: Shape | None = None):
+        self.outputs = outputs
+        self.shape = shape or Shape()
+        self.rng = random.Random(seed)
+        self.n_authors = max(1, round(outputs * self.shape.authors_per_output))
+        self.author_ids = [_uuid(self.rng) for _ in range(self.n_authors)]
+        self.weights = self.rng.choices(self.shape.author_weights, k=self.n_authors)
+        self.units = [f"unit{u}" for u in range(1, WORKSTREAM_UNITS + 1)]
+        self.workstreams = [f"{unit}.{w}" for unit in self.units
+                            for w in range(1, WORKSTREAMS_PER_UNIT + 1)]
+        self.partners = [f"partner{p}" for p in range(1, PARTNERS + 1)]
+
+    def countries(self) -> Iterator[dict]:
+        for code in COUNTRIES:
+            yield {"id": code, "name": code}
+
+    def authors(self) -> Iterator[dict]:
+        rng = self.rng
+        for i, author_id in enumerate(self.author_ids):
+            yield {"uuid": author_id,
+                   "first_name": rng.choice(WORDS).title(),
+                   "last_name": f"{rng.choice(WORDS).title()}{i}",
+                   "orcid": f"https://orcid.org/0000-0000-{i // 10000:04d}-{i % 10000:04d}",
+                   "workstream": rng.choice(self.workstreams) if rng.random() < 0.3 else None,
+                   "partner": rng.choice(self.partners) if rng.random() < 0.5 else None}
+
+    def outputs_and_authorship(self) -> Iterator[tuple[dict, List[dict]]]:
+        rng = self.rng
+        shape = self.shape
+        for i in range(self.outputs):
+            output_id = _uuid(rng)
+            team = min(rng.choice(shape.team_sizes), self.n_authors)
+            members = dict.fromkeys(rng.choices(self.author_ids, weights=self.weights, k=team))
+            output = {"uuid": output_id,
+                      "doi": f"10.5555/bench.{i}",
+                      "title": _text(rng, shape.title_words),
+                      "abstract": _text(rng, shape.abstract_words),
+                      "result_type": rng.choice(RESULT_TYPES),
+                      "publication_year": rng.randint(2015, 2025),
+                      "countries": rng.sample(COUNTRIES, k=rng.choice([0, 1, 1, 1, 2, 3]))}
+            authorship = [{"author": author, "output": output_id, "rank": rank}
+                          for rank, author in enumerate(members, start=1)]
+            yield output, authorship
+
+
+def _write(session, query: str, rows: Iterator[dict], batch_size: int) -> int:
+    count = 0
+    for batch in _batches(rows, batch_size):
+        session.execute_write(lambda tx: tx.run(query, rows=batch).consume())
+        count += len(batch)
+    return count
+
+
+def clear(session) -> None:
+    while session.execute_write(lambda tx: tx.run(CLEAR).single()["deleted"]):
+        pass
+
+
+def load(generator: Generator, batch_size: int) -> dict:
+    """Write the graph of ``generator`` to the database"""
+    timings = {}
+    with get_driver().session() as session:
+        start = time.perf_counter()
+        _write(session, CREATE_COUNTRIES, generator.countries(), batch_size)
+        _write(session, CREATE_UNITS,
+               ({"id": u, "name": f"Unit {u}"} for u in generator.units), batch_size)
+        _write(session, CREATE_WORKSTREAMS,
+               ({"id": w, "name": f"Workstream {w}", "unit": w.split(".")[0]}
+                for w in generator.workstreams), batch_size)
+        _write(session, CREATE_PARTNERS,
+               ({"id": p, "name": f"Partner {p}"} for p in generator.partners), batch_size)
+        _write(session, CREATE_AUTHORS, generator.authors(), batch_size)
+        timings["authors_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        outputs, authorship = [], []
+        for output, authors in generator.outputs_and_authorship():
+            outputs.append(output)
+            authorship.extend(authors)
+            if len(outputs) >= batch_size:
+                _write(session, CREATE_OUTPUTS, iter(outputs), batch_size)
+                _write(session, CREATE_AUTHORSHIP, iter(authorship), batch_size)
+                outputs, authorship = [], []
+        _write(session, CREATE_OUTPUTS, iter(outputs), batch_size)
+        _write(session, CREATE_AUTHORSHIP, iter(authorship), batch_size)
+        timings["outputs_s"] = time.perf_counter() - start
+    return timings
+
+
+def main(outputs: int, seed: int, batch_size: int, clear_first: bool) -> None:
+    if clear_first:
+        with get_driver().session() as session:
+            clear(session)
+    # Indexes first, so that relationships are created with index seeks
+    bootstrap_schema()
+    generator = Generator(outputs, seed=seed)
+    print(f"Generating {outputs} outputs and {generator.n_authors} authors")
+    timings = load(generator, batch_size)
+    start = time.perf_counter()
+    Statistics().rebuild()
+    Statistics().bump_version()
+    timings["counters_s"] = time.perf_counter() - start
+    print(", ".join(f"{name} {seconds:.1f}" for name, seconds in timings.items()))
+    close_driver()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--outputs", type=int, default=10_000,
+                        help="Number of outputs, e.g. 10000, 100000 or 1000000")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=5_000,
+                        help="Rows written per UNWIND transaction")
+    parser.add_argument("--clear", action="store_true",
+                        help="Delete every node in the database first")
+    args = parser.parse_args()
+    main(args.outputs, args.seed, args.batch_size, args.clear)
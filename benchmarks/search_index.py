@@ -0,0 +1,80 @@
+"""Latency of the in-process BM25 search index on synthetic documents
+
+Documents get a title of 12 words and an abstract of 150 words drawn from a
+Zipf-distributed vocabulary, so a few terms occur in most documents, like
+"energy" or "model" in the real corpus, and most terms are rare. Queries of
+common and of rare terms are timed separately, as the time of a query grows
+with the postings of its terms. No database is needed. Run with::
+
+    python -m benchmarks.search_index --documents 100000 --queries 200
+
+The ranking is pure Python: queries of rare terms take well under a
+millisecond, but queries of the most common terms take time in proportion
+to the number of documents, about 100 ms at 100,000 documents, so they
+would take around a second at 1M.
+"""
+import argparse
+import json
+import random
+import time
+from itertools import accumulate
+
+from app.core.search import InvertedIndex
+from benchmarks.stats import format_row, summarise
+
+VOCABULARY = 50000
+
+
+def documents(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    vocabulary = [f"term{rank}" for rank in range(1, VOCABULARY + 1)]
+    weights = list(accumulate(1 / rank for rank in range(1, VOCABULARY + 1)))
+    for number in range(count):
+        yield {"uuid": f"output-{number}",
+               "title": " ".join(rng.choices(vocabulary, cum_weights=weights, k=12)),
+               "abstract": " ".join(rng.choices(vocabulary, cum_weights=weights, k=150)),
+               "journal": None,
+               "result_type": "publication",
+               "countries": []}
+
+
+def time_queries(index: InvertedIndex, queries: list[str]) -> dict:
+    latencies = []
+    start = time.perf_counter()
+    for query in queries:
+        begin = time.perf_counter()
+        index.search(query)
+        latencies.append(time.perf_counter() - begin)
+    return summarise(latencies, time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    index = InvertedIndex()
+    start = time.perf_counter()
+    index.update(documents(args.documents))
+    print(f"Indexed {len(index)} documents in {time.perf_counter() - start:.1f}s")
+
+    rng = random.Random(1)
+    scenarios = {
+        "common terms": [f"term{rng.randint(1, 10)} term{rng.randint(1, 10)}"
+                         for _ in range(args.queries)],
+        "rare terms": [f"term{rng.randint(10000, VOCABULARY)} term{rng.randint(10000, VOCABULARY)}"
+                       for _ in range(args.queries)],
+    }
+    results = {}
+    for name, queries in scenarios.items():
+        results[name] = time_queries(index, queries)
+        print(format_row(name, results[name]))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"documents": args.documents, "results": results}, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
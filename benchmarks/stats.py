@@ -0,0 +1,27 @@
+"""Summary statistics shared by the benchmarks"""
+import statistics
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def summarise(latencies: list[float], elapsed: float) -> dict:
+    """Throughput and latency percentiles of calls made over ``elapsed`` seconds"""
+    if not latencies:
+        return {"requests": 0, "throughput": 0.0}
+    return {"requests": len(latencies),
+            "throughput": len(latencies) / elapsed,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "mean_ms": statistics.fmean(latencies) * 1000}
+
+
+def format_row(name: str, result: dict) -> str:
+    return (f"{name:<22} {result['throughput']:8.1f} req/s "
+            f"p50 {result.get('p50_ms', 0):7.1f} ms "
+            f"p95 {result.get('p95_ms', 0):7.1f} ms "
+            f"p99 {result.get('p99_ms', 0):7.1f} ms")
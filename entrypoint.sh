@@ -1 +1,3 @@
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}
+rm -rf $PROMETHEUS_MULTIPROC_DIR && mkdir -p $PROMETHEUS_MULTIPROC_DIR
 fastapi run app/main.py --host 0.0.0.0 --port 8000 --workers $NUM_CORES